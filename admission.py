@@ -0,0 +1,323 @@
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from werkzeug.http import parse_cookie
+
+try:
+    import fcntl
+except ImportError:  # Windows: the table is private to each process
+    fcntl = None
+
+# --- ADMISSION CONTROL ---
+# WSGI middleware in front of the app that turns requests away cheaply,
+# before a session is loaded or a connection taken, instead of letting
+# them queue inside waitress until every route times out:
+#
+#  - Rate limits: a token bucket per client (session cookie) and per IP
+#    address for each class of route. Over the limit is a 429.
+#  - Load shedding: search, upload and sign-in requests in flight in this
+#    process are capped, so one kind of request can't take every server
+#    thread. Over the cap is a 503.
+#
+# Both answer with Retry-After. Buckets and counters live in a small
+# memory-mapped table (in /dev/shm where there is one) guarded by fcntl
+# byte-range locks, so every server process on the host shares the same
+# limits. In-flight counts stay per process, because each process has its
+# own thread pool.
+
+SEARCH = "search"
+UPLOAD = "upload"
+AUTH = "auth"
+STATIC = "static"
+DEFAULT = "default"
+CLASSES = (SEARCH, UPLOAD, AUTH, STATIC, DEFAULT)
+
+# Tokens per second and bucket size, per client
+RATES = {
+    SEARCH: (5.0, 20),
+    UPLOAD: (0.2, 10),
+    AUTH: (0.2, 10),
+    STATIC: (50.0, 200),
+    DEFAULT: (10.0, 40),
+}
+# Everyone behind one address (a hall's NAT, say) shares this many times a client's limit
+IP_FACTOR = 10
+SHED_RETRY_AFTER = 1
+
+STATIC_PREFIX = "/static/"
+SEARCH_PATHS = {"/browseItems", "/browseItems.json", "/api/v1/items"}
+UPLOAD_PATHS = {"/upload", "/profile/upload-picture", "/import"}
+AUTH_PATHS = {"/signin", "/signup", "/change-password"}
+
+SLOTS = 65536
+STRIPES = 64
+PROBE = 8
+
+_MAGIC = b"SSADM001"
+_HEADER = struct.Struct("<8sII")            # magic, slots, stripes
+_COUNTERS = ("admitted", "limited", "shed")
+_COUNTER = struct.Struct("<Q")
+_SLOT = struct.Struct("<Qdd")               # key hash (0 = empty), tokens, last refill
+_COUNTERS_AT = 64
+_EVICTIONS_AT = _COUNTERS_AT + len(CLASSES) * len(_COUNTERS) * _COUNTER.size
+_SLOTS_AT = 512
+
+
+def classify(method, path):
+    """The route class a request is limited as."""
+    if path.startswith(STATIC_PREFIX):
+        return STATIC
+    if method == "POST" and path in AUTH_PATHS:
+        return AUTH
+    if method == "POST" and path in UPLOAD_PATHS:
+        return UPLOAD
+    if path in SEARCH_PATHS:
+        return SEARCH
+    return DEFAULT
+
+
+def parse_rate(value, default):
+    """"rate,burst" (tokens per second, bucket size) from the environment."""
+    if not value:
+        return default
+    rate, _, burst = value.partition(",")
+    return float(rate), int(burst or default[1])
+
+
+def default_path(name):
+    shm = "/dev/shm"
+    return os.path.join(shm if os.path.isdir(shm) else tempfile.gettempdir(), f"{name}.limits")
+
+
+class SharedBuckets:
+    """Token buckets and counters in a table shared by every process that maps `path`.
+
+    Without a path (or without fcntl) the table is anonymous memory,
+    private to this process.
+    """
+
+    def __init__(self, path=None, slots=SLOTS, stripes=STRIPES):
+        self.slots = slots - slots % stripes
+        self.stripes = stripes
+        self.per_stripe = self.slots // stripes
+        self.path = path if fcntl is not None else None
+        size = _SLOTS_AT + self.slots * _SLOT.size
+        # fcntl locks don't exclude threads of the same process
+        self._thread_locks = [threading.Lock() for _ in range(stripes + 1)]
+        self._fd = None
+        if self.path:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            with self._locked(-1):
+                self._mm = mmap.mmap(self._fd, 0) if os.fstat(self._fd).st_size == size else None
+                if self._mm is None or _HEADER.unpack_from(self._mm, 0) != (_MAGIC, self.slots, stripes):
+                    # New, or laid out by another version: start from empty buckets
+                    if self._mm is not None:
+                        self._mm.close()
+                    os.ftruncate(self._fd, 0)
+                    os.ftruncate(self._fd, size)
+                    self._mm = mmap.mmap(self._fd, size)
+                    _HEADER.pack_into(self._mm, 0, _MAGIC, self.slots, stripes)
+        else:
+            self._mm = mmap.mmap(-1, size)
+
+    @contextmanager
+    def _locked(self, stripe):
+        """Hold stripe `stripe` (-1 is the counters) in this process and across processes."""
+        with self._thread_locks[stripe]:
+            if self._fd is not None:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe + 1)
+            try:
+                yield
+            finally:
+                if self._fd is not None:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe + 1)
+
+    def take(self, key, rate, burst, now=None):
+        """Take a token from `key`'s bucket. Returns 0, or seconds until one is free."""
+        now = time.time() if now is None else now
+        h = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+        stripe = h % self.stripes
+        first = stripe * self.per_stripe
+        start = (h // self.stripes) % self.per_stripe
+        evicted = False
+        with self._locked(stripe):
+            at = tokens = None
+            oldest, oldest_at = math.inf, None
+            for n in range(PROBE):
+                offset = _SLOTS_AT + (first + (start + n) % self.per_stripe) * _SLOT.size
+                slot_key, slot_tokens, stamp = _SLOT.unpack_from(self._mm, offset)
+                if slot_key == h:
+                    at, tokens = offset, min(burst, slot_tokens + max(0.0, now - stamp) * rate)
+                    break
+                if slot_key == 0:
+                    at, tokens = offset, burst
+                    break
+                if stamp < oldest:
+                    oldest, oldest_at = stamp, offset
+            else:
+                # Full run of slots: reuse the bucket idle longest
+                at, tokens, evicted = oldest_at, burst, True
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            _SLOT.pack_into(self._mm, at, h, tokens - 1 if not wait else tokens, now)
+        if evicted:
+            with self._locked(-1):
+                self._add(_EVICTIONS_AT, 1)
+        return wait
+
+    def _add(self, offset, amount):
+        value, = _COUNTER.unpack_from(self._mm, offset)
+        _COUNTER.pack_into(self._mm, offset, value + amount)
+
+    def count(self, route_class, outcome):
+        offset = (_COUNTERS_AT + (CLASSES.index(route_class) * len(_COUNTERS)
+                                  + _COUNTERS.index(outcome)) * _COUNTER.size)
+        with self._locked(-1):
+            self._add(offset, 1)
+
+    def counters(self):
+        """{class: {outcome: n}} across every process sharing the table, and evictions."""
+        with self._locked(-1):
+            counts = {
+                route_class: {
+                    outcome: _COUNTER.unpack_from(self._mm, _COUNTERS_AT + (c * len(_COUNTERS) + o) * _COUNTER.size)[0]
+                    for o, outcome in enumerate(_COUNTERS)
+                }
+                for c, route_class in enumerate(CLASSES)
+            }
+            evictions, = _COUNTER.unpack_from(self._mm, _EVICTIONS_AT)
+        return counts, evictions
+
+
+class AdmissionControl:
+    """Rate-limits and sheds requests before they reach `app`."""
+
+    def __init__(self, app, buckets, rates=RATES, max_inflight=None, ip_factor=IP_FACTOR,
+                 cookie_name="session", proxy_hops=0, enabled=True):
+        self.app = app
+        self.buckets = buckets
+        self.rates = dict(RATES, **rates)
+        self.max_inflight = {k: v for k, v in (max_inflight or {}).items() if v}
+        self.ip_factor = ip_factor
+        self.cookie_name = cookie_name
+        self.proxy_hops = proxy_hops
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self.inflight = dict.fromkeys(self.max_inflight, 0)
+
+    def client(self, environ):
+        """(session key or None, IP address) of the request."""
+        ip = environ.get("REMOTE_ADDR", "")
+        if self.proxy_hops:
+            forwarded = [a.strip() for a in environ.get("HTTP_X_FORWARDED_FOR", "").split(",") if a.strip()]
+            if len(forwarded) >= self.proxy_hops:
+                ip = forwarded[-self.proxy_hops]
+        cookie = parse_cookie(environ.get("HTTP_COOKIE", "")).get(self.cookie_name)
+        session = hashlib.blake2b(cookie.encode(), digest_size=12).hexdigest() if cookie else None
+        return session, ip
+
+    def limit(self, route_class, environ):
+        """0 if the request is within its client's and its address's limits, else seconds to wait."""
+        rate, burst = self.rates[route_class]
+        session, ip = self.client(environ)
+        if session:
+            wait = self.buckets.take(f"{route_class}:s:{session}", rate, burst)
+            if wait:
+                return wait  # without spending its neighbours' share of the address's bucket
+        # A forged cookie gets a fresh bucket, but never more than its address's
+        return self.buckets.take(f"{route_class}:ip:{ip}", rate * self.ip_factor, burst * self.ip_factor)
+
+    def __call__(self, environ, start_response):
+        if not self.enabled:
+            return self.app(environ, start_response)
+        route_class = classify(environ.get("REQUEST_METHOD", "GET"), environ.get("PATH_INFO", ""))
+
+        wait = self.limit(route_class, environ)
+        if wait:
+            self.buckets.count(route_class, "limited")
+            return self._reject(environ, start_response, "429 Too Many Requests", wait,
+                                "Too many requests. Please slow down.")
+
+        cap = self.max_inflight.get(route_class)
+        if cap:
+            with self._lock:
+                admitted = self.inflight[route_class] < cap
+                if admitted:
+                    self.inflight[route_class] += 1
+            if not admitted:
+                self.buckets.count(route_class, "shed")
+                return self._reject(environ, start_response, "503 Service Unavailable", SHED_RETRY_AFTER,
+                                    "The server is busy. Please try again in a moment.")
+        self.buckets.count(route_class, "admitted")
+        if not cap:
+            return self.app(environ, start_response)
+
+        try:
+            result = self.app(environ, start_response)
+        except BaseException:
+            self._release(route_class)
+            raise
+        return _ClosingIterator(result, lambda: self._release(route_class))
+
+    def _release(self, route_class):
+        with self._lock:
+            self.inflight[route_class] -= 1
+
+    def _reject(self, environ, start_response, status, wait, message):
+        path = environ.get("PATH_INFO", "")
+        if path.startswith("/api/") or path.endswith(".json") or "json" in environ.get("HTTP_ACCEPT", ""):
+            body, mimetype = json.dumps({"error": message}).encode(), "application/json"
+        else:
+            body, mimetype = message.encode(), "text/plain; charset=utf-8"
+        start_response(status, [
+            ("Content-Type", mimetype),
+            ("Content-Length", str(len(body))),
+            ("Retry-After", str(max(1, math.ceil(wait)))),
+            ("Cache-Control", "no-store"),
+        ])
+        return [body]
+
+    def stats(self):
+        counts, evictions = self.buckets.counters()
+        with self._lock:
+            inflight = dict(self.inflight)
+        return {
+            "enabled": self.enabled,
+            "shared": self.buckets.path,
+            "inflight": inflight,
+            "max_inflight": self.max_inflight,
+            "requests": counts,
+            "evictions": evictions,
+        }
+
+
+class _ClosingIterator:
+    """Passes the response through and calls `on_close` once the server is done with it."""
+
+    def __init__(self, result, on_close):
+        self._result = result
+        self._iter = iter(result)
+        self._on_close = on_close
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._iter)
+
+    def close(self):
+        try:
+            if hasattr(self._result, "close"):
+                self._result.close()
+        finally:
+            on_close, self._on_close = self._on_close, None
+            if on_close is not None:
+                on_close()
@@ -0,0 +1,179 @@
+from typing import Annotated, Literal, Optional
+
+import msgspec
+from flask import Response
+
+import images
+import swaps
+
+# --- JSON API (v1) ---
+# Request and response bodies of /api/v1 are msgspec Structs. Request
+# bodies are decoded and validated in one pass (a wrong type or a missing
+# field is a 400 naming the field), and responses are encoded straight from
+# the Structs, with no intermediate dicts for jsonify to walk.
+
+MAX_MESSAGE_LENGTH = 1000
+
+_encoder = msgspec.json.Encoder()
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# --- RESPONSES ---
+
+class Error(msgspec.Struct):
+    error: str
+
+
+class Image(msgspec.Struct, omit_defaults=True):
+    url: str
+    thumb: Optional[str] = None   # WebP variants, once they've been generated
+    medium: Optional[str] = None
+
+
+class ItemSummary(msgspec.Struct):
+    id: int
+    name: str
+    category: Optional[str]
+    description: Optional[str]
+    condition: Optional[str]
+    hostel: Optional[str]
+    owner_id: int
+    owner_name: str
+    views: int
+    created_at: str
+    image: Optional[Image] = None
+    requested: bool = False
+
+
+class ItemPage(msgspec.Struct):
+    items: list[ItemSummary]
+    next_cursor: Optional[str]
+    has_more: bool
+
+
+class Owner(msgspec.Struct):
+    id: int
+    username: str
+    hostel: Optional[str]
+    phone: Optional[str]
+
+
+class ItemDetail(msgspec.Struct):
+    id: int
+    name: str
+    description: Optional[str]
+    category: Optional[str]
+    condition: Optional[str]
+    created_at: str
+    is_active: bool
+    owner: Owner
+    image: Optional[Image] = None
+    requested: bool = False
+    saved: bool = False
+
+
+class SavedItem(msgspec.Struct):
+    id: int
+    name: str
+    category: Optional[str]
+    owner_name: str
+    image: Optional[Image] = None
+
+
+class SwapRequest(msgspec.Struct):
+    id: int
+    item_id: int
+    item_name: str
+    status: str
+    message: Optional[str]
+    created_at: str
+    responded_at: Optional[str]
+    other_user: str  # the requester for incoming requests, the owner for outgoing ones
+
+
+class SwapRequests(msgspec.Struct):
+    incoming: list[SwapRequest]
+    outgoing: list[SwapRequest]
+
+
+class BulkSwapResult(msgspec.Struct):
+    answered: list[int]
+    closed: list[int]    # other requests for the items just accepted
+    skipped: list[int]   # not the user's, or no longer pending
+
+
+class DashboardStats(msgspec.Struct):
+    active_offers: int
+    pending_requests: int
+    total_views: int
+    completed_swaps: int
+    total_attempts: int
+    success_rate: int
+    matches: int
+
+
+# --- REQUEST BODIES ---
+
+class NewSwapRequest(msgspec.Struct, forbid_unknown_fields=True):
+    item_id: int
+    message: Annotated[str, msgspec.Meta(max_length=MAX_MESSAGE_LENGTH)] = ""
+
+
+class SwapResponse(msgspec.Struct, forbid_unknown_fields=True):
+    action: Literal["accepted", "rejected"]
+
+
+class BulkSwapResponse(msgspec.Struct, forbid_unknown_fields=True):
+    ids: Annotated[list[int], msgspec.Meta(max_length=swaps.MAX_BULK)]
+    action: Literal["accepted", "rejected"]
+
+
+class SaveItem(msgspec.Struct, forbid_unknown_fields=True):
+    item_id: int
+
+
+# --- HELPERS ---
+
+def decode(body, type):
+    """Decode and validate a JSON request body, or raise a 400 ApiError."""
+    try:
+        return msgspec.json.decode(body or b"{}", type=type)
+    except msgspec.ValidationError as e:
+        raise ApiError(400, str(e))
+    except msgspec.DecodeError:
+        raise ApiError(400, "Request body is not valid JSON")
+
+
+def response(payload, status=200):
+    return Response(_encoder.encode(payload), status=status, mimetype="application/json")
+
+
+def image(url_for, filename, variants=None):
+    if not filename:
+        return None
+    return Image(url_for("static", filename="uploads/" + filename),
+                 **images.variant_urls(url_for, variants))
+
+
+def item_summary(url_for, row, requested=False):
+    """A browse listing row (items.* plus owner_name) as an ItemSummary."""
+    return ItemSummary(
+        id=row["id"], name=row["name"], category=row["category"], description=row["description"],
+        condition=row["condition"], hostel=row["hostel"], owner_id=row["owner_id"],
+        owner_name=row["owner_name"], views=row["views"] or 0, created_at=row["created_at"],
+        image=image(url_for, row["image"], row["image_variants"]), requested=requested,
+    )
+
+
+def swap_request(row, other_user):
+    return SwapRequest(
+        id=row["id"], item_id=row["item_id"], item_name=row["item_name"], status=row["status"],
+        message=row["message"], created_at=row["created_at"], responded_at=row["responded_at"],
+        other_user=other_user,
+    )
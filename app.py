@@ -1,48 +1,701 @@
-from flask import Flask, render_template, request, redirect, session, g, url_for, current_app, session, jsonify, flash
+import time
+STARTED_AT = time.perf_counter()  # for the time-to-first-response log
+
+from flask import Flask, render_template, request, redirect, session, g, url_for, current_app, session, jsonify, flash, make_response, Response, abort, before_render_template, template_rendered
+from flask.cli import AppGroup
+import click
+import jinja2
 from werkzeug.utils import secure_filename
-from flask_session import Session
 from datetime import datetime, timezone
-from werkzeug.security import generate_password_hash, check_password_hash
 import sqlite3
-import waitress
+import json
+import hashlib
+from functools import wraps
 import os
+import signal
+import search as item_search
+import pagination
+import migrations
+import stats
+import dbpool
+import viewcounter
+import images
+import assets
+import sessions
+import matching
+import cache
+import conditional
+import notifications as notification_store
+import blobstore
+import metrics
+import bulk
+import api
+import passwords
+import jobs
+import swaps
+import proximity
+import events
+import admission
 
 # --- DATABASE CONFIG ---
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-DB_PATH = os.path.join(BASE_DIR, "users.db")  # store DB in project root
+DB_PATH = os.environ.get("SHARESPACE_DB", os.path.join(BASE_DIR, "users.db"))  # store DB in project root
 
 # --- FLASK CONFIG ---
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET", "replace_this_with_real_secret")
 
 app.config["SESSION_PERMANENT"] = False
-app.config["SESSION_TYPE"] = "filesystem"
-Session(app)
+# sqlite (default): server-side store in its own WAL database
+# cookie: Flask's signed-cookie sessions, nothing stored server-side
+# filesystem: the old Flask-Session file store
+app.config["SESSION_BACKEND"] = os.environ.get("SESSION_BACKEND", "sqlite")
+app.config["SESSION_DB_PATH"] = os.environ.get("SESSION_DB", os.path.join(BASE_DIR, "sessions.db"))
+
+if app.config["SESSION_BACKEND"] == "sqlite":
+    app.session_interface = sessions.SqliteSessionInterface(app.config["SESSION_DB_PATH"])
+elif app.config["SESSION_BACKEND"] == "filesystem":
+    from flask_session import Session
+    app.config["SESSION_TYPE"] = "filesystem"
+    Session(app)
 
 # Configuration
 UPLOAD_FOLDER = 'static/uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+IMPORT_ERROR_LIMIT = 100  # per-row errors returned by /import
+DASHBOARD_ACTIVITY = 4    # activity feed rows shown on the dashboard
+DASHBOARD_REQUESTS = 3    # pending requests shown on the dashboard
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
+app.config['AUTO_MIGRATE'] = os.environ.get("SHARESPACE_AUTO_MIGRATE", "1") == "1"
+app.config['DB_POOL_SIZE'] = int(os.environ.get("DB_POOL_SIZE", 8))
+app.config['DB_POOL_TIMEOUT'] = float(os.environ.get("DB_POOL_TIMEOUT", 10))
+app.config['VIEW_FLUSH_INTERVAL'] = float(os.environ.get("VIEW_FLUSH_INTERVAL", 5))
+app.config['VIEW_FLUSH_THRESHOLD'] = int(os.environ.get("VIEW_FLUSH_THRESHOLD", 500))
+app.config['VIEW_DEDUP_SECONDS'] = int(os.environ.get("VIEW_DEDUP_SECONDS", 1800))  # 0 = count every view
+app.config['IMAGE_WORKERS'] = int(os.environ.get("IMAGE_WORKERS", 2))
+app.config['UPLOAD_GC_GRACE'] = int(os.environ.get("UPLOAD_GC_GRACE", blobstore.GC_GRACE))
+app.config['UPLOAD_GC_INTERVAL'] = int(os.environ.get("UPLOAD_GC_INTERVAL", blobstore.GC_INTERVAL))  # 0 = only via `flask uploads gc`
+app.config['ASSETS_BUILD_ON_STARTUP'] = os.environ.get("ASSETS_BUILD_ON_STARTUP", "1") == "1"
+app.config['MATCHES_PER_USER'] = int(os.environ.get("MATCHES_PER_USER", matching.TOP_N))
+# Server processes on this host (e.g. gunicorn workers). Invalidating the
+# memory cache only reaches the process that made the change, so with more
+# than one the cache lives in CACHE_DIR instead, where every process sees it
+app.config['WEB_CONCURRENCY'] = int(os.environ.get("WEB_CONCURRENCY", 1))
+app.config['CACHE_BACKEND'] = os.environ.get(
+    "CACHE_BACKEND", "filesystem" if app.config['WEB_CONCURRENCY'] > 1 else "memory")  # memory | filesystem
+app.config['CACHE_DIR'] = os.environ.get("CACHE_DIR", os.path.join(BASE_DIR, "cache"))
+app.config['CACHE_THRESHOLD'] = int(os.environ.get("CACHE_THRESHOLD", cache.DEFAULT_THRESHOLD))
+app.config['CACHE_TIMEOUT'] = int(os.environ.get("CACHE_TIMEOUT", cache.DEFAULT_TIMEOUT))
+app.config['CACHE_POPULAR_TIMEOUT'] = int(os.environ.get("CACHE_POPULAR_TIMEOUT", 60))  # views change without invalidation
+app.config['BROWSE_PAGE_SIZE'] = int(os.environ.get("BROWSE_PAGE_SIZE", pagination.DEFAULT_PAGE_SIZE))
+app.config['CONDITIONAL_GET'] = os.environ.get("CONDITIONAL_GET", "1") == "1"
+app.config['WAITRESS_THREADS'] = int(os.environ.get("WAITRESS_THREADS", 8))
+# Every open notification stream holds a server thread; keep some free for pages
+app.config['NOTIFY_MAX_STREAMS'] = int(os.environ.get("NOTIFY_MAX_STREAMS", app.config['WAITRESS_THREADS'] // 2))
+app.config['NOTIFY_STREAMS_PER_USER'] = int(os.environ.get("NOTIFY_STREAMS_PER_USER", 2))
+app.config['NOTIFY_HEARTBEAT'] = float(os.environ.get("NOTIFY_HEARTBEAT", notification_store.HEARTBEAT))
+app.config['NOTIFY_STREAM_AGE'] = float(os.environ.get("NOTIFY_STREAM_AGE", notification_store.MAX_STREAM_AGE))
+app.config['SQL_METRICS'] = os.environ.get("SQL_METRICS", "1") == "1"
+app.config['SLOW_QUERY_MS'] = float(os.environ.get("SLOW_QUERY_MS", metrics.SLOW_QUERY_MS))  # 0 = no slow query log
+app.config['SERVER_TIMING'] = os.environ.get("SERVER_TIMING", "1") == "1"
+# /metrics is open to these usernames, or to a scraper sending "Authorization: Bearer <METRICS_TOKEN>"
+app.config['ADMIN_USERS'] = {u.strip() for u in os.environ.get("ADMIN_USERS", "").split(",") if u.strip()}
+app.config['METRICS_TOKEN'] = os.environ.get("METRICS_TOKEN")
+app.config['PASSWORD_WORKERS'] = int(os.environ.get("PASSWORD_WORKERS", 2))  # 0 = hash in the request thread
+# Hashes running or queued at once; sign-ins beyond that get a 503
+app.config['PASSWORD_MAX_PENDING'] = int(os.environ.get("PASSWORD_MAX_PENDING", max(1, app.config['WAITRESS_THREADS'] // 2)))
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get("PASSWORD_HASH_METHOD", passwords.METHOD)
+# Run queued background jobs in a thread of each server process (as well as
+# in any `flask jobs work` processes)
+app.config['JOBS_WORKER_THREAD'] = os.environ.get("JOBS_WORKER_THREAD", "1") == "1"
+app.config['JOBS_VISIBILITY_TIMEOUT'] = int(os.environ.get("JOBS_VISIBILITY_TIMEOUT", jobs.VISIBILITY_TIMEOUT))
+# Activity events older than this are compacted away (feeds keep their own copy)
+app.config['EVENTS_KEEP_DAYS'] = float(os.environ.get("EVENTS_KEEP_DAYS", events.KEEP_EVENTS / 86400))
+# JSON matrix of walking distances between hostels for sort=nearest (see proximity.py)
+app.config['HOSTEL_DISTANCES'] = os.environ.get("HOSTEL_DISTANCES", os.path.join(BASE_DIR, "hostels.json"))
+app.config['HOSTEL_DISTANCE_STEP'] = int(os.environ.get("HOSTEL_DISTANCE_STEP", proximity.DISTANCE_STEP))
+# Compiled templates are kept here across restarts ("" = compile on every start);
+# `flask templates compile` fills it ahead of time
+app.config['JINJA_CACHE_DIR'] = os.environ.get("JINJA_CACHE_DIR", os.path.join(BASE_DIR, "template_cache"))
+# Part of every ETag, so pages cached by browsers don't outlive a deploy
+app.config['BUILD_ID'] = os.environ.get("BUILD_ID", str(int(time.time())))
+# Per-client rate limits ("tokens per second,burst") and per-process caps on
+# requests in flight by route class (see admission.py); 0 = no cap
+app.config['RATE_LIMITS'] = os.environ.get("RATE_LIMITS", "1") == "1"
+app.config['RATE_LIMIT_RATES'] = {
+    route_class: admission.parse_rate(os.environ.get(f"RATE_LIMIT_{route_class.upper()}"), default)
+    for route_class, default in admission.RATES.items()
+}
+# Shared by every server process on the host using the same database
+app.config['RATE_LIMIT_SHM'] = os.environ.get("RATE_LIMIT_SHM", admission.default_path(
+    "sharespace-" + hashlib.sha1(DB_PATH.encode()).hexdigest()[:12]))
+app.config['PROXY_HOPS'] = int(os.environ.get("PROXY_HOPS", 0))  # proxies that append to X-Forwarded-For
+app.config['MAX_INFLIGHT'] = {
+    admission.SEARCH: int(os.environ.get("MAX_INFLIGHT_SEARCH", max(1, app.config['WAITRESS_THREADS'] // 2))),
+    admission.UPLOAD: int(os.environ.get("MAX_INFLIGHT_UPLOAD", max(1, app.config['WAITRESS_THREADS'] // 4))),
+    admission.AUTH: int(os.environ.get("MAX_INFLIGHT_AUTH", max(1, app.config['WAITRESS_THREADS'] // 2))),
+}
+
+app.wsgi_app = app.extensions["admission"] = admission.AdmissionControl(
+    app.wsgi_app,
+    admission.SharedBuckets(app.config['RATE_LIMIT_SHM'] or None),
+    rates=app.config['RATE_LIMIT_RATES'],
+    max_inflight=app.config['MAX_INFLIGHT'],
+    cookie_name=app.config['SESSION_COOKIE_NAME'],
+    proxy_hops=app.config['PROXY_HOPS'],
+    enabled=app.config['RATE_LIMITS'],
+)
 
 # Create uploads folder if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Has to be set before anything touches app.jinja_env
+if app.config['JINJA_CACHE_DIR']:
+    os.makedirs(app.config['JINJA_CACHE_DIR'], exist_ok=True)
+    app.jinja_options = dict(app.jinja_options,
+                             bytecode_cache=jinja2.FileSystemBytecodeCache(app.config['JINJA_CACHE_DIR']))
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def upload_paths(filename, variants=None):
+    # The original upload plus any resized variants made from it
+    names = [filename] + images.variant_files(variants)
+    return [os.path.join(app.config['UPLOAD_FOLDER'], n) for n in names]
+
+def remove_upload(filename, variants=None):
+    # Content-addressed uploads may be shared and are collected by the GC once
+    # nothing references them; only legacy per-upload files are removed here
+    if not filename or blobstore.is_blob(filename):
+        return
+    for file_path in upload_paths(filename, variants):
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
+def schedule_upload_removal(db, uploads):
+    # Queued in the caller's transaction, so the files only go once the rows
+    # that point at them are gone, and a failed delete is retried
+    files = [[filename, variants] for filename, variants in uploads
+             if filename and not blobstore.is_blob(filename)]
+    if files:
+        jobs.enqueue(db, "remove_uploads", {"files": files})
+
+@jobs.handler("remove_uploads")
+def remove_uploads_job(payload):
+    for filename, variants in payload["files"]:
+        remove_upload(filename, variants)
+
+@jobs.periodic("compact_events", events.COMPACT_INTERVAL)
+def compact_events(db):
+    events.compact(db, int(app.config["EVENTS_KEEP_DAYS"] * 86400))
+
+def get_blob_store():
+    store = app.extensions.get("blob_store")
+    if store is None:
+        store = app.extensions.setdefault("blob_store", blobstore.BlobStore(
+            app.config['UPLOAD_FOLDER'], get_pool(),
+            grace=app.config["UPLOAD_GC_GRACE"], gc_interval=app.config["UPLOAD_GC_INTERVAL"]))
+    return store
+
+def store_upload(file):
+    """Hash and store an uploaded image. Returns (filename, variants or None)."""
+    ext = file.filename.rsplit('.', 1)[1].lower()
+    return get_blob_store().put(get_db(), file.stream, ext, validate=images.validate,
+                                prepare=images.strip_metadata)
+
+def get_image_pipeline():
+    pipeline = app.extensions.get("image_pipeline")
+    if pipeline is None:
+        pipeline = app.extensions.setdefault(
+            "image_pipeline", images.ImagePipeline(workers=app.config["IMAGE_WORKERS"]))
+    return pipeline
+
+def process_upload(table, row_id, filename):
+    # Resize in a worker process, then record the variants on the row (unless
+    # the image has been replaced in the meantime)
+    column, variants_column = {
+        "items": ("image", "image_variants"),
+        "users": ("profile_picture", "profile_picture_variants"),
+    }[table]
+    pool = get_pool()
+
+    def record(variants):
+        # Sharded uploads keep their variants in the same subfolder
+        variants = images.rebase(variants, os.path.dirname(filename))
+        conn = pool.acquire()
+        try:
+            conn.execute(
+                f"UPDATE {table} SET {variants_column} = ? WHERE id = ? AND {column} = ?",
+                (json.dumps(variants), row_id, filename)
+            )
+            # Later uploads of the same image reuse these
+            get_blob_store().record_variants(conn, filename, json.dumps(variants))
+            conn.commit()
+        finally:
+            pool.release(conn)
+        if table == "items":
+            invalidate_items(row_id)
+
+    return get_image_pipeline().submit(
+        os.path.join(app.config['UPLOAD_FOLDER'], filename), record)
+
+@app.template_global()
+def responsive_image(filename, variants=None, alt="", css_class="", size="thumb", sizes="100vw"):
+    return images.responsive_image(url_for, filename, variants, alt, css_class, size, sizes)
+
 
 # --- DATABASE HELPERS ---
+def get_pool(readonly=False):
+    # Created on first use so each worker process gets its own connections
+    name = "db_read_pool" if readonly else "db_pool"
+    pool = app.extensions.get(name)
+    if pool is None:
+        pool = app.extensions.setdefault(name, dbpool.ConnectionPool(
+            DB_PATH,
+            max_size=app.config["DB_POOL_SIZE"],
+            readonly=readonly,
+            timeout=app.config["DB_POOL_TIMEOUT"],
+            factory=(metrics.connection_factory(app.config["SLOW_QUERY_MS"])
+                     if app.config["SQL_METRICS"] else sqlite3.Connection),
+        ))
+    return pool
+
+def get_metrics():
+    registry = app.extensions.get("metrics")
+    if registry is None:
+        registry = app.extensions.setdefault("metrics", metrics.Metrics())
+    return registry
+
+def get_view_counter():
+    counter = app.extensions.get("view_counter")
+    if counter is None:
+        counter = app.extensions.setdefault("view_counter", viewcounter.ViewCounter(
+            get_pool(),
+            interval=app.config["VIEW_FLUSH_INTERVAL"],
+            max_pending=app.config["VIEW_FLUSH_THRESHOLD"],
+            dedup_seconds=app.config["VIEW_DEDUP_SECONDS"],
+        ))
+    return counter
+
+def get_match_engine():
+    engine = app.extensions.get("match_engine")
+    if engine is None:
+        engine = app.extensions.setdefault("match_engine", matching.MatchEngine(
+            get_pool(), top_n=app.config["MATCHES_PER_USER"]))
+    return engine
+
+def get_notification_bus():
+    bus = app.extensions.get("notifications")
+    if bus is None:
+        bus = app.extensions.setdefault("notifications", notification_store.NotificationBus(
+            max_streams=app.config["NOTIFY_MAX_STREAMS"],
+            max_streams_per_user=app.config["NOTIFY_STREAMS_PER_USER"]))
+    return bus
+
+def get_password_hasher():
+    hasher = app.extensions.get("password_hasher")
+    if hasher is None:
+        hasher = app.extensions.setdefault("password_hasher", passwords.PasswordHasher(
+            workers=app.config["PASSWORD_WORKERS"],
+            max_pending=app.config["PASSWORD_MAX_PENDING"],
+            method=app.config["PASSWORD_HASH_METHOD"]))
+    return hasher
+
+def get_job_worker():
+    worker = app.extensions.get("job_worker")
+    if worker is None:
+        worker = app.extensions.setdefault("job_worker", jobs.Worker(
+            get_pool(), visibility_timeout=app.config["JOBS_VISIBILITY_TIMEOUT"]))
+    return worker
+
+def get_hostel_distances():
+    matrix = app.extensions.get("hostel_distances")
+    if matrix is None:
+        matrix = app.extensions.setdefault("hostel_distances", proximity.DistanceMatrix.load(
+            app.config["HOSTEL_DISTANCES"], step=app.config["HOSTEL_DISTANCE_STEP"]))
+    return matrix
+
+def get_cache():
+    tagged = app.extensions.get("cache")
+    if tagged is None:
+        backend = cache.make_backend(
+            app.config["CACHE_BACKEND"],
+            threshold=app.config["CACHE_THRESHOLD"],
+            default_timeout=app.config["CACHE_TIMEOUT"],
+            path=app.config["CACHE_DIR"],
+        )
+        tagged = app.extensions.setdefault(
+            "cache", cache.TaggedCache(backend, default_timeout=app.config["CACHE_TIMEOUT"]))
+    return tagged
+
+def invalidate_items(*item_ids):
+    # Every browse page, plus the detail pages of the given items
+    get_cache().invalidate("items", *(f"item:{i}" for i in item_ids))
+
+def invalidate_user(db, user_id):
+    # Owner details appear on every listing and detail page of their items
+    item_ids = [row[0] for row in db.execute("SELECT id FROM items WHERE owner_id = ?", (user_id,))]
+    invalidate_items(*item_ids)
+
+def conditional_page(scopes, volatile=None):
+    """Answer If-None-Match / If-Modified-Since with a 304 before the view runs.
+
+    `scopes(user_id, **view_args)` lists the version stamps the page depends
+    on; `volatile(db, user_id, **view_args)` returns values that change
+    without a stamp being bumped.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            # Signed-out requests redirect, and a pending flash has to be rendered
+            if (not app.config["CONDITIONAL_GET"] or "user_id" not in session
+                    or session.get("_flashes")):
+                return view(**kwargs)
+
+            user_id = session["user_id"]
+            db = get_read_db()
+            extra = (app.config["BUILD_ID"], request.full_path, user_id, session.get("username"),
+                     session.get("profile_picture"), session.get("profile_picture_variants"))
+            validator = conditional.validator(
+                db, scopes(user_id, **kwargs), extra,
+                volatile(db, user_id, **kwargs) if volatile else ())
+            if validator.matches(request):
+                return validator.not_modified()
+
+            response = make_response(view(**kwargs))
+            if response.status_code == 200:
+                validator.apply(response)
+            return response
+        return wrapper
+    return decorator
+
 def get_db():
     if "db" not in g:
-        print("📁 Connecting to database:", os.path.abspath(DB_PATH))  # <-- debug print
-        g.db = sqlite3.connect(DB_PATH)
-        g.db.row_factory = sqlite3.Row
-        g.db.execute("PRAGMA foreign_keys = ON")
+        g.db = get_pool().acquire()
     return g.db
 
+def get_read_db():
+    # Read-only connection for GET routes; in WAL mode these never block
+    # behind (or block) a writer
+    if "read_db" not in g:
+        g.read_db = get_pool(readonly=True).acquire()
+    return g.read_db
+
+def init_db():
+    # One-off setup that has to run before the first request
+    db = sqlite3.connect(DB_PATH)
+    db.row_factory = sqlite3.Row
+    try:
+        if app.config["AUTO_MIGRATE"]:
+            migrations.upgrade(db)
+        elif migrations.pending(db):
+            print("⚠️ Database schema is out of date, run: flask --app app db upgrade")
+        app.config["SEARCH_FTS"] = item_search.install(db)
+        db.commit()
+        # First start after the matchmaking tables were added
+        if not migrations.pending(db) and matching.needs_rebuild(db):
+            matching.rebuild(db, app.config["MATCHES_PER_USER"])
+            db.commit()
+        # WAL is persistent, so setting it once here covers every connection
+        db.execute("PRAGMA journal_mode = WAL")
+    finally:
+        db.close()
+
+# --- DATABASE CLI ---
+# flask --app app db upgrade | db version | db explain
+db_cli = AppGroup("db", help="Database schema commands.")
+
+@db_cli.command("upgrade")
+def db_upgrade():
+    """Apply pending schema migrations."""
+    db = sqlite3.connect(DB_PATH)
+    try:
+        version = migrations.upgrade(db)
+        print(f"Schema is at version {version}")
+    finally:
+        db.close()
+
+@db_cli.command("version")
+def db_version():
+    """Show the current and latest schema version."""
+    db = sqlite3.connect(DB_PATH)
+    try:
+        print(f"Schema version {migrations.current_version(db)} "
+              f"(latest {migrations.latest_version()}, {len(migrations.pending(db))} pending)")
+    finally:
+        db.close()
+
+@db_cli.command("explain")
+def db_explain():
+    """Print the query plan of every hot route query."""
+    db = sqlite3.connect(DB_PATH)
+    try:
+        if not migrations.print_report(migrations.explain(db)):
+            raise SystemExit(1)
+    finally:
+        db.close()
+
+@db_cli.command("stats")
+@click.option("--rebuild", is_flag=True, help="Recompute user_stats from the source tables.")
+def db_stats(rebuild):
+    """Check the user_stats counters for drift (and optionally repair them)."""
+    db = sqlite3.connect(DB_PATH)
+    try:
+        drift = stats.verify(db)
+        for user_id, counter, stored, actual in drift:
+            print(f"user {user_id}: {counter} is {stored}, should be {actual}")
+        if rebuild:
+            stats.rebuild(db)
+            db.commit()
+            print("user_stats rebuilt")
+        elif drift:
+            raise SystemExit(1)
+        else:
+            print("user_stats is consistent")
+    finally:
+        db.close()
+
+@db_cli.command("matches")
+def db_matches():
+    """Rebuild the matchmaking index and every user's top matches."""
+    db = sqlite3.connect(DB_PATH)
+    db.row_factory = sqlite3.Row
+    try:
+        users = matching.rebuild(db, app.config["MATCHES_PER_USER"])
+        db.commit()
+        print(f"Matches rebuilt for {users} users")
+    finally:
+        db.close()
+
+app.cli.add_command(db_cli)
+
+# --- STATIC ASSETS ---
+# url_for('static', filename='css/tailwind.css') resolves to the
+# fingerprinted copy in static/dist whenever the manifest has one.
+def init_assets():
+    if app.config["ASSETS_BUILD_ON_STARTUP"]:
+        app.extensions["asset_manifest"] = assets.build(app.static_folder)
+    else:
+        app.extensions["asset_manifest"] = assets.load_manifest(app.static_folder)
+
+@app.url_defaults
+def fingerprint_static(endpoint, values):
+    if endpoint == "static":
+        hashed = app.extensions.get("asset_manifest", {}).get(values.get("filename"))
+        if hashed:
+            values["filename"] = hashed
+
+@app.route("/static/dist/<path:filename>")
+def static_asset(filename):
+    return assets.send_asset(app.static_folder, filename)
+
+@app.route("/static/uploads/<path:filename>")
+def uploaded_file(filename):
+    return blobstore.send_upload(os.path.join(app.root_path, app.config['UPLOAD_FOLDER']), filename)
+
+assets_cli = AppGroup("assets", help="Static asset commands.")
+
+@assets_cli.command("build")
+def assets_build():
+    """Fingerprint and precompress static assets into static/dist."""
+    manifest = assets.build(app.static_folder, log=print)
+    app.extensions["asset_manifest"] = manifest
+    print(f"{len(manifest)} assets in static/dist/manifest.json")
+
+app.cli.add_command(assets_cli)
+
+templates_cli = AppGroup("templates", help="Template commands.")
+
+@templates_cli.command("compile")
+def templates_compile():
+    """Compile every template into the bytecode cache (JINJA_CACHE_DIR)."""
+    if not app.config["JINJA_CACHE_DIR"]:
+        raise click.UsageError("JINJA_CACHE_DIR is empty, so there is no cache to fill")
+    start = time.perf_counter()
+    names = app.jinja_env.list_templates(filter_func=lambda name: name.endswith(".html"))
+    for name in names:
+        app.jinja_env.get_template(name)
+    print(f"{len(names)} templates compiled into {app.config['JINJA_CACHE_DIR']} "
+          f"in {time.perf_counter() - start:.2f}s")
+
+app.cli.add_command(templates_cli)
+
+uploads_cli = AppGroup("uploads", help="Uploaded file commands.")
+
+@uploads_cli.command("gc")
+@click.option("--grace", type=int, default=None, help="Seconds a blob must have been unreferenced (default UPLOAD_GC_GRACE).")
+def uploads_gc(grace):
+    """Delete uploads that no item or user references any more."""
+    removed = get_blob_store().gc(grace=grace)
+    print(f"{removed} unreferenced uploads removed")
+
+app.cli.add_command(uploads_cli)
+
+bulk_cli = AppGroup("bulk", help="Bulk import and export commands.")
+
+@bulk_cli.command("export")
+@click.argument("table", type=click.Choice([*bulk.EXPORT_TABLES, "all"]))
+@click.option("--format", "fmt", type=click.Choice(bulk.FORMATS), default="jsonl")
+@click.option("--user", "username", default=None, help="Only rows belonging to this username.")
+@click.option("--output", "-o", type=click.File("w", encoding="utf-8"), default="-")
+def bulk_export(table, fmt, username, output):
+    """Stream a table (or `all` of them, as JSONL) to a file or stdout."""
+    if table == "all" and fmt != "jsonl":
+        raise click.UsageError("`all` is only available as jsonl")
+    user_id = None
+    if username:
+        db = get_read_db()
+        row = db.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
+        if row is None:
+            raise click.BadParameter(f"no user called {username!r}", param_hint="--user")
+        user_id = row["id"]
+    pool = get_pool(readonly=True)
+    chunks = (bulk.export_all(pool, user_id) if table == "all"
+              else bulk.export(pool, table, fmt, user_id))
+    for chunk in chunks:
+        output.write(chunk)
+
+@bulk_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option("--format", "fmt", type=click.Choice(bulk.FORMATS), default=None, help="Default: from the file extension.")
+@click.option("--owner", default=None, help="Username that owns every listing (otherwise each row names its owner).")
+@click.option("--checkpoint", "name", default=None, help="Name progress is saved under (default: the file's path).")
+@click.option("--restart", is_flag=True, help="Ignore the saved checkpoint and start from the first row.")
+@click.option("--batch-size", type=int, default=bulk.BATCH_SIZE, show_default=True)
+@click.option("--errors", type=click.File("w", encoding="utf-8"), default="-", help="Where per-row errors go.")
+@click.option("--skip-matches", is_flag=True, help="Don't rebuild the matchmaking index afterwards.")
+def bulk_import(path, fmt, owner, name, restart, batch_size, errors, skip_matches):
+    """Import listings from a JSONL or CSV file, resuming where a previous run stopped."""
+    fmt = fmt or bulk.guess_format(path)
+    if name is None and path != "-":
+        name = "file:" + os.path.abspath(path)
+    db = sqlite3.connect(DB_PATH, timeout=dbpool.BUSY_TIMEOUT_MS / 1000)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA foreign_keys = ON")
+    try:
+        owner_id = None
+        if owner:
+            row = db.execute("SELECT id FROM users WHERE username = ?", (owner,)).fetchone()
+            if row is None:
+                raise click.BadParameter(f"no user called {owner!r}", param_hint="--owner")
+            owner_id = row["id"]
+        if name and restart:
+            bulk.reset_checkpoint(db, name)
+
+        def report(number, message):
+            errors.write(f"record {number}: {message}\n")
+
+        with click.open_file(path, "rb") as stream:
+            summary = bulk.import_items(db, stream, fmt, owner_id, name, batch_size, on_error=report)
+        if summary["resumed_at"]:
+            print(f"Resumed after record {summary['resumed_at']:,}")
+        print(f"{summary['imported']:,} listings imported, {summary['failed']:,} rejected "
+              f"({summary['records']:,} records)")
+        if summary["imported"] and not skip_matches:
+            users = matching.rebuild(db, app.config["MATCHES_PER_USER"])
+            db.commit()
+            print(f"Matches rebuilt for {users} users")
+    except bulk.RowError as e:
+        raise click.ClickException(str(e))
+    finally:
+        db.close()
+
+app.cli.add_command(bulk_cli)
+
+jobs_cli = AppGroup("jobs", help="Background job queue commands.")
+
+def run_job_worker(burst=False):
+    worker = jobs.Worker(get_pool(), visibility_timeout=app.config["JOBS_VISIBILITY_TIMEOUT"])
+    # Finish the job in hand, then exit
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: worker.stop())
+    worker.run(burst=burst)
+    return worker
+
+@jobs_cli.command("work")
+@click.option("--processes", "-p", type=int, default=1, show_default=True)
+@click.option("--burst", is_flag=True, help="Exit once no job is due instead of waiting for more.")
+def jobs_work(processes, burst):
+    """Run queued jobs until interrupted."""
+    if processes <= 1:
+        worker = run_job_worker(burst)
+        print(f"{worker.done} jobs done, {worker.failed} failed")
+        return
+    import multiprocessing
+    children = [multiprocessing.Process(target=run_job_worker, args=(burst,), name=f"job-worker-{n}")
+                for n in range(processes)]
+    for child in children:
+        child.start()
+
+    def forward(signum, frame):
+        for child in children:
+            if child.is_alive():
+                os.kill(child.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGINT, forward)
+    signal.signal(signal.SIGTERM, forward)
+    for child in children:
+        child.join()
+
+@jobs_cli.command("status")
+@click.option("--dead", "dead_limit", type=int, default=10, show_default=True, help="Dead jobs to list.")
+def jobs_status(dead_limit):
+    """Queue depth by kind and status, and the latest dead jobs."""
+    db = get_read_db()
+    counts = jobs.depth(db)
+    if not counts:
+        print("No jobs")
+    for kind, statuses in sorted(counts.items()):
+        print(f"{kind:<20} " + "  ".join(f"{status} {statuses.get(status, 0):>6,}"
+                                         for status in ("queued", "running", "done", "dead")))
+    waiting = jobs.oldest_ready(db)
+    if waiting is not None:
+        print(f"Oldest due job has waited {waiting}s")
+    for job in jobs.dead(db, dead_limit):
+        error = (job["last_error"] or "").strip().splitlines()
+        print(f"dead #{job['id']} {job['kind']} after {job['attempts']} attempts: {error[-1] if error else ''}")
+
+@jobs_cli.command("retry")
+@click.option("--id", "job_ids", type=int, multiple=True, help="Dead job to retry (repeatable).")
+@click.option("--kind", default=None, help="Only dead jobs of this kind.")
+@click.option("--all", "retry_all", is_flag=True, help="Every dead job.")
+def jobs_retry(job_ids, kind, retry_all):
+    """Queue dead jobs again."""
+    if not (job_ids or kind or retry_all):
+        raise click.UsageError("pass --id, --kind or --all")
+    print(f"{jobs.retry(get_db(), job_ids, kind)} jobs queued again")
+
+@jobs_cli.command("prune")
+@click.option("--days", type=float, default=jobs.KEEP_DONE / 86400, show_default=True)
+def jobs_prune(days):
+    """Delete finished jobs older than --days."""
+    print(f"{jobs.prune(get_db(), int(days * 86400))} finished jobs deleted")
+
+app.cli.add_command(jobs_cli)
+
+events_cli = AppGroup("events", help="Activity event and feed commands.")
+
+@events_cli.command("status")
+def events_status():
+    """Events logged, feed rows and the oldest event kept."""
+    counts = events.counts(get_read_db())
+    print(f"{counts['events']:,} events since {counts['oldest_event'] or '-'}, {counts['feed_rows']:,} feed rows")
+
+@events_cli.command("compact")
+@click.option("--days", type=float, default=None, help="Keep this many days (default EVENTS_KEEP_DAYS).")
+def events_compact(days):
+    """Delete old events and trim overfull feeds."""
+    days = app.config["EVENTS_KEEP_DAYS"] if days is None else days
+    deleted, trimmed = events.compact(get_db(), int(days * 86400))
+    print(f"{deleted:,} events older than {days:g} days deleted, {trimmed:,} feed rows trimmed")
+
+app.cli.add_command(events_cli)
+
 def time_ago(dt):
     if isinstance(dt, str):
         dt = datetime.strptime(dt, "%Y-%m-%d %H:%M:%S")
@@ -69,7 +722,57 @@ def time_ago(dt):
 def close_db(e=None):
     db = g.pop("db", None)
     if db is not None:
-        db.close()
+        get_pool().release(db)
+    read_db = g.pop("read_db", None)
+    if read_db is not None:
+        get_pool(readonly=True).release(read_db)
+
+@app.before_request
+def start_timing():
+    g.timing_token = metrics.start(request.endpoint or "unmatched")
+
+@app.before_request
+def start_job_worker():
+    # Started by the first request, so CLI commands don't run jobs too
+    if app.config["JOBS_WORKER_THREAD"]:
+        get_job_worker().start()
+
+@app.after_request
+def record_timing(response):
+    timings = metrics.current()
+    if timings is not None:
+        if app.config["SERVER_TIMING"]:
+            response.headers["Server-Timing"] = timings.server_timing()
+        get_metrics().observe(timings, request.method, response.status_code)
+    return response
+
+@app.after_request
+def log_first_response(response):
+    # Cold starts: how long the first visitor after a restart waited on us
+    startup = app.extensions["startup"]
+    if "first_response" not in startup:
+        startup["first_response"] = round(time.perf_counter() - STARTED_AT, 3)
+        print(f"🚀 First response ({request.path}) {startup['first_response']:.2f}s after startup, "
+              f"app ready after {startup['ready']:.2f}s")
+    return response
+
+@app.teardown_request
+def finish_timing(e=None):
+    token = g.pop("timing_token", None)
+    if token is not None:
+        metrics.finish(token)
+
+@before_render_template.connect_via(app)
+def template_started(sender, **extra):
+    timings = metrics.current()
+    if timings is not None:
+        timings.template_started()
+
+@template_rendered.connect_via(app)
+def template_finished(sender, **extra):
+    timings = metrics.current()
+    if timings is not None:
+        timings.template_finished()
 
 # --- ROUTES ---
 @app.route("/")
@@ -87,14 +790,14 @@ def signup():
         if not username or not password:
             return render_template("signup.html", error="Missing username or password")
 
-        db = get_db()
         # check existing user
-        existing = db.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
+        existing = get_read_db().execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
         if existing:
             return render_template("signup.html", error="Username already exists")
 
+        password_hash = get_password_hasher().hash(password)
+        db = get_db()
         try:
-            password_hash = generate_password_hash(password)
             db.execute(
                 "INSERT INTO users (username, password_hash, hostel, phone) VALUES (?, ?, ?, ?)",
                 (username, password_hash, hostel, phone)
@@ -118,93 +821,112 @@ def signin():
         if not username or not password:
             return render_template("signin.html", error="Missing username or password")
 
-        db = get_db()
-        row = db.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
-        if row is None or not check_password_hash(row["password_hash"], password):
+        # The write connection isn't tied up while the password is checked
+        row = get_read_db().execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+        hasher = get_password_hasher()
+        if row is None or not hasher.check(row["password_hash"], password):
             return render_template("signin.html", error="Invalid credentials")
 
+        # Hash parameters changed since this password was set
+        new_hash = hasher.rehash(row["password_hash"], password)
+        if new_hash:
+            db = get_db()
+            db.execute("UPDATE users SET password_hash = ? WHERE id = ?", (new_hash, row["id"]))
+            db.commit()
+
+        # A new session id on every sign-in (see SqliteSessionInterface.regenerate)
+        if hasattr(app.session_interface, "regenerate"):
+            app.session_interface.regenerate(session)
         session["username"] = username
         session["user_id"] = row["id"]
         session["hostel"] = row["hostel"]
         session["profile_picture"] = row["profile_picture"]
+        session["profile_picture_variants"] = row["profile_picture_variants"]
 
         return redirect("/dashboard")
 
     return render_template("signin.html")
 
-@app.route('/dashboard')
-def dashboard():
-    if 'user_id' not in session:
-        return redirect(url_for('signin'))
-
-    db = get_db()
-    user_id = session['user_id']
-
-    # Compute stats from existing tables
-    active_offers = db.execute(
-        "SELECT COUNT(*) FROM items WHERE owner_id = ? AND is_active = 1",
-        (user_id,)
-    ).fetchone()[0]
-
-    total_views = db.execute(
-        "SELECT COALESCE(SUM(views), 0) FROM items WHERE owner_id = ?",
-        (user_id,)
-    ).fetchone()[0]
-
-    pending_requests = db.execute(
-    "SELECT COUNT(*) FROM swap_requests WHERE owner_id = ? AND status = 'pending'",
-    (user_id,)
-    ).fetchone()[0]
-    
-    completed_swaps = db.execute(
-    "SELECT COUNT(*) FROM swap_requests WHERE owner_id = ? AND status = 'accepted'",
-    (user_id,)
-    ).fetchone()[0]
-
-    total_attempts = db.execute(
-    "SELECT COUNT(*) FROM swap_requests WHERE owner_id = ?",
-    (user_id,)
-    ).fetchone()[0]
+def fetch_dashboard(db, user_id):
+    """The dashboard counters and the user's top matches."""
+    # Counters are kept current by triggers (see stats.py)
+    user_stats = stats.get(db, user_id)
+    active_offers = user_stats["active_offers"]
+    total_views = user_stats["total_views"]
+    pending_requests = user_stats["pending_requests"]
+    completed_swaps = user_stats["completed_swaps"]
+    total_attempts = user_stats["total_attempts"]
     
     success_rate = round((completed_swaps / total_attempts * 100) if total_attempts else 0)
 
+    # Precomputed by the match engine, best first
+    matches = matching.top_matches(db, user_id, app.config["MATCHES_PER_USER"])
+
 
-    stats = {
+    dashboard_stats = {
         "active_offers": active_offers,
         "pending_requests": pending_requests,
         "total_views": total_views, #consider emoving this if it doesn't make sense to show
         "completed_swaps": completed_swaps,
-        "matches": 0,              # placeholder
+        "matches": len(matches),
         "success_rate": success_rate,
         "total_attempts": total_attempts
     }
+    return dashboard_stats, matches
+
+def fetch_activity(db, user_id, limit=DASHBOARD_ACTIVITY):
+    """The newest rows of a user's activity feed, for the dashboard."""
+    return [
+        dict(row, type="completed" if row["kind"] == events.SWAP_ACCEPTED else row["kind"],
+             time_ago=time_ago(row["created_at"]))
+        for row in events.feed(db, user_id, limit)
+    ]
+
+def fetch_pending_requests(db, user_id, limit=DASHBOARD_REQUESTS):
+    """The newest requests still waiting on the user's answer."""
+    rows = db.execute("""
+        SELECT sr.id, sr.item_id, sr.message, sr.created_at,
+               i.name AS item_name, u.username AS requester_name
+        FROM swap_requests sr
+        JOIN items i ON sr.item_id = i.id
+        JOIN users u ON sr.requester_id = u.id
+        WHERE sr.owner_id = ? AND sr.status = 'pending'
+        ORDER BY sr.created_at DESC LIMIT ?
+    """, (user_id, limit)).fetchall()
+    return [dict(row, time_ago=time_ago(row["created_at"])) for row in rows]
 
-    return render_template(
-        "dashboard.html",
-        username=session["username"],
-        stats=stats,
-        swap_requests=[],
-        recent_activity=[],
-        matches=[]
-    )
-
-@app.route('/swapRequests')
-def swap_requests():
+@app.route('/dashboard')
+def dashboard():
     if 'user_id' not in session:
         return redirect(url_for('signin'))
 
-    db = get_db()
+    db = get_read_db()
     user_id = session['user_id']
+    dashboard_stats, matches = fetch_dashboard(db, user_id)
 
+    return render_template(
+        "dashboard.html",
+        username=session["username"],
+        stats=dashboard_stats,
+        swap_requests=fetch_pending_requests(db, user_id),
+        recent_activity=fetch_activity(db, user_id),
+        matches=matches
+    )
+
+def fetch_swap_requests(db, user_id):
+    """(incoming, outgoing) swap requests of a user, newest first."""
     # Incoming
     incoming = db.execute("""
         SELECT 
             sr.id,
+            sr.item_id,
             sr.message,
             sr.status,
             sr.created_at,
+            sr.responded_at,
             i.name AS item_name,
             i.image AS item_image,
+            i.image_variants AS item_image_variants,
             u.username AS requester_name,
             u.email AS requester_email,
             u.phone AS requester_phone
@@ -219,11 +941,14 @@ def swap_requests():
     outgoing = db.execute("""
         SELECT 
             sr.id,
+            sr.item_id,
             sr.message,
             sr.status,
             sr.created_at,
+            sr.responded_at,
             i.name AS item_name,
             i.image AS item_image,
+            i.image_variants AS item_image_variants,
             u.username AS owner_name,
             u.email AS owner_email,
             u.phone AS owner_phone
@@ -233,6 +958,16 @@ def swap_requests():
         WHERE sr.requester_id = :user_id
         ORDER BY sr.created_at DESC
     """, {"user_id": user_id}).fetchall()
+    return incoming, outgoing
+
+@app.route('/swapRequests')
+def swap_requests():
+    if 'user_id' not in session:
+        return redirect(url_for('signin'))
+
+    db = get_read_db()
+    user_id = session['user_id']
+    incoming, outgoing = fetch_swap_requests(db, user_id)
 
     # Add time_ago to each request
     incoming_requests = []
@@ -259,78 +994,158 @@ def swap_requests():
         error=request.args.get('error')
     )
 
+class ActionError(Exception):
+    """A swap or save the user isn't allowed to make; `status` is the HTTP status."""
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+def answer_swap_requests(db, request_ids, action):
+    """Accept or reject pending requests for the signed-in user's items.
+
+    Returns (answered, closed) as swaps.respond does, after committing and
+    notifying every requester whose request changed.
+    """
+    try:
+        answered, closed = swaps.respond(db, session["user_id"], request_ids, action)
+    except swaps.SwapError as e:
+        raise ActionError(e.message, e.status)
+
+    notes = []
+    for swap in answered + closed:
+        if swap["status"] == swaps.CLOSED:
+            text = f"{swap['item_name']} went to someone else, so your request was closed."
+        else:
+            text = (f"{session['username']} {'accepted' if swap['status'] == swaps.ACCEPTED else 'declined'} "
+                    f"your request for {swap['item_name']}.")
+        notes.append((swap["requester_id"], notification_store.create(
+            db, swap["requester_id"], "swap_response", text,
+            link=url_for("swap_requests") + "#outgoing", swap_request_id=swap["id"], status=swap["status"])))
+        record_swap_event(db, swap, text)
+    db.commit()
+
+    for user_id, note in notes:
+        get_notification_bus().publish(user_id, note)
+    # Accepted items are off the market now
+    taken = [swap["item_id"] for swap in answered if swap["status"] == swaps.ACCEPTED]
+    for item_id in taken:
+        get_match_engine().item_removed(item_id)
+    if taken:
+        invalidate_items(*taken)
+    return answered, closed
+
+def record_swap_event(db, swap, requester_text):
+    """Log an answered or closed request to both parties' activity feeds."""
+    kind = {swaps.ACCEPTED: events.SWAP_ACCEPTED, swaps.REJECTED: events.SWAP_REJECTED,
+            swaps.CLOSED: events.SWAP_CLOSED}[swap["status"]]
+    feed = [(swap["requester_id"], requester_text)]
+    if swap["status"] != swaps.CLOSED:
+        verb = "accepted" if swap["status"] == swaps.ACCEPTED else "declined"
+        feed.append((session["user_id"], f"You {verb} {swap['requester_name']}'s request for {swap['item_name']}."))
+    events.record(db, kind, session["user_id"], feed, item_id=swap["item_id"],
+                  swap_request_id=swap["id"], data={"item_name": swap["item_name"]})
+
+def answer_swap_request(db, request_id, action):
+    """Accept or reject one request. Returns the requests it closed."""
+    answered, closed = answer_swap_requests(db, [request_id], action)
+    if answered:
+        return closed
+
+    swap = db.execute("SELECT status FROM swap_requests WHERE id = ? AND owner_id = ?",
+                      (request_id, session["user_id"])).fetchone()
+    if not swap:
+        raise ActionError("Swap request not found", 403)
+    if swap["status"] == swaps.PENDING:
+        raise ActionError("Item not available", 409)
+    raise ActionError(f"This request has already been {swap['status']}", 409)
+
 @app.route('/swap/respond/<int:request_id>', methods=['POST'])
 def respond_to_swap(request_id):
     if 'user_id' not in session:
         return {"success": False}, 403
 
     db = get_db()
-    user_id = session['user_id']
     data = request.get_json()
     action = data.get("action")
 
     if action not in ["accepted", "rejected"]:
         return {"success": False}, 400
 
-    # Verify ownership
-    swap = db.execute("""
-        SELECT id FROM swap_requests
-        WHERE id = ? AND owner_id = ?
-    """, (request_id, user_id)).fetchone()
-
-    if not swap:
-        return {"success": False}, 403
-
-    db.execute("""
-        UPDATE swap_requests
-        SET status = ?, responded_at = CURRENT_TIMESTAMP
-        WHERE id = ?
-    """, (action, request_id))
-
-    db.commit()
+    try:
+        closed = answer_swap_request(db, request_id, action)
+    except ActionError as e:
+        return {"success": False, "error": e.message}, e.status
 
     return jsonify( success=True,
                    message="Swap accepted successfully." if action == "accepted"
                 else "Swap declined.",
-        status=action
+        status=action,
+        closed=[swap["id"] for swap in closed]
     )
 
+def bulk_answer_result(ids, answered, closed):
+    """The answered, closed and skipped ids of a bulk answer, as both endpoints report them."""
+    done = {swap["id"] for swap in answered}
+    closed_ids = [swap["id"] for swap in closed]
+    return {
+        "answered": sorted(done),
+        "closed": closed_ids,
+        # Asked for but left alone; one closed by an accept in the same call isn't skipped
+        "skipped": sorted(set(ids) - done - set(closed_ids)),
+    }
 
+@app.route('/swap/respond', methods=['POST'])
+def respond_to_swaps():
+    # Answer many requests in one go: {"ids": [...], "action": "accepted" | "rejected"}
+    if 'user_id' not in session:
+        return {"success": False}, 403
 
-@app.route("/swap/request/<int:item_id>", methods=["POST"])
-def request_swap(item_id):
-    if "user_id" not in session:
-        return redirect(url_for("signin"))
+    data = request.get_json(silent=True) or {}
+    ids = data.get("ids")
+    if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+        return {"success": False, "error": "ids must be a list of request ids"}, 400
 
-    user_id = session["user_id"]
-    db = get_db()
+    try:
+        answered, closed = answer_swap_requests(get_db(), ids, data.get("action"))
+    except ActionError as e:
+        return {"success": False, "error": e.message}, e.status
 
-    item = db.execute("""
-        SELECT id, owner_id, is_active
-        FROM items
-        WHERE id = ?
-    """, (item_id,)).fetchone()
+    return jsonify(success=True, status=data["action"], **bulk_answer_result(ids, answered, closed))
 
-    if not item:
-        return "Item not found", 404
-    if item["owner_id"] == user_id:
-        return "You cannot request your own item", 403
-    if item["is_active"] != 1:
-        return "Item not available", 400
 
-    existing = db.execute("""
-        SELECT id FROM swap_requests
-        WHERE item_id = ? AND requester_id = ? AND status = 'pending'
-    """, (item_id, user_id)).fetchone()
-    if existing:
-        flash("Request already sent.", "warning")
-        return redirect(url_for("browse_items", item_id=item_id))
 
-    db.execute("""
-        INSERT INTO swap_requests (item_id, requester_id, owner_id, status)
-        VALUES (?, ?, ?, 'pending')
-    """, (item_id, user_id, item["owner_id"]))
+def send_swap_request(db, item_id, message=None):
+    """Ask the owner of item_id for a swap. Returns the new request's id."""
+    try:
+        swap = swaps.create(db, item_id, session["user_id"], message)
+    except swaps.SwapError as e:
+        raise ActionError(e.message, e.status)
+
+    note = notification_store.create(
+        db, swap["owner_id"], "swap_request",
+        f"{session['username']} wants to swap for your {swap['item_name']}.",
+        link=url_for("swap_requests"), swap_request_id=swap["id"], status="pending")
+    events.record(db, events.SWAP_REQUESTED, session["user_id"], [
+        (swap["owner_id"], note["message"]),
+        (session["user_id"], f"You asked {swap['owner_name']} to swap for {swap['item_name']}."),
+    ], item_id=item_id, swap_request_id=swap["id"], data={"item_name": swap["item_name"]})
     db.commit()
+    get_notification_bus().publish(swap["owner_id"], note)
+    return swap["id"]
+
+@app.route("/swap/request/<int:item_id>", methods=["POST"])
+def request_swap(item_id):
+    if "user_id" not in session:
+        return redirect(url_for("signin"))
+
+    try:
+        send_swap_request(get_db(), item_id)
+    except ActionError as e:
+        if e.status == 409:
+            flash(e.message, "warning")
+            return redirect(url_for("browse_items", item_id=item_id))
+        return e.message, e.status
 
     flash("Swap request sent successfully.", "success")
     return redirect(url_for("browse_items", item_id=item_id,))
@@ -338,12 +1153,18 @@ def request_swap(item_id):
 
 
 
+def profile_volatile(db, user_id):
+    # View counts on the listings are flushed without bumping a stamp
+    row = db.execute("SELECT total_views FROM user_stats WHERE user_id = ?", (user_id,)).fetchone()
+    return (row[0] if row else 0,)
+
 @app.route("/profile")
+@conditional_page(lambda user_id: [f"user:{user_id}"], profile_volatile)
 def profile():
     if "user_id" not in session:
         return redirect(url_for("signin"))
 
-    db = get_db()
+    db = get_read_db()
     user_id = session["user_id"]
 
      # Active listings
@@ -363,6 +1184,7 @@ def profile():
         items.name,
         items.category,
         items.image,
+        items.image_variants,
         users.username AS owner_name
     FROM saved_items
     JOIN items ON saved_items.item_id = items.id
@@ -371,9 +1193,10 @@ def profile():
       AND items.is_active = 1
     """, (session['user_id'],)).fetchall()
 
-    user = db.execute("SELECT profile_picture FROM users WHERE id = ?", (user_id,)).fetchone()
+    user = db.execute("SELECT profile_picture, profile_picture_variants FROM users WHERE id = ?", (user_id,)).fetchone()
     if user and user["profile_picture"]:
         session["profile_picture"] = user["profile_picture"]
+        session["profile_picture_variants"] = user["profile_picture_variants"]
 
 
     return render_template(
@@ -409,11 +1232,11 @@ def change_password():
     user = db.execute('SELECT password_hash FROM users WHERE id = ?', (session['user_id'],)).fetchone()
 
     # Check current password
-    if not user or not check_password_hash(user['password_hash'], current_password):
+    if not user or not get_password_hasher().check(user['password_hash'], current_password):
         return redirect(url_for('profile', error='Current password is incorrect'))
 
     # Hash the new password
-    hashed_password = generate_password_hash(new_password)
+    hashed_password = get_password_hasher().hash(new_password)
 
     # Update the password in the database
     db.execute('UPDATE users SET password_hash = ? WHERE id = ?', (hashed_password, session['user_id']))
@@ -453,10 +1276,13 @@ def update_profile():
         WHERE id = ?
     ''', (username, email, phone, hostel, session['user_id']))
     db.commit()
+    get_match_engine().user_changed(session['user_id'])  # hostel affects match scores
+    invalidate_user(db, session['user_id'])
     
     # Update session
     session['username'] = username
     session['email'] = email
+    session['hostel'] = hostel
 
     return redirect(url_for('profile', success='Profile updated successfully'))
 @app.route("/profile/upload-picture", methods=["POST"])
@@ -481,19 +1307,32 @@ def upload_profile_picture():
         flash("Invalid file type. Use PNG, JPG, or WEBP.", "error")
         return redirect(url_for("profile"))
 
-    # Create unique filename
-    filename = f"profile_{session['user_id']}.{ext}"
-    save_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-    file.save(save_path)
+    # Stored under its content hash, so the URL changes with the picture
+    try:
+        filename, variants = store_upload(file)
+    except images.ImageError as e:
+        flash(str(e), "error")
+        return redirect(url_for("profile"))
 
-    # Update DB
+    # Update DB (variants are filled in once the pipeline has made them,
+    # unless this image has been uploaded before)
     db = get_db()
-    db.execute("UPDATE users SET profile_picture = ? WHERE id = ?",
-               (filename, session["user_id"]))
+    old = db.execute("SELECT profile_picture, profile_picture_variants FROM users WHERE id = ?",
+                     (session["user_id"],)).fetchone()
+    db.execute("UPDATE users SET profile_picture = ?, profile_picture_variants = ? WHERE id = ?",
+               (filename, variants, session["user_id"]))
+    if old and old["profile_picture"] != filename:
+        schedule_upload_removal(db, [(old["profile_picture"], old["profile_picture_variants"])])
     db.commit()
+    if not variants:
+        process_upload("users", session["user_id"], filename)
 
     # Update session
     session["profile_picture"] = filename
+    if variants:
+        session["profile_picture_variants"] = variants
+    else:
+        session.pop("profile_picture_variants", None)
 
     flash("Profile picture updated!", "success")
     return redirect(url_for("profile"))
@@ -504,22 +1343,19 @@ def delete_profile_picture():
         return redirect(url_for("signin"))
 
     db = get_db()
-    user = db.execute("SELECT profile_picture FROM users WHERE id = ?", 
+    user = db.execute("SELECT profile_picture, profile_picture_variants FROM users WHERE id = ?", 
                       (session["user_id"],)).fetchone()
 
     if user and user["profile_picture"]:
-        # Delete file from disk
-        file_path = os.path.join(app.config["UPLOAD_FOLDER"], user["profile_picture"])
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
-        # Clear from DB
-        db.execute("UPDATE users SET profile_picture = NULL WHERE id = ?", 
+        # Clear from DB; the file (and its resized variants) go in the background
+        db.execute("UPDATE users SET profile_picture = NULL, profile_picture_variants = NULL WHERE id = ?", 
                    (session["user_id"],))
+        schedule_upload_removal(db, [(user["profile_picture"], user["profile_picture_variants"])])
         db.commit()
 
         # Clear from session
         session.pop("profile_picture", None)
+        session.pop("profile_picture_variants", None)
 
     flash("Profile picture removed.", "success")
     return redirect(url_for("profile"))
@@ -535,19 +1371,24 @@ def delete_account():
     user_id = session['user_id']
     db = get_db()
     
-    # Delete user's images
-    items = db.execute('SELECT image FROM items WHERE owner_id = ?', (user_id,)).fetchall()
-    for item in items:
-        if item['image']:
-            try:
-                os.remove(os.path.join(app.config['UPLOAD_FOLDER'], item['image']))
-            except:
-                pass
+    # Delete user's images (in the background, once the rows are gone)
+    items = db.execute('SELECT image, image_variants FROM items WHERE owner_id = ?', (user_id,)).fetchall()
+    uploads = [(item['image'], item['image_variants']) for item in items]
+    user = db.execute('SELECT profile_picture, profile_picture_variants FROM users WHERE id = ?', (user_id,)).fetchone()
+    if user:
+        uploads.append((user['profile_picture'], user['profile_picture_variants']))
+    schedule_upload_removal(db, uploads)
     
+    item_ids = [row['id'] for row in db.execute('SELECT id FROM items WHERE owner_id = ?', (user_id,))]
+
     # Delete all user data (cascading should handle this if set up properly)
     db.execute('DELETE FROM items WHERE owner_id = ?', (user_id,))
     db.execute('DELETE FROM users WHERE id = ?', (user_id,))
     db.commit()
+
+    for item_id in item_ids:
+        get_match_engine().item_removed(item_id)
+    invalidate_items(*item_ids)
     
     # Clear session
     session.clear()
@@ -577,16 +1418,20 @@ def delete_item(item_id):
         return redirect(url_for("profile"))
 
     
-    # Delete image file if exists
-    if item['image']:
-        try:
-            os.remove(os.path.join(app.config['UPLOAD_FOLDER'], item['image']))
-        except:
-            pass
-    
-    # Delete from database
+    # People still waiting on a request for it hear that it's gone
+    waiting = [row[0] for row in db.execute(
+        "SELECT requester_id FROM swap_requests WHERE item_id = ? AND status = 'pending'", (item_id,))]
+    events.record(db, events.DELISTED, session['user_id'],
+                  [(session['user_id'], f"You removed {item['name']}.")] +
+                  [(user_id, f"{item['name']} was removed by its owner.") for user_id in waiting],
+                  item_id=item_id, data={"item_name": item["name"]})
+
+    # Delete from database, and the image file (and its resized variants) after
     db.execute('DELETE FROM items WHERE id = ?', (item_id,))
+    schedule_upload_removal(db, [(item['image'], item['image_variants'])])
     db.commit()
+    get_match_engine().item_removed(item_id)
+    invalidate_items(item_id)
     
     flash("Item deleted successfully.", "success")
     return redirect(url_for("profile"))
@@ -594,72 +1439,176 @@ def delete_item(item_id):
 
 
 # Browse Items Route
-@app.route('/browseItems')
-def browse_items():
-    if 'user_id' not in session:
-        return redirect(url_for('signin'))
-    
-    # Get search parameters
-    search = request.args.get('search', '')
-    category = request.args.get('category', '')
-    sort = request.args.get('sort', 'newest')
-    
-    db = get_db()
-    
+def fetch_browse_page(db, search, category, sort, cursor=None, size=None, hostel=None):
+    """Return (items, next_cursor) for one page of the browse listing.
+
+    Pages are cached until an item is listed, changed or removed; only the
+    per-user parts (requested_ids) are looked up on every request.
+    `hostel` is the viewer's, which sort=nearest orders by.
+    """
+    size = size or app.config["BROWSE_PAGE_SIZE"]
+    timeout = app.config["CACHE_POPULAR_TIMEOUT"] if sort == "popular" else None
+    hostel = proximity.normalize(hostel) if sort == "nearest" else ""
+    return get_cache().get_or_set(
+        f"browse:{search}|{category}|{sort}|{cursor}|{size}|{hostel}", ["items"],
+        lambda: query_browse_page(db, search, category, sort, cursor, size, hostel),
+        timeout=timeout
+    )
+
+def query_browse_page(db, search, category, sort, cursor, size, hostel=None):
     # Build query
+    select = "SELECT items.*, users.username as owner_name, users.hostel"
     query = '''
-        SELECT items.*, users.username as owner_name, users.hostel 
         FROM items 
         JOIN users ON items.owner_id = users.id 
-        WHERE items.is_active = 1
     '''
+    where = " WHERE items.is_active = 1"
     params = []
+    rank = None
     
-    # Add search filter
+    # Add search filter (FTS5 index, or LIKE if FTS5 isn't compiled in)
     if search:
-        query += " AND (items.name LIKE ? OR items.description LIKE ?)"
-        params.extend([f'%{search}%', f'%{search}%'])
+        join, search_where, search_params, rank = item_search.filter_clause(
+            search, app.config.get("SEARCH_FTS", False))
+        query += join
+        where += search_where
+        params.extend(search_params)
     
     # Add category filter
     if category:
-        query += " AND items.category = ?"
+        where += " AND items.category = ?"
         params.append(category)
+
+    # Own hostel first, then nearby ones: merged per-hostel index scans
+    if sort == 'nearest':
+        items, has_more = proximity.nearest_page(
+            db, get_hostel_distances().bands(hostel), select + query, where, params, size,
+            pagination.decode_cursor(cursor, sort))
+        next_cursor = None
+        if has_more:
+            last = items[-1]
+            next_cursor = pagination.encode_cursor(sort, [last["distance_band"], last["created_at"], last["id"]])
+        return items, next_cursor
+
+    # Add sorting (keyset: the cursor holds the sort key of the last row seen)
+    if sort == 'relevance' and rank:
+        select += f", {rank} AS search_rank"
+        columns, direction = (rank, "items.id"), "ASC"
+        row_key = ("search_rank", "id")
+    else:
+        if sort not in pagination.SORT_KEYS:
+            sort = 'newest'
+        columns, direction = pagination.SORT_KEYS[sort]
+        row_key = tuple(c.split(".")[1] for c in columns)
+
+    after = pagination.decode_cursor(cursor, sort)
+    keyset_where, keyset_params, order_by = pagination.keyset_clause(columns, direction, after)
+
+    query = select + query + where + keyset_where + order_by + " LIMIT ?"
+    params.extend(keyset_params)
+    params.append(size + 1)
+
+    rows = [dict(row) for row in db.execute(query, params).fetchall()]
+    items, has_more = pagination.split_page(rows, size)
+
+    next_cursor = None
+    if has_more:
+        last = items[-1]
+        next_cursor = pagination.encode_cursor(sort, [last[k] for k in row_key])
+    return items, next_cursor
+
+def requested_ids(db, user_id, item_ids):
+    # Only look up the items actually on this page
+    if not item_ids:
+        return set()
+    marks = ", ".join("?" for _ in item_ids)
+    rows = db.execute(f"""
+        SELECT item_id FROM swap_requests
+        WHERE requester_id = ? AND status = 'pending' AND item_id IN ({marks})
+    """, (user_id, *item_ids)).fetchall()
+    return {row['item_id'] for row in rows}
+
+def browse_args():
+    search = request.args.get('search', '').strip()
+    category = request.args.get('category', '')
+    sort = request.args.get('sort') or ('relevance' if search else 'newest')
+    cursor = request.args.get('cursor')
+    size = pagination.page_size(request.args.get('limit'), app.config["BROWSE_PAGE_SIZE"])
+    return search, category, sort, cursor, size
+
+def browse_volatile(db, user_id):
+    # Popular order follows view counts; revalidate it as often as it's re-cached
+    if request.args.get('sort') != 'popular':
+        return ()
+    return (int(time.time() // max(app.config["CACHE_POPULAR_TIMEOUT"], 1)),)
+
+def browse_scopes(user_id):
+    # The listing itself, plus this user's own pending requests
+    return ["items", f"user:{user_id}"]
+
+@app.route('/browseItems')
+@conditional_page(browse_scopes, browse_volatile)
+def browse_items():
+    if 'user_id' not in session:
+        return redirect(url_for('signin'))
     
-    # Add sorting
-    if sort == 'newest':
-        query += " ORDER BY items.created_at DESC"
-    elif sort == 'oldest':
-        query += " ORDER BY items.created_at ASC"
-    elif sort == 'popular':
-        query += " ORDER BY items.views DESC"
+    # Get search parameters
+    search, category, sort, cursor, size = browse_args()
     
-    items = db.execute(query, params).fetchall()
+    db = get_read_db()
+    items, next_cursor = fetch_browse_page(db, search, category, sort, cursor, size, session.get("hostel"))
 
-    user_id = session.get("user_id")
-    requested_items = db.execute("""
-        SELECT item_id FROM swap_requests
-        WHERE requester_id = ? AND status = 'pending'
-    """, (user_id,)).fetchall()
+    requested_item_ids = requested_ids(db, session.get("user_id"), [i['id'] for i in items])
 
-    requested_item_ids = {row['item_id'] for row in requested_items}
+    next_url = None
+    if next_cursor:
+        next_url = url_for('browse_items', search=search or None, category=category or None,
+                           sort=sort, cursor=next_cursor)
     
     return render_template('browseItems.html', 
                          items=items, 
                          username=session.get("username"),
-                         requested_item_ids=requested_item_ids)
+                         requested_item_ids=requested_item_ids,
+                         next_url=next_url,
+                         is_first_page=not cursor)
+
+# JSON version of the listing for infinite scroll
+@app.route('/browseItems.json')
+@conditional_page(browse_scopes, browse_volatile)
+def browse_items_json():
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'error': 'Not logged in'}), 401
 
+    search, category, sort, cursor, size = browse_args()
+
+    db = get_read_db()
+    items, next_cursor = fetch_browse_page(db, search, category, sort, cursor, size, session.get("hostel"))
+    requested_item_ids = requested_ids(db, session["user_id"], [i['id'] for i in items])
+
+    return jsonify(
+        success=True,
+        items=[{
+            "id": i["id"],
+            "name": i["name"],
+            "category": i["category"],
+            "description": i["description"],
+            "condition": i["condition"],
+            "image": url_for('static', filename='uploads/' + i["image"]) if i["image"] else None,
+            "hostel": i["hostel"],
+            "owner_id": i["owner_id"],
+            "owner_name": i["owner_name"],
+            "views": i["views"],
+            "created_at": i["created_at"],
+            "requested": i["id"] in requested_item_ids,
+        } for i in items],
+        next_cursor=next_cursor,
+        has_more=next_cursor is not None
+    )
 
 
-@app.route('/item/<int:item_id>')
-def item_detail(item_id):
-    if 'user_id' not in session:
-        return redirect(url_for('signin'))
 
-    user_id = session.get("user_id")
-    db = get_db()
-    
-    # Fetch item and owner info
-    item = db.execute("""
+def fetch_item(db, item_id):
+    row = db.execute("""
         SELECT 
             i.id,
             i.name,
@@ -667,6 +1616,7 @@ def item_detail(item_id):
             i.category,
             i.condition,
             i.image,
+            i.image_variants,
             i.created_at,
             i.is_active,
             u.id as owner_id,
@@ -677,10 +1627,29 @@ def item_detail(item_id):
         JOIN users u ON i.owner_id = u.id
         WHERE i.id = ?
     """, (item_id,)).fetchone()
+    return dict(row) if row else None
+
+# A 304 skips the view count, but a revalidation comes from a browser that
+# has already seen the page, which the de-duplication would drop anyway
+@app.route('/item/<int:item_id>')
+@conditional_page(lambda user_id, item_id: [f"item:{item_id}", f"user:{user_id}"])
+def item_detail(item_id):
+    if 'user_id' not in session:
+        return redirect(url_for('signin'))
+
+    user_id = session.get("user_id")
+    db = get_read_db()
+    
+    # Fetch item and owner info
+    item = get_cache().get_or_set(f"item:{item_id}", [f"item:{item_id}"], lambda: fetch_item(db, item_id))
 
     if not item:
         return redirect(url_for('browse_items'))
 
+    # Buffered and written in batches; owners looking at their own item don't count
+    if item["owner_id"] != user_id:
+        get_view_counter().record(item_id, viewer=user_id)
+
     # Check if current user already requested this item
     requested = False
     if user_id:
@@ -721,7 +1690,7 @@ def upload():
                                  username=session.get("username"))
         
         # Handle image upload
-        image_filename = None
+        image_filename = image_variants = None
         if 'image' in request.files:
             file = request.files['image']
             
@@ -733,15 +1702,15 @@ def upload():
                                          error="Invalid file type. Only PNG, JPG, and JPEG are allowed",
                                          username=session.get("username"))
                 
-                # Secure the filename and make it unique
-                filename = secure_filename(file.filename)
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                image_filename = f"{timestamp}_{filename}"
-                
-                # Save the file
+                # Stored under its content hash (and only once, however
+                # many listings use the same image); it must really be an
+                # image before the listing is accepted
                 try:
-                    file_path = os.path.join(app.config['UPLOAD_FOLDER'], image_filename)
-                    file.save(file_path)
+                    image_filename, image_variants = store_upload(file)
+                except images.ImageError as e:
+                    return render_template('Upload.html', 
+                                         error=str(e),
+                                         username=session.get("username"))
                 except Exception as e:
                     return render_template('Upload.html', 
                                          error=f"Failed to upload image: {str(e)}",
@@ -750,29 +1719,30 @@ def upload():
         # Insert into database
         try:
             db = get_db()
-            db.execute('''
+            cursor = db.execute('''
                 INSERT INTO items (
                     owner_id, name, category, description, condition, 
-                    looking_for, hostel, contact_method, image, 
+                    looking_for, hostel, contact_method, image, image_variants,
                     is_active, views, created_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1, 0, datetime('now'))
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, 0, datetime('now'))
             ''', (
                 session['user_id'], name, category, description, condition,
-                looking_for, hostel, contact_method, image_filename
+                looking_for, hostel, contact_method, image_filename, image_variants
             ))
+            events.record(db, events.LISTED, session['user_id'], [(session['user_id'], f"You listed {name}.")],
+                          item_id=cursor.lastrowid, data={"item_name": name})
             db.commit()
+
+            if image_filename and not image_variants:
+                process_upload("items", cursor.lastrowid, image_filename)
+            get_match_engine().item_listed(cursor.lastrowid)
+            invalidate_items(cursor.lastrowid)
             
             # Redirect to browse page after successful upload
             return redirect(url_for('browse_items'))
             
         except Exception as e:
-            # If database insert fails and image was uploaded, delete the image
-            if image_filename:
-                try:
-                    os.remove(os.path.join(app.config['UPLOAD_FOLDER'], image_filename))
-                except:
-                    pass
-            
+            # An image stored for a listing that failed is left to the upload GC
             return render_template('Upload.html', 
                                  error=f"Failed to create listing: {str(e)}",
                                  username=session.get("username"))
@@ -780,6 +1750,12 @@ def upload():
     # GET request - show the form
     return render_template('Upload.html', username=session.get("username"))
 
+def record_save_event(db, item_id, item):
+    events.record(db, events.SAVED, session["user_id"], [
+        (session["user_id"], f"You saved {item['name']}."),
+        (item["owner_id"], f"{session['username']} saved your {item['name']}."),
+    ], item_id=item_id, data={"item_name": item["name"]})
+
 # Save item function (for the heart button)
 @app.route('/save-item/<int:item_id>', methods=['POST'])
 def save_item(item_id):
@@ -791,7 +1767,7 @@ def save_item(item_id):
     db = get_db()
 
     item = db.execute("""
-        SELECT id, owner_id, is_active
+        SELECT id, owner_id, is_active, name
         FROM items
         WHERE id = ?
     """, (item_id,)).fetchone()
@@ -821,6 +1797,7 @@ def save_item(item_id):
         INSERT INTO saved_items (user_id, item_id)
         VALUES (?, ?)
     """, (user_id, item_id))
+    record_save_event(db, item_id, item)
     db.commit()
 
     flash("Item saved successfully.", "success")
@@ -850,24 +1827,325 @@ def unsave_item(item_id):
 
 @app.route('/notifications')
 def notifications():
-    return render_template('notifications.html', username=session["username"])
+    if 'user_id' not in session:
+        return redirect(url_for('signin'))
+
+    db = get_db()
+    user_id = session['user_id']
+    items = [dict(n, time_ago=time_ago(n['created_at']))
+             for n in notification_store.recent(db, user_id)]
+    # Opening the page is what marks them read
+    notification_store.mark_read(db, user_id)
+    db.commit()
+
+    return render_template('notifications.html', username=session["username"], notifications=items)
 
+@app.route('/notifications/stream')
+def notifications_stream():
+    if 'user_id' not in session:
+        return Response(status=401)
 
+    user_id = session['user_id']
+    bus = get_notification_bus()
+    try:
+        subscription = bus.subscribe(user_id)
+    except notification_store.StreamLimitReached:
+        # EventSource gives up on a 503; the page retries after Retry-After
+        return Response("Too many open notification streams", status=503,
+                        headers={"Retry-After": "30"})
+
+    # Set by the browser when it reconnects; missing on a fresh page load
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_id")
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        last_id = None
+
+    response = Response(
+        notification_store.stream(get_pool(readonly=True), user_id, subscription, last_id,
+                             heartbeat=app.config["NOTIFY_HEARTBEAT"],
+                             max_age=app.config["NOTIFY_STREAM_AGE"]),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # Runs when the stream ends or the client goes away
+    response.call_on_close(lambda: bus.unsubscribe(user_id, subscription))
+    return response
+
+
+
+# --- JSON API (v1) ---
+# The same data as the pages, for mobile and single-page clients, signed in
+# with the same session cookie. Bodies are msgspec Structs (see api.py).
+def api_view(view):
+    @wraps(view)
+    def wrapper(**kwargs):
+        if "user_id" not in session:
+            return api.response(api.Error("Not signed in"), 401)
+        try:
+            return view(**kwargs)
+        except (api.ApiError, ActionError) as e:
+            return api.response(api.Error(e.message), e.status)
+    return wrapper
+
+@app.route("/api/v1/items")
+@conditional_page(browse_scopes, browse_volatile)
+@api_view
+def api_items():
+    search, category, sort, cursor, size = browse_args()
+
+    db = get_read_db()
+    items, next_cursor = fetch_browse_page(db, search, category, sort, cursor, size, session.get("hostel"))
+    requested_item_ids = requested_ids(db, session["user_id"], [i['id'] for i in items])
+
+    return api.response(api.ItemPage(
+        items=[api.item_summary(url_for, i, i["id"] in requested_item_ids) for i in items],
+        next_cursor=next_cursor,
+        has_more=next_cursor is not None,
+    ))
+
+@app.route("/api/v1/items/<int:item_id>")
+@conditional_page(lambda user_id, item_id: [f"item:{item_id}", f"user:{user_id}"])
+@api_view
+def api_item(item_id):
+    user_id = session["user_id"]
+    db = get_read_db()
+    item = get_cache().get_or_set(f"item:{item_id}", [f"item:{item_id}"], lambda: fetch_item(db, item_id))
+    if not item:
+        raise api.ApiError(404, "Item not found")
+
+    if item["owner_id"] != user_id:
+        get_view_counter().record(item_id, viewer=user_id)
+
+    requested = db.execute("""
+        SELECT 1 FROM swap_requests
+        WHERE item_id = ? AND requester_id = ? AND status = 'pending'
+    """, (item_id, user_id)).fetchone() is not None
+    saved = db.execute(
+        "SELECT 1 FROM saved_items WHERE user_id = ? AND item_id = ?", (user_id, item_id)
+    ).fetchone() is not None
+
+    return api.response(api.ItemDetail(
+        id=item["id"], name=item["name"], description=item["description"],
+        category=item["category"], condition=item["condition"], created_at=item["created_at"],
+        is_active=item["is_active"] == 1,
+        owner=api.Owner(id=item["owner_id"], username=item["owner_name"],
+                        hostel=item["owner_hostel"], phone=item["owner_phone"]),
+        image=api.image(url_for, item["image"], item["image_variants"]),
+        requested=requested, saved=saved,
+    ))
+
+@app.route("/api/v1/saved")
+@api_view
+def api_saved():
+    rows = get_read_db().execute("""
+        SELECT items.id, items.name, items.category, items.image, items.image_variants,
+               users.username AS owner_name
+        FROM saved_items
+        JOIN items ON saved_items.item_id = items.id
+        JOIN users ON items.owner_id = users.id
+        WHERE saved_items.user_id = ? AND items.is_active = 1
+        ORDER BY saved_items.id DESC
+    """, (session["user_id"],)).fetchall()
+    return api.response([
+        api.SavedItem(id=r["id"], name=r["name"], category=r["category"], owner_name=r["owner_name"],
+                      image=api.image(url_for, r["image"], r["image_variants"]))
+        for r in rows
+    ])
+
+@app.route("/api/v1/saved", methods=["POST"])
+@api_view
+def api_save():
+    body = api.decode(request.get_data(), api.SaveItem)
+    db = get_db()
+    item = db.execute("SELECT owner_id, is_active, name FROM items WHERE id = ?", (body.item_id,)).fetchone()
+    if not item:
+        raise ActionError("Item not found", 404)
+    if item["is_active"] != 1:
+        raise ActionError("Item not available", 400)
+    if item["owner_id"] == session["user_id"]:
+        raise ActionError("Cannot save your own item", 403)
+    saved = db.execute("INSERT OR IGNORE INTO saved_items (user_id, item_id) VALUES (?, ?)",
+                       (session["user_id"], body.item_id)).rowcount
+    if saved:
+        record_save_event(db, body.item_id, item)
+    db.commit()
+    return "", 204
+
+@app.route("/api/v1/saved/<int:item_id>", methods=["DELETE"])
+@api_view
+def api_unsave(item_id):
+    db = get_db()
+    db.execute("DELETE FROM saved_items WHERE user_id = ? AND item_id = ?", (session["user_id"], item_id))
+    db.commit()
+    return "", 204
+
+@app.route("/api/v1/swaps")
+@api_view
+def api_swaps():
+    incoming, outgoing = fetch_swap_requests(get_read_db(), session["user_id"])
+    return api.response(api.SwapRequests(
+        incoming=[api.swap_request(r, r["requester_name"]) for r in incoming],
+        outgoing=[api.swap_request(r, r["owner_name"]) for r in outgoing],
+    ))
+
+def api_swap(db, request_id, incoming):
+    other = "sr.requester_id" if incoming else "sr.owner_id"
+    row = db.execute(f"""
+        SELECT sr.*, i.name AS item_name, u.username AS other_user
+        FROM swap_requests sr
+        JOIN items i ON i.id = sr.item_id
+        JOIN users u ON u.id = {other}
+        WHERE sr.id = ?
+    """, (request_id,)).fetchone()
+    return api.swap_request(row, row["other_user"])
+
+@app.route("/api/v1/swaps", methods=["POST"])
+@api_view
+def api_request_swap():
+    body = api.decode(request.get_data(), api.NewSwapRequest)
+    db = get_db()
+    request_id = send_swap_request(db, body.item_id, body.message or None)
+    return api.response(api_swap(db, request_id, incoming=False), 201)
+
+@app.route("/api/v1/swaps/<int:request_id>/respond", methods=["POST"])
+@api_view
+def api_respond_to_swap(request_id):
+    body = api.decode(request.get_data(), api.SwapResponse)
+    db = get_db()
+    answer_swap_request(db, request_id, body.action)
+    return api.response(api_swap(db, request_id, incoming=True))
+
+@app.route("/api/v1/swaps/respond", methods=["POST"])
+@api_view
+def api_respond_to_swaps():
+    body = api.decode(request.get_data(), api.BulkSwapResponse)
+    answered, closed = answer_swap_requests(get_db(), body.ids, body.action)
+    return api.response(api.BulkSwapResult(**bulk_answer_result(body.ids, answered, closed)))
+
+@app.route("/api/v1/dashboard")
+@api_view
+def api_dashboard():
+    dashboard_stats, _ = fetch_dashboard(get_read_db(), session["user_id"])
+    return api.response(api.DashboardStats(**dashboard_stats))
+
+@app.route("/health")
+def health():
+    # For load balancers; the internals are at /health/details
+    return jsonify(status="ok")
+
+@app.route("/health/details")
+def health_details():
+    if not can_read_metrics():
+        abort(404)
+    return jsonify(
+        status="ok",
+        db={"write": get_pool().stats(), "read": get_pool(readonly=True).stats()},
+        views=get_view_counter().stats(),
+        matches=get_match_engine().stats(),
+        cache=get_cache().stats(),
+        uploads=get_blob_store().stats(),
+        notifications=get_notification_bus().stats(),
+        passwords=get_password_hasher().stats(),
+        jobs=dict(get_job_worker().stats(), queue=jobs.depth(get_read_db())),
+        sessions=app.session_interface.stats() if hasattr(app.session_interface, "stats") else None,
+        startup=app.extensions["startup"],
+        admission=app.extensions["admission"].stats()
+    )
+
+def is_admin():
+    return session.get("username") in app.config["ADMIN_USERS"]
+
+def can_read_metrics():
+    # ADMIN_USERS, or a scraper sending "Authorization: Bearer <METRICS_TOKEN>"
+    token = app.config["METRICS_TOKEN"]
+    return is_admin() or bool(token and request.headers.get("Authorization") == f"Bearer {token}")
+
+@app.route("/export/<table>.<fmt>")
+def export_data(table, fmt):
+    # A user's own listings, swap requests and saved items; admins can add
+    # ?scope=all for the whole database
+    if 'user_id' not in session:
+        return redirect(url_for('signin'))
+    if (table not in bulk.EXPORT_TABLES and table != "all") or fmt not in bulk.FORMATS \
+            or (table == "all" and fmt != "jsonl"):
+        abort(404)
+    everything = request.args.get("scope") == "all"
+    if everything and not is_admin():
+        abort(403)
+    user_id = None if everything else session['user_id']
+
+    pool = get_pool(readonly=True)
+    chunks = (bulk.export_all(pool, user_id) if table == "all"
+              else bulk.export(pool, table, fmt, user_id))
+    response = Response(chunks, mimetype="text/csv" if fmt == "csv" else "application/x-ndjson")
+    response.headers["Content-Disposition"] = f'attachment; filename="sharespace-{table}.{fmt}"'
+    return response
+
+@app.route("/import", methods=["POST"])
+def import_listings():
+    # Listings from a JSONL/CSV file, all owned by the signed-in user. Sending
+    # the same `checkpoint` name again resumes after the last committed batch.
+    if 'user_id' not in session:
+        return jsonify(error="Not signed in"), 401
+    file = request.files.get("file")
+    if not file or file.filename == "":
+        return jsonify(error="No file uploaded"), 400
+    fmt = request.form.get("format") or bulk.guess_format(file.filename)
+    if fmt not in bulk.FORMATS:
+        return jsonify(error=f"Format must be one of {', '.join(bulk.FORMATS)}"), 400
+    name = request.form.get("checkpoint")
+    user_id = session['user_id']
+
+    errors = []
+    def report(number, message):
+        if len(errors) < IMPORT_ERROR_LIMIT:
+            errors.append({"record": number, "error": message})
+
+    def listed(ids):
+        for item_id in ids:
+            get_match_engine().item_listed(item_id)
+        invalidate_items()
+
+    try:
+        summary = bulk.import_items(get_db(), file.stream, fmt, owner_id=user_id,
+                                    name=f"user:{user_id}:{name}" if name else None,
+                                    on_error=report, on_batch=listed)
+    except bulk.RowError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(dict(summary, errors=errors))
+
+@app.route("/metrics")
+def metrics_endpoint():
+    if not can_read_metrics():
+        abort(404)
+    return Response(get_metrics().render(), mimetype="text/plain; version=0.0.4")
 
 @app.route("/logout")
 def logout():
     session.clear()
     return redirect("/")
 
+@app.errorhandler(passwords.Busy)
+def password_hashing_busy(e):
+    # A sign-in burst; ask the browser to come back instead of queueing
+    response = make_response("Lots of people are signing in right now. Please try again in a few seconds.", 503)
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
 @app.errorhandler(404)
 def page_not_found(e):
     return render_template("404.html"), 404
 
 
+init_db()
+init_assets()
+app.extensions["startup"] = {"ready": round(time.perf_counter() - STARTED_AT, 3)}
+
+
 if __name__ == "__main__":
     from waitress import serve
     if os.getenv('FLASK_ENV') == 'production':
-        serve(app, host="0.0.0.0", port=8080)  # Production server
+        serve(app, host="0.0.0.0", port=8080, threads=app.config["WAITRESS_THREADS"])  # Production server
     else:
         app.run(debug=True, host="0.0.0.0", port=8080)  # Development server
 
@@ -0,0 +1,118 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # only gzip siblings are written
+    brotli = None
+
+# --- STATIC ASSET PIPELINE ---
+# build() copies every asset under static/{css,js,images} into static/dist
+# under a content-hashed name (css/tailwind.3f2a9c1b7d4e.css) and writes
+# precompressed .gz/.br siblings for the text formats. Because the name
+# changes whenever the content does, those files can be cached forever.
+
+SOURCE_DIRS = ("css", "js", "images")
+DIST_DIR = "dist"
+MANIFEST = "manifest.json"
+COMPRESS_EXTENSIONS = {".css", ".js", ".svg", ".json", ".txt"}
+HASH_LENGTH = 12
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def _hashed_name(path, digest):
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{digest[:HASH_LENGTH]}{ext}"
+
+
+def _write(path, data):
+    # Write then rename so a half-written file is never served
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build(static_folder, log=None):
+    """Fingerprint and precompress the static assets. Returns the manifest."""
+    dist = os.path.join(static_folder, DIST_DIR)
+    manifest = {}
+    wanted = {MANIFEST}
+
+    for source_dir in SOURCE_DIRS:
+        root = os.path.join(static_folder, source_dir)
+        for dirpath, _, filenames in os.walk(root):
+            for name in sorted(filenames):
+                src = os.path.join(dirpath, name)
+                logical = os.path.relpath(src, static_folder).replace(os.sep, "/")
+                with open(src, "rb") as f:
+                    data = f.read()
+
+                hashed = _hashed_name(logical, hashlib.sha256(data).hexdigest())
+                out = os.path.join(dist, hashed)
+                manifest[logical] = f"{DIST_DIR}/{hashed}"
+                wanted.add(hashed)
+
+                compress = os.path.splitext(name)[1].lower() in COMPRESS_EXTENSIONS
+                if compress:
+                    wanted.add(hashed + ".gz")
+                    if brotli is not None:
+                        wanted.add(hashed + ".br")
+
+                # Same name means same content, so existing outputs are reused
+                if os.path.exists(out):
+                    continue
+                os.makedirs(os.path.dirname(out), exist_ok=True)
+                _write(out, data)
+                if compress:
+                    _write(out + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+                    if brotli is not None:
+                        _write(out + ".br", brotli.compress(data, quality=11))
+                if log:
+                    log(f"built {manifest[logical]}")
+
+    os.makedirs(dist, exist_ok=True)
+    _write(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode())
+
+    # Drop outputs left over from older versions of the assets
+    for dirpath, _, filenames in os.walk(dist):
+        for name in filenames:
+            rel = os.path.relpath(os.path.join(dirpath, name), dist).replace(os.sep, "/")
+            if rel not in wanted:
+                os.remove(os.path.join(dirpath, name))
+
+    return manifest
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def send_asset(static_folder, filename):
+    """Serve a fingerprinted file, precompressed if the client accepts it."""
+    directory = os.path.join(static_folder, DIST_DIR)
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    accepted = request.accept_encodings
+
+    encoding = None
+    for candidate, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if accepted[candidate] and os.path.isfile(os.path.join(directory, filename + suffix)):
+            encoding, filename = candidate, filename + suffix
+            break
+
+    response = send_from_directory(directory, filename, mimetype=mimetype, max_age=31536000)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Cache-Control"] = IMMUTABLE
+    response.vary.add("Accept-Encoding")
+    return response
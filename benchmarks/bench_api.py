@@ -0,0 +1,129 @@
+"""Compare the msgspec-encoded /api/v1 payloads with the jsonify equivalents.
+
+Times, for a browse page of --page items:
+  encode  building and encoding the response (jsonify of dicts vs Structs)
+  decode  reading a swap request body (json.loads + checks vs msgspec)
+  route   GET /browseItems.json vs GET /api/v1/items through the test client,
+          against a freshly seeded database with the page already cached
+
+    python benchmarks/bench_api.py [--requests 2000] [--page 50]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def timed(fn, n):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(label, variant, samples):
+    samples = sorted(samples)
+    total = sum(samples)
+    p = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+    print(f"{label:<7} {variant:<8} {len(samples) / total:9.0f} ops/s   "
+          f"p50 {p(0.50):7.3f} ms   p95 {p(0.95):7.3f} ms   "
+          f"mean {statistics.mean(samples) * 1000:7.3f} ms")
+
+
+def make_db(path, items):
+    import migrations
+    import seed
+
+    db = sqlite3.connect(path)
+    db.row_factory = sqlite3.Row
+    migrations.upgrade(db)
+    seed.seed(db, users=20, items=items, swaps=0, saved=0, log=lambda *a: None)
+    db.commit()
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--page", type=int, default=50, help="Items per browse page")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="sharespace-api-")
+    db_path = os.path.join(tmp, "bench.db")
+    make_db(db_path, max(args.page * 4, 500))
+    os.environ["SHARESPACE_DB"] = db_path
+    os.environ["SESSION_DB"] = os.path.join(tmp, "sessions.db")
+    os.environ["ASSETS_BUILD_ON_STARTUP"] = "0"
+    os.environ["CONDITIONAL_GET"] = "0"  # time the full response, not a 304
+    os.environ["SERVER_TIMING"] = "0"
+    os.environ["RATE_LIMITS"] = "0"
+    os.chdir(tmp)
+
+    from flask import jsonify, url_for
+    import api
+    import app as sharespace
+
+    app = sharespace.app
+    with app.app_context():
+        rows, _ = sharespace.query_browse_page(sharespace.get_read_db(), "", "", "newest", None, args.page)
+
+    with app.test_request_context():
+        def encode_jsonify():
+            return jsonify(
+                success=True,
+                items=[{
+                    "id": i["id"], "name": i["name"], "category": i["category"],
+                    "description": i["description"], "condition": i["condition"],
+                    "image": url_for("static", filename="uploads/" + i["image"]) if i["image"] else None,
+                    "hostel": i["hostel"], "owner_id": i["owner_id"], "owner_name": i["owner_name"],
+                    "views": i["views"], "created_at": i["created_at"], "requested": False,
+                } for i in rows],
+                next_cursor="abc", has_more=True,
+            ).get_data()
+
+        def encode_msgspec():
+            return api.response(api.ItemPage(
+                items=[api.item_summary(url_for, i) for i in rows],
+                next_cursor="abc", has_more=True,
+            )).get_data()
+
+        report("encode", "jsonify", timed(encode_jsonify, args.requests))
+        report("encode", "msgspec", timed(encode_msgspec, args.requests))
+
+    body = json.dumps({"item_id": 42, "message": "Would you swap for my calculator?"}).encode()
+
+    def decode_json():
+        data = json.loads(body)
+        if not isinstance(data, dict) or not isinstance(data.get("item_id"), int):
+            raise ValueError("item_id")
+        message = data.get("message", "")
+        if not isinstance(message, str) or len(message) > api.MAX_MESSAGE_LENGTH:
+            raise ValueError("message")
+        return data["item_id"], message
+
+    def decode_msgspec():
+        return api.decode(body, api.NewSwapRequest)
+
+    report("decode", "json", timed(decode_json, args.requests * 10))
+    report("decode", "msgspec", timed(decode_msgspec, args.requests * 10))
+
+    client = app.test_client()
+    client.post("/signin", data={"username": "user1", "password": "password"})
+    for path, variant in ((f"/browseItems.json?limit={args.page}", "jsonify"),
+                          (f"/api/v1/items?limit={args.page}", "msgspec")):
+        timed(lambda: client.get(path), 50)  # warm the page cache
+        report("route", variant, timed(lambda: client.get(path).get_data(), args.requests))
+
+
+if __name__ == "__main__":
+    main()
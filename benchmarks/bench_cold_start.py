@@ -0,0 +1,125 @@
+"""Time a cold start: a fresh Python process importing the app and serving its first pages.
+
+Each run starts a new interpreter, which imports app.py, signs in and GETs
+each page twice through the test client, reporting how long the import
+took, the first (cold) and second (warm) render of every page, and the
+time from launching the process to the first page being served. Runs are
+made with the Jinja bytecode cache off, empty (the first start after a
+deploy) and filled by `flask templates compile`:
+
+    python benchmarks/bench_cold_start.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+PAGES = ["/", "/dashboard", "/browseItems", "/swapRequests", "/profile"]
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import app as sharespace
+imported = time.perf_counter()
+client = sharespace.app.test_client()
+client.post("/signin", data={{"username": "user1", "password": "password"}})
+signed_in = time.perf_counter()
+pages = {{}}
+for path in {pages!r}:
+    times = []
+    for _ in range(2):
+        t = time.perf_counter()
+        status = client.get(path).status_code
+        times.append(time.perf_counter() - t)
+    assert status == 200, (path, status)
+    pages[path] = times
+print(json.dumps({{"import": imported - start, "signin": signed_in - imported, "pages": pages,
+                  "first_page": imported - start + signed_in - imported + pages[{first!r}][0]}}))
+"""
+
+
+def make_db(path):
+    import migrations
+    import seed
+
+    db = sqlite3.connect(path)
+    db.row_factory = sqlite3.Row
+    migrations.upgrade(db)
+    seed.seed(db, users=50, items=2000, swaps=400, saved=200, log=lambda *a: None)
+    db.commit()
+    db.close()
+
+
+def run_once(env):
+    code = CHILD.format(root=ROOT, pages=PAGES, first=PAGES[1])
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if out.returncode:
+        raise SystemExit(out.stderr)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result["process"] = wall
+    return result
+
+
+def report(label, results):
+    ms = lambda values: statistics.median(values) * 1000
+    print(f"\n{label}")
+    print(f"  process start to exit  {ms([r['process'] for r in results]):8.1f} ms")
+    print(f"  import app             {ms([r['import'] for r in results]):8.1f} ms")
+    print(f"  sign in                {ms([r['signin'] for r in results]):8.1f} ms")
+    for path in PAGES:
+        cold = ms([r["pages"][path][0] for r in results])
+        warm = ms([r["pages"][path][1] for r in results])
+        print(f"  {path:<22} {cold:8.1f} ms first   {warm:6.1f} ms after")
+    print(f"  import to first page   {ms([r['first_page'] for r in results]):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--mode", dest="modes", action="append", choices=("off", "empty", "precompiled"),
+                        help="Only these runs (repeatable)")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="sharespace-cold-")
+    db_path = os.path.join(tmp, "bench.db")
+    make_db(db_path)
+    jinja_cache = os.path.join(tmp, "jinja")
+    env = dict(os.environ, SHARESPACE_DB=db_path, SESSION_DB=os.path.join(tmp, "sessions.db"),
+               ASSETS_BUILD_ON_STARTUP="0", JOBS_WORKER_THREAD="0", PYTHONDONTWRITEBYTECODE="0")
+    os.chdir(tmp)
+    run_once(env)  # migrations, search index, matches and .pyc files; not timed
+
+    modes = {
+        "off": ("bytecode cache off", dict(env, JINJA_CACHE_DIR="")),
+        "empty": ("bytecode cache empty", dict(env, JINJA_CACHE_DIR=jinja_cache)),
+        "precompiled": ("bytecode cache precompiled", dict(env, JINJA_CACHE_DIR=jinja_cache)),
+    }
+    for mode in args.modes or modes:
+        label, run_env = modes[mode]
+        shutil.rmtree(jinja_cache, ignore_errors=True)
+        if mode == "precompiled":
+            subprocess.run([sys.executable, "-m", "flask", "--app", os.path.join(ROOT, "app.py"),
+                            "templates", "compile"], env=run_env, check=True, capture_output=True)
+        results = []
+        for _ in range(args.runs):
+            if mode == "empty":
+                shutil.rmtree(jinja_cache, ignore_errors=True)
+            results.append(run_once(run_env))
+        report(label, results)
+
+
+if __name__ == "__main__":
+    main()
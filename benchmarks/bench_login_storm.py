@@ -0,0 +1,136 @@
+"""How other pages hold up while a burst of sign-ins hashes passwords.
+
+Serves the app with waitress on a fresh seeded database and has one
+signed-in client load /browseItems back to back, first on its own and then
+while --storm clients keep POSTing /signin. Run per mode:
+
+  pool    hashing in the bounded process pool (PASSWORD_WORKERS, PASSWORD_MAX_PENDING)
+  inline  hashing in the request thread with no limit, as before
+
+    python benchmarks/bench_login_storm.py [--storm 32] [--seconds 10] [--threads 8]
+
+Without --mode both are run, each in its own process.
+"""
+import argparse
+import collections
+import logging
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_routes import HttpClient, PASSWORD, percentile
+
+
+def probe(client, seconds, path="/browseItems"):
+    samples = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        client.get(path)
+        samples.append(time.perf_counter() - start)
+    return sorted(samples)
+
+
+def storm(base_url, usernames, stop, statuses, latencies, seed):
+    rng = random.Random(seed)
+    client = HttpClient(base_url)
+    while not stop.is_set():
+        start = time.perf_counter()
+        status = client.post("/signin", {"username": rng.choice(usernames), "password": PASSWORD})
+        latencies.append(time.perf_counter() - start)
+        statuses[status] += 1
+
+
+def describe(label, samples):
+    ms = lambda q: percentile(samples, q) * 1000
+    print(f"  {label:<18} {len(samples):6} req   p50 {ms(0.50):8.1f} ms   "
+          f"p95 {ms(0.95):8.1f} ms   p99 {ms(0.99):8.1f} ms")
+
+
+def run(args):
+    import migrations
+    import seed
+
+    tmp = tempfile.mkdtemp(prefix="sharespace-storm-")
+    db_path = os.path.join(tmp, "bench.db")
+    db = sqlite3.connect(db_path)
+    db.row_factory = sqlite3.Row
+    migrations.upgrade(db)
+    seed.seed(db, users=args.users, items=args.users * 10, swaps=0, saved=0, log=lambda *a: None)
+    db.commit()
+    usernames = [row[0] for row in db.execute("SELECT username FROM users")]
+    db.close()
+
+    os.environ.update({
+        "SHARESPACE_DB": db_path,
+        "SESSION_DB": os.path.join(tmp, "sessions.db"),
+        "ASSETS_BUILD_ON_STARTUP": "0",
+        "CONDITIONAL_GET": "0",
+        "WAITRESS_THREADS": str(args.threads),
+        "RATE_LIMITS": "0",  # the password pool's own 503s are what's measured
+    })
+    if args.mode == "inline":
+        os.environ.update({"PASSWORD_WORKERS": "0", "PASSWORD_MAX_PENDING": "1000000"})
+    os.chdir(tmp)
+
+    from waitress import create_server
+    from app import app, get_password_hasher
+
+    logging.getLogger("waitress.queue").setLevel(logging.ERROR)  # the backlog is the point
+    server = create_server(app, host="127.0.0.1", port=0, threads=args.threads)
+    threading.Thread(target=server.run, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.effective_port}"
+
+    client = HttpClient(base_url)
+    client.post("/signin", {"username": usernames[0], "password": PASSWORD})
+    probe(client, 1)  # warm up
+
+    print(f"{args.mode}: {args.threads} server threads, {args.storm} clients signing in, "
+          f"{get_password_hasher().stats()['max_pending']} hashes at once")
+    describe("browse, idle", probe(client, args.seconds))
+
+    stop = threading.Event()
+    statuses = collections.Counter()
+    latencies = []
+    stormers = [threading.Thread(target=storm, args=(base_url, usernames, stop, statuses, latencies, n),
+                                 daemon=True) for n in range(args.storm)]
+    for t in stormers:
+        t.start()
+    time.sleep(1)
+    describe("browse, storm", probe(client, args.seconds))
+    stop.set()
+    for t in stormers:
+        t.join()
+    describe("signin", sorted(latencies))
+    print("  signin statuses   ", dict(sorted(statuses.items())), "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=("pool", "inline"))
+    parser.add_argument("--storm", type=int, default=32, help="Concurrent sign-in clients")
+    parser.add_argument("--seconds", type=float, default=10, help="Length of each measurement")
+    parser.add_argument("--threads", type=int, default=8, help="Waitress threads")
+    parser.add_argument("--users", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.mode:
+        run(args)
+        return
+    for mode in ("inline", "pool"):
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--mode", mode,
+                        "--storm", str(args.storm), "--seconds", str(args.seconds),
+                        "--threads", str(args.threads), "--users", str(args.users)], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""How the dashboard holds up while a crowd of clients hammers search.
+
+Serves the app with waitress on a fresh seeded database and has one
+signed-in client load /dashboard back to back, first on its own and then
+while --flood signed-in clients keep GETting /browseItems.json searches.
+Run per mode:
+
+  on    admission control (rate limits and in-flight caps, see admission.py)
+  off   RATE_LIMITS=0, every request queues in waitress as before
+
+    python benchmarks/bench_overload.py [--flood 64] [--seconds 10] [--threads 8] [--backoff]
+
+With --backoff the searchers wait as Retry-After asks instead of retrying at once.
+
+Without --mode both are run, each in its own process.
+"""
+import argparse
+import collections
+import logging
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_login_storm import describe, probe
+from bench_routes import HttpClient, PASSWORD, SEARCH_TERMS
+
+
+def flood(client, stop, statuses, latencies, seed, backoff):
+    rng = random.Random(seed)
+    while not stop.is_set():
+        start = time.perf_counter()
+        status = client.get(f"/browseItems.json?search={rng.choice(SEARCH_TERMS)}&sort=popular")
+        latencies.append(time.perf_counter() - start)
+        statuses[status] += 1
+        if status in (429, 503) and backoff:
+            stop.wait(1)  # what Retry-After asks for
+
+
+def run(args):
+    import migrations
+    import seed
+
+    tmp = tempfile.mkdtemp(prefix="sharespace-overload-")
+    db_path = os.path.join(tmp, "bench.db")
+    db = sqlite3.connect(db_path)
+    db.row_factory = sqlite3.Row
+    migrations.upgrade(db)
+    seed.seed(db, users=args.users, items=args.users * 100, swaps=args.users, saved=0, log=lambda *a: None)
+    db.commit()
+    usernames = [row[0] for row in db.execute("SELECT username FROM users")]
+    db.close()
+
+    os.environ.update({
+        "SHARESPACE_DB": db_path,
+        "SESSION_DB": os.path.join(tmp, "sessions.db"),
+        "RATE_LIMIT_SHM": os.path.join(tmp, "limits"),
+        "ASSETS_BUILD_ON_STARTUP": "0",
+        "CONDITIONAL_GET": "0",
+        "CACHE_TIMEOUT": "0",
+        "SLOW_QUERY_MS": "0",
+        "WAITRESS_THREADS": str(args.threads),
+        "RATE_LIMITS": "1" if args.mode == "on" else "0",
+    })
+    os.chdir(tmp)
+
+    from waitress import create_server
+    from app import app
+
+    logging.getLogger("waitress.queue").setLevel(logging.ERROR)  # the backlog is the point
+    server = create_server(app, host="127.0.0.1", port=0, threads=args.threads)
+    threading.Thread(target=server.run, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.effective_port}"
+
+    def signed_in(username):
+        client = HttpClient(base_url)
+        client.post("/signin", {"username": username, "password": PASSWORD})
+        return client
+
+    client = signed_in(usernames[0])
+    probe(client, 1, "/dashboard")  # warm up
+
+    print(f"{args.mode}: {args.threads} server threads, {args.flood} clients searching")
+    describe("dashboard, idle", probe(client, args.seconds, "/dashboard"))
+
+    crowd = [signed_in(usernames[1 + n % (len(usernames) - 1)]) for n in range(args.flood)]
+    stop = threading.Event()
+    statuses = collections.Counter()
+    latencies = []
+    flooders = [threading.Thread(target=flood, args=(c, stop, statuses, latencies, n, args.backoff), daemon=True)
+                for n, c in enumerate(crowd)]
+    for t in flooders:
+        t.start()
+    time.sleep(1)
+    describe("dashboard, flood", probe(client, args.seconds, "/dashboard"))
+    stop.set()
+    for t in flooders:
+        t.join()
+    describe("search", sorted(latencies))
+    print("  search statuses   ", dict(sorted(statuses.items())), "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=("on", "off"))
+    parser.add_argument("--flood", type=int, default=64, help="Concurrent searching clients")
+    parser.add_argument("--seconds", type=float, default=10, help="Length of each measurement")
+    parser.add_argument("--threads", type=int, default=8, help="Waitress threads")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--backoff", action="store_true", help="Searchers wait a second after a 429 or 503")
+    args = parser.parse_args()
+
+    if args.mode:
+        run(args)
+        return
+    for mode in ("off", "on"):
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--mode", mode,
+                        "--flood", str(args.flood), "--seconds", str(args.seconds),
+                        "--threads", str(args.threads), "--users", str(args.users)]
+                       + (["--backoff"] if args.backoff else []), check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""Load-test ShareSpace's routes and compare the results with a baseline.
+
+Drives the real app (signin, dashboard, browse with search/category/sort,
+item detail, swap requests, upload) with several concurrent clients, each
+signed in as a different seeded user, either through the WSGI app
+in-process or over HTTP against a local waitress server. Prints throughput
+and p50/p95/p99 latency per route and can save them as JSON.
+
+    python benchmarks/seed.py --db /tmp/bench.db --users 2000 --items 50000
+    python benchmarks/bench_routes.py --db /tmp/bench.db --concurrency 8 \\
+        --output results.json --baseline benchmarks/baseline.json
+
+With --baseline the run exits non-zero if any route's p95 latency got
+worse, or its throughput dropped, by more than --threshold. The database
+is copied to a temp directory first so the seeded one stays untouched.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from datetime import datetime, timezone
+from http.cookiejar import CookieJar
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PASSWORD = "password"  # see seed.py
+SEARCH_TERMS = ["lamp", "textbook", "calc", "chair", "hoodie", "football", "charger", "novel"]
+CATEGORIES = ["books", "electronics", "stationery", "furniture", "sports", "clothing", "other"]
+
+
+def tiny_png():
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    buf = io.BytesIO()
+    Image.new("RGB", (640, 480), (random.randrange(256), 90, 160)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+# --- CLIENTS ---
+# Both return the status code; bodies are read (so rendering is timed) and dropped.
+
+class WsgiClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def get(self, path):
+        return self.client.get(path).status_code
+
+    def post(self, path, data, files=None):
+        data = dict(data)
+        for field, (filename, content) in (files or {}).items():
+            data[field] = (io.BytesIO(content), filename)
+        return self.client.post(path, data=data, content_type="multipart/form-data").status_code
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect())
+
+    def _open(self, request):
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+
+    def get(self, path):
+        return self._open(urllib.request.Request(self.base_url + path))
+
+    def post(self, path, data, files=None):
+        boundary = uuid.uuid4().hex
+        body = io.BytesIO()
+        for name, value in data.items():
+            body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+                       f'{value}\r\n'.encode())
+        for name, (filename, content) in (files or {}).items():
+            body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; '
+                       f'filename="{filename}"\r\nContent-Type: application/octet-stream\r\n\r\n'.encode())
+            body.write(content + b"\r\n")
+        body.write(f"--{boundary}--\r\n".encode())
+        return self._open(urllib.request.Request(
+            self.base_url + path, data=body.getvalue(), method="POST",
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}))
+
+
+# --- SCENARIOS ---
+# name -> (expected status, fn(client, fixtures, rng) -> status)
+
+def _upload(client, fixtures, rng):
+    image = fixtures["image"]
+    return client.post("/upload", {
+        "name": f"Bench item {rng.randrange(10**9)}", "category": rng.choice(CATEGORIES),
+        "description": "Listed by the route benchmark", "condition": "good",
+        "hostel": "Hall A", "looking_for": rng.choice(SEARCH_TERMS),
+    }, {"image": ("bench.png", image)} if image else None)
+
+
+ROUTES = {
+    "signin": (302, lambda c, f, rng: c.post("/signin", {"username": rng.choice(f["usernames"]),
+                                                         "password": PASSWORD})),
+    "dashboard": (200, lambda c, f, rng: c.get("/dashboard")),
+    "browse": (200, lambda c, f, rng: c.get("/browseItems")),
+    "browse_search": (200, lambda c, f, rng: c.get(
+        "/browseItems?" + urllib.parse.urlencode({"search": rng.choice(SEARCH_TERMS)}))),
+    "browse_category": (200, lambda c, f, rng: c.get(
+        "/browseItems?" + urllib.parse.urlencode({"category": rng.choice(CATEGORIES)}))),
+    "browse_popular": (200, lambda c, f, rng: c.get("/browseItems?sort=popular")),
+    "item_detail": (200, lambda c, f, rng: c.get(f"/item/{rng.choice(f['item_ids'])}")),
+    "swap_requests": (200, lambda c, f, rng: c.get("/swapRequests")),
+    "upload": (302, _upload),
+}
+
+
+def load_fixtures(db_path, clients, rng):
+    db = sqlite3.connect(db_path)
+    usernames = [row[0] for row in db.execute(
+        "SELECT username FROM users WHERE username LIKE 'user%' ORDER BY id LIMIT 5000")]
+    if len(usernames) < clients:
+        sys.exit(f"{db_path} has {len(usernames)} seeded users; run benchmarks/seed.py first")
+    item_ids = [row[0] for row in db.execute(
+        "SELECT id FROM items WHERE is_active = 1 ORDER BY RANDOM() LIMIT 5000")]
+    counts = {t: db.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+              for t in ("users", "items", "swap_requests", "saved_items")}
+    db.close()
+    return {"usernames": usernames, "item_ids": item_ids, "image": tiny_png(),
+            "signed_in": rng.sample(usernames, clients), "counts": counts}
+
+
+# --- RUNNER ---
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def run_route(name, clients, fixtures, requests, warmup):
+    expected, fn = ROUTES[name]
+    latencies, errors = [], []
+    remaining = [requests + warmup * len(clients)]
+    lock = threading.Lock()
+
+    def worker(client, seed):
+        rng = random.Random(seed)
+        done = 0
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            start = time.perf_counter()
+            try:
+                status = fn(client, fixtures, rng)
+            except Exception as e:
+                status = repr(e)
+            elapsed = time.perf_counter() - start
+            done += 1
+            if done <= warmup:
+                continue
+            with lock:
+                latencies.append(elapsed)
+                if status != expected:
+                    errors.append(status)
+
+    threads = [threading.Thread(target=worker, args=(client, n)) for n, client in enumerate(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    ms = lambda s: round(s * 1000, 3)
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "error_samples": sorted({str(e) for e in errors})[:5],
+        "throughput": round(len(latencies) / wall, 1) if wall else 0.0,
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "mean_ms": ms(sum(latencies) / len(latencies)),
+    }
+
+
+def print_results(results):
+    print(f"{'route':<16} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, r in results["routes"].items():
+        print(f"{name:<16} {r['throughput']:>8.1f} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} "
+              f"{r['p99_ms']:>9.2f} {r['errors']:>7}")
+
+
+def compare(results, baseline, threshold):
+    """Print the change per route. Returns the routes that regressed."""
+    regressions = []
+    print(f"\n{'route':<16} {'p95 base':>9} {'p95 now':>9} {'change':>8} {'req/s base':>11} {'req/s now':>10}")
+    for name, now in results["routes"].items():
+        base = baseline.get("routes", {}).get(name)
+        if not base:
+            continue
+        p95_change = (now["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0.0
+        slower = p95_change > threshold
+        fewer = base["throughput"] and now["throughput"] < base["throughput"] * (1 - threshold)
+        flag = "  REGRESSION" if slower or fewer else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<16} {base['p95_ms']:>9.2f} {now['p95_ms']:>9.2f} {p95_change:>+7.0%} "
+              f"{base['throughput']:>11.1f} {now['throughput']:>10.1f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", required=True, help="Seeded database (see benchmarks/seed.py)")
+    parser.add_argument("--mode", choices=("wsgi", "waitress"), default="wsgi")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per route")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests per client per route")
+    parser.add_argument("--routes", default=",".join(ROUTES), help="Comma-separated subset of: " + ", ".join(ROUTES))
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--baseline", help="Results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.20, help="Allowed regression (0.20 = 20%%)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    routes = [r.strip() for r in args.routes.split(",") if r.strip()]
+    unknown = set(routes) - set(ROUTES)
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+
+    # Relative paths are resolved before changing into the temp directory
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    rng = random.Random(args.seed)
+    fixtures = load_fixtures(args.db, args.concurrency, rng)
+
+    # The app reads its paths from the environment at import time; uploads
+    # go under the current directory
+    tmp = tempfile.mkdtemp(prefix="sharespace-bench-")
+    db_path = os.path.join(tmp, "bench.db")
+    print(f"copying {args.db} ...")
+    shutil.copy(args.db, db_path)
+    os.environ["SHARESPACE_DB"] = db_path
+    os.environ["SESSION_DB"] = os.path.join(tmp, "sessions.db")
+    os.environ.setdefault("ASSETS_BUILD_ON_STARTUP", "0")
+    os.environ.setdefault("RATE_LIMITS", "0")  # clients replay far faster than people click
+    os.chdir(tmp)
+
+    from app import app
+
+    server = None
+    if args.mode == "waitress":
+        from waitress import create_server
+        server = create_server(app, host="127.0.0.1", port=0,
+                               threads=max(args.concurrency, 4))
+        threading.Thread(target=server.run, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.effective_port}"
+        clients = [HttpClient(base_url) for _ in range(args.concurrency)]
+    else:
+        clients = [WsgiClient(app) for _ in range(args.concurrency)]
+
+    for client, username in zip(clients, fixtures["signed_in"]):
+        status = client.post("/signin", {"username": username, "password": PASSWORD})
+        if status != 302:
+            sys.exit(f"could not sign in as {username} (status {status})")
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "mode": args.mode,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "rows": fixtures["counts"],
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+        },
+        "routes": {},
+    }
+    for name in routes:
+        print(f"running {name} ...", flush=True)
+        results["routes"][name] = run_route(name, clients, fixtures, args.requests, args.warmup)
+
+    print()
+    print_results(results)
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nresults written to {output}")
+
+    regressions = []
+    if baseline:
+        with open(baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+
+    if server is not None:
+        server.close()
+    shutil.rmtree(tmp, ignore_errors=True)
+    if regressions:
+        sys.exit(f"\n{len(regressions)} route(s) regressed: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
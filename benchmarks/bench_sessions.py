@@ -0,0 +1,88 @@
+"""Compare session backends: filesystem (Flask-Session), sqlite, signed cookie.
+
+Runs a small Flask app holding the same session payload ShareSpace keeps
+(username, user_id, hostel, profile_picture) and times read-only and
+writing requests through the WSGI test client.
+
+    python benchmarks/bench_sessions.py [--requests 2000]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, session
+from flask_session import Session
+
+import sessions
+
+
+def make_app(backend, tmp):
+    app = Flask(__name__)
+    app.secret_key = "bench"
+    app.config["SESSION_PERMANENT"] = False
+    if backend == "filesystem":
+        app.config["SESSION_TYPE"] = "filesystem"
+        app.config["SESSION_FILE_DIR"] = os.path.join(tmp, "flask_session")
+        Session(app)
+    elif backend == "sqlite":
+        app.session_interface = sessions.SqliteSessionInterface(os.path.join(tmp, "sessions.db"))
+
+    @app.route("/login")
+    def login():
+        session["username"] = "student"
+        session["user_id"] = 42
+        session["hostel"] = "Hall A"
+        session["profile_picture"] = "profile_42.jpg"
+        return "ok"
+
+    @app.route("/read")
+    def read():
+        return str(session.get("user_id"))
+
+    @app.route("/write")
+    def write():
+        session["hits"] = session.get("hits", 0) + 1
+        return "ok"
+
+    return app
+
+
+def timed(client, path, n):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        client.get(path)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(backend, path, samples):
+    samples = sorted(samples)
+    total = sum(samples)
+    p = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+    print(f"{backend:<11} {path:<7} {len(samples) / total:9.0f} req/s   "
+          f"p50 {p(0.50):6.3f} ms   p95 {p(0.95):6.3f} ms   "
+          f"mean {statistics.mean(samples) * 1000:6.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    for backend in ("filesystem", "sqlite", "cookie"):
+        with tempfile.TemporaryDirectory() as tmp:
+            client = make_app(backend, tmp).test_client()
+            client.get("/login")
+            timed(client, "/read", 100)  # warm up
+            for path in ("/read", "/write"):
+                report(backend, path, timed(client, path, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Fill a database with synthetic ShareSpace data for benchmarking.
+
+Creates (or extends) a database with realistic-looking users, items,
+swap requests and saved items. Every seeded user is called `user<N>` and
+has the password `password`, so the benchmarks can sign in as any of them.
+
+    python benchmarks/seed.py --db /tmp/bench.db --users 50000 --items 1000000
+
+Rows go in with batched executemany in a single transaction; the search
+index is (re)built once at the end rather than row by row when the
+database is new. Use --seed for reproducible data.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+
+import matching
+import migrations
+import search
+
+PASSWORD = "password"
+BATCH_SIZE = 10_000
+
+HOSTELS = ["Hall A", "Hall B", "Hall C", "Hall D", "Unity Hall", "Queens Hall",
+           "Kings Hall", "Annex 1", "Annex 2", "Off campus"]
+CONDITIONS = ["new", "like-new", "good", "good", "fair", "poor"]
+CONTACT_METHODS = ["email", "email", "phone", "whatsapp"]
+
+# category -> (nouns, adjectives) used to make item names
+CATALOGUE = {
+    "books": (["calculus textbook", "physics textbook", "novel", "dictionary", "lab manual",
+               "chemistry notes", "economics textbook", "atlas", "past papers", "programming book"],
+              ["used", "annotated", "hardcover", "paperback", "latest edition", "clean"]),
+    "electronics": (["desk lamp", "calculator", "headphones", "phone charger", "power bank",
+                     "bluetooth speaker", "keyboard", "mouse", "extension cord", "kettle"],
+                    ["working", "wireless", "rechargeable", "portable", "barely used"]),
+    "stationery": (["drawing set", "notebooks", "pens", "ruler set", "stapler", "backpack",
+                    "file folders", "sticky notes"],
+                   ["unopened", "assorted", "colourful", "spare"]),
+    "furniture": (["chair", "study desk", "bookshelf", "mattress", "mirror", "side table",
+                   "shoe rack", "bean bag"],
+                  ["sturdy", "foldable", "wooden", "small", "comfortable"]),
+    "sports": (["football", "basketball", "tennis racket", "yoga mat", "dumbbells",
+                "running shoes", "jersey", "skipping rope"],
+               ["size 5", "lightweight", "nearly new", "team"]),
+    "clothing": (["hoodie", "jacket", "sneakers", "jeans", "dress", "suit", "scarf", "cap"],
+                 ["size M", "size L", "vintage", "warm", "formal"]),
+    "other": (["mini fridge", "iron", "bucket", "plates set", "umbrella", "guitar",
+               "board game", "fan"],
+              ["working", "spare", "large", "portable"]),
+}
+CATEGORIES = list(CATALOGUE)
+# Listing volume isn't uniform across categories
+CATEGORY_WEIGHTS = [30, 20, 10, 10, 10, 12, 8]
+
+MESSAGES = ["Is this still available?", "Would you swap for my calculator?",
+            "I can meet at the library tomorrow.", "Interested! What do you need?",
+            "Can I pick it up this weekend?", ""]
+
+
+def random_time(rng, now, days):
+    return (now - timedelta(seconds=rng.randint(0, days * 86400))).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def item_row(rng, owner_id, now, days):
+    category = rng.choices(CATEGORIES, CATEGORY_WEIGHTS)[0]
+    nouns, adjectives = CATALOGUE[category]
+    noun = rng.choice(nouns)
+    name = f"{rng.choice(adjectives).capitalize()} {noun}"
+    wanted_category = rng.choice(CATEGORIES)
+    looking_for = rng.choice(CATALOGUE[wanted_category][0]) if rng.random() < 0.8 else ""
+    description = (f"{name}, {rng.choice(CONDITIONS)} condition. "
+                   f"Swapping because I no longer need it. Pickup at {rng.choice(HOSTELS)}.")
+    # Long-tailed view counts: most items are barely looked at
+    views = int(rng.paretovariate(1.2)) - 1
+    return (owner_id, name, category, description, None, rng.choice(HOSTELS),
+            random_time(rng, now, days), 1 if rng.random() < 0.85 else 0,
+            rng.choice(CONDITIONS), looking_for, rng.choice(CONTACT_METHODS), min(views, 100_000))
+
+
+def batched(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed(db, users, items, swaps, saved, days=180, rng=None, log=print):
+    rng = rng or random.Random()
+    now = datetime.utcnow()
+    password_hash = generate_password_hash(PASSWORD)  # one hash, shared: hashing 50k is minutes
+
+    last_user = db.execute("SELECT COALESCE(MAX(id), 0) FROM users").fetchone()[0]
+    last_item = db.execute("SELECT COALESCE(MAX(id), 0) FROM items").fetchone()[0]
+    start = time.perf_counter()
+
+    def timed(label, count):
+        log(f"{label:<14} {count:>9,} rows  {time.perf_counter() - start:7.1f}s")
+
+    db.executemany(
+        "INSERT INTO users (username, password_hash, hostel, phone, email) VALUES (?, ?, ?, ?, ?)",
+        ((f"user{last_user + n}", password_hash, rng.choice(HOSTELS),
+          f"080{rng.randint(10_000_000, 99_999_999)}", f"user{last_user + n}@students.example")
+         for n in range(1, users + 1))
+    )
+    timed("users", users)
+    user_ids = [row[0] for row in db.execute("SELECT id FROM users WHERE id > ?", (last_user,))]
+
+    for batch in batched(item_row(rng, rng.choice(user_ids), now, days) for _ in range(items)):
+        db.executemany("""
+            INSERT INTO items (owner_id, name, category, description, image, hostel, created_at,
+                               is_active, condition, looking_for, contact_method, views)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, batch)
+    timed("items", items)
+    listed = db.execute("SELECT id, owner_id FROM items WHERE id > ? ORDER BY id", (last_item,)).fetchall()
+    item_ids = [row[0] for row in listed]
+    owners = [row[1] for row in listed]
+
+    def swap_rows():
+        for _ in range(swaps):
+            n = rng.randrange(len(item_ids))
+            item_id, owner_id = item_ids[n], owners[n]
+            requester_id = rng.choice(user_ids)
+            if requester_id == owner_id:
+                continue
+            status = rng.choices(["pending", "accepted", "rejected"], [50, 20, 30])[0]
+            created = random_time(rng, now, days)
+            yield (requester_id, item_id, owner_id, status, rng.choice(MESSAGES), created,
+                   created if status != "pending" else None)
+
+    # A requester can only have one pending request per item (migration 011)
+    for batch in batched(swap_rows()):
+        db.executemany("""
+            INSERT OR IGNORE INTO swap_requests (requester_id, item_id, owner_id, status, message, created_at, responded_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, batch)
+    timed("swap_requests", swaps)
+
+    for batch in batched((rng.choice(user_ids), rng.choice(item_ids)) for _ in range(saved)):
+        db.executemany("INSERT OR IGNORE INTO saved_items (user_id, item_id) VALUES (?, ?)", batch)
+    timed("saved_items", saved)
+    return user_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", required=True, help="Database to create or extend")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--swaps", type=int, default=None, help="Default: items / 5")
+    parser.add_argument("--saved", type=int, default=None, help="Default: items / 4")
+    parser.add_argument("--days", type=int, default=180, help="Spread created_at over this many days")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible data")
+    parser.add_argument("--skip-matches", action="store_true",
+                        help="Don't build the matchmaking index (the app builds it on startup instead)")
+    args = parser.parse_args()
+
+    db = sqlite3.connect(args.db)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA journal_mode = WAL")
+    db.execute("PRAGMA synchronous = OFF")  # a seeding run that dies is just rerun
+    migrations.upgrade(db)
+
+    # On a new database, index everything at the end instead of per row
+    had_search = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'items_fts'").fetchone() is not None
+
+    seed(db, args.users, args.items,
+         args.items // 5 if args.swaps is None else args.swaps,
+         args.items // 4 if args.saved is None else args.saved,
+         days=args.days, rng=random.Random(args.seed))
+    db.commit()
+
+    start = time.perf_counter()
+    if not had_search:
+        search.install(db)
+        db.commit()
+        print(f"search index   {time.perf_counter() - start:7.1f}s")
+    if not args.skip_matches:
+        # Scales with users x matching items; this is the slow part of a large seed
+        start = time.perf_counter()
+        users = matching.rebuild(db)
+        db.commit()
+        print(f"matches        {time.perf_counter() - start:7.1f}s  ({users:,} users)")
+    db.execute("ANALYZE")
+    db.commit()
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
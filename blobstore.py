@@ -0,0 +1,168 @@
+import glob
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+
+from flask import send_from_directory
+
+# --- UPLOAD STORE ---
+# Uploads are streamed to a temp file while being hashed and then stored
+# under their SHA-256: uploads/3f/2a/3f2a...9c.png. The same image uploaded
+# twice is kept once, and because a name only ever refers to one content
+# (resized variants sit next to it as 3f2a...9c.thumb.webp etc.) every URL
+# can be cached forever. Rows in items/users reference blobs by that path;
+# triggers keep blobs.refcount in step (migration 008_upload_blobs) and gc()
+# deletes blobs nobody has referenced for GC_GRACE seconds.
+
+CHUNK_SIZE = 64 * 1024
+TMP_DIR = ".tmp"
+GC_GRACE = 3600     # an upload is committed before the row that uses it
+GC_INTERVAL = 3600
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+_BLOB_RE = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(\.[a-z0-9]+)+$")
+
+
+def shard_path(digest, ext):
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+
+
+def is_blob(name):
+    """True for content-addressed names (and their variants), False for legacy uploads."""
+    return bool(name) and _BLOB_RE.match(name) is not None
+
+
+class BlobStore:
+    def __init__(self, folder, pool, grace=GC_GRACE, gc_interval=GC_INTERVAL):
+        self.folder = folder
+        self.pool = pool
+        self.grace = grace
+        self.gc_interval = gc_interval
+        self._sweeper = None
+        self._lock = threading.Lock()
+        self.stored = 0
+        self.deduplicated = 0
+        self.collected = 0
+
+    def put(self, db, stream, ext, validate=None, prepare=None):
+        """Store an upload stream. Returns (name, variants already made for it).
+
+        `validate(path)` is called on the temp file and may raise to reject
+        it; `prepare(path)` may then rewrite it (to strip metadata, say), and
+        the name is the hash of what it leaves, never of the bytes sent. The
+        blob row is committed (with a fresh last_used_at) before the
+        file is moved into place, so the GC can't remove it in between.
+        """
+        self._ensure_sweeper()
+        tmp_dir = os.path.join(self.folder, TMP_DIR)
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            if validate:
+                validate(tmp)
+            if prepare:
+                prepare(tmp)
+                digest, size = _hash_file(tmp)
+        except Exception:
+            os.remove(tmp)
+            raise
+
+        digest = digest.hexdigest()
+        db.execute("""
+            INSERT INTO blobs (hash, path, size, last_used_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(hash) DO UPDATE SET last_used_at = excluded.last_used_at
+        """, (digest, shard_path(digest, ext.lower()), size, int(time.time())))
+        # An earlier upload of the same bytes keeps its name (and extension)
+        name, variants = db.execute("SELECT path, variants FROM blobs WHERE hash = ?", (digest,)).fetchone()
+        db.commit()
+
+        path = os.path.join(self.folder, name)
+        if os.path.exists(path):
+            os.remove(tmp)
+            self.deduplicated += 1
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp, path)
+            self.stored += 1
+        return name, variants
+
+    def record_variants(self, db, name, variants):
+        db.execute("UPDATE blobs SET variants = ? WHERE path = ?", (variants, name))
+
+    def gc(self, grace=None):
+        """Delete unreferenced blobs (and their variants). Returns how many."""
+        cutoff = int(time.time()) - (self.grace if grace is None else grace)
+        conn = self.pool.acquire()
+        try:
+            paths = [row[0] for row in conn.execute(
+                "DELETE FROM blobs WHERE refcount <= 0 AND last_used_at < ? RETURNING path", (cutoff,)
+            ).fetchall()]
+            # Files go while the write lock is still held, so a put() of the
+            # same content waits and then writes a fresh copy
+            for name in paths:
+                stem = os.path.join(self.folder, name.rsplit(".", 1)[0])
+                for path in glob.glob(glob.escape(stem) + ".*"):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            conn.commit()
+        finally:
+            self.pool.release(conn)
+        self.collected += len(paths)
+        return len(paths)
+
+    def _ensure_sweeper(self):
+        if self._sweeper is not None or not self.gc_interval:
+            return
+        with self._lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._gc_loop, name="blob-gc", daemon=True)
+                self._sweeper.start()
+
+    def _gc_loop(self):
+        while True:
+            time.sleep(self.gc_interval)
+            try:
+                self.gc()
+            except Exception as e:
+                print("❌ Upload GC failed:", e)
+
+    def stats(self):
+        return {
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "collected": self.collected,
+        }
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest, os.path.getsize(path)
+
+
+def send_upload(folder, filename):
+    """Serve an upload; content-addressed ones are cached forever."""
+    if not is_blob(filename):
+        return send_from_directory(folder, filename)
+    response = send_from_directory(folder, filename, max_age=31536000)
+    response.headers["Cache-Control"] = IMMUTABLE
+    return response
@@ -0,0 +1,316 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+# --- BULK IMPORT / EXPORT ---
+# Listings are imported from JSONL or CSV and items, swap requests and saved
+# items are exported in either format, a row at a time in both directions:
+# imports read the input as a stream and insert it in executemany batches,
+# exports page through the table by id and yield each page as it is encoded.
+# Neither ever holds more than one batch, so memory stays flat however big
+# the file is. A named import records how far it got in import_checkpoints
+# (migration 009) in the same transaction as each batch, and picks up from
+# there when it is run again.
+
+FORMATS = ("jsonl", "csv")
+BATCH_SIZE = 1000
+OWNER_CACHE_SIZE = 10000
+
+# table -> condition restricting it to one user's rows
+EXPORT_TABLES = {
+    "items": "owner_id = :user_id",
+    "swap_requests": "(requester_id = :user_id OR owner_id = :user_id)",
+    "saved_items": "user_id = :user_id",
+}
+
+CATEGORIES = ("books", "electronics", "stationery", "furniture", "sports", "clothing", "other")
+CONDITIONS = ("new", "like-new", "good", "fair", "poor")
+CONTACT_METHODS = ("email", "phone", "both")
+REQUIRED = ("name", "category", "description", "condition", "hostel")
+MAX_LENGTH = 2000
+TIMESTAMP = "%Y-%m-%d %H:%M:%S"
+
+
+class RowError(ValueError):
+    pass
+
+
+# --- EXPORT ---
+
+def export(pool, table, fmt="jsonl", user_id=None, batch_size=BATCH_SIZE, tagged=False):
+    """Yield `table` (or one user's rows of it) as JSONL lines or CSV text.
+
+    A read connection is taken from `pool` for each page only, so a slow
+    client never holds one. With `tagged`, JSONL rows carry a "table" key
+    (for exports that concatenate several tables).
+    """
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"unknown table {table!r}")
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format {fmt!r}")
+
+    where = "id > :after"
+    if user_id is not None:
+        where += f" AND {EXPORT_TABLES[table]}"
+    sql = f"SELECT * FROM {table} WHERE {where} ORDER BY id LIMIT :limit"
+
+    after = 0
+    header = fmt == "csv"
+    while True:
+        conn = pool.acquire()
+        try:
+            cursor = conn.execute(sql, {"after": after, "user_id": user_id, "limit": batch_size})
+            columns = [c[0] for c in cursor.description]
+            rows = cursor.fetchall()
+        finally:
+            pool.release(conn)
+
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            if header:
+                writer.writerow(columns)
+                header = False
+            writer.writerows(rows)
+            if buffer.tell():
+                yield buffer.getvalue()
+        elif rows:
+            extra = {"table": table} if tagged else {}
+            yield "".join(json.dumps(dict(extra, **dict(zip(columns, row))), ensure_ascii=False) + "\n"
+                          for row in rows)
+
+        if len(rows) < batch_size:
+            return
+        after = rows[-1]["id"]
+
+
+def export_all(pool, user_id=None, batch_size=BATCH_SIZE):
+    """Every exported table as one JSONL stream, each row tagged with its table."""
+    for table in EXPORT_TABLES:
+        yield from export(pool, table, "jsonl", user_id, batch_size, tagged=True)
+
+
+# --- IMPORT ---
+
+def guess_format(filename, default="jsonl"):
+    ext = filename.rsplit(".", 1)[-1].lower() if filename and "." in filename else ""
+    if ext in ("jsonl", "ndjson", "json"):
+        return "jsonl"
+    if ext == "csv":
+        return "csv"
+    return default
+
+
+def read_records(stream, fmt):
+    """Yield (record number, dict or RowError) from a binary or text stream."""
+    if isinstance(stream, io.TextIOBase):
+        text = stream
+    else:
+        text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+    if fmt == "csv":
+        for number, record in enumerate(csv.DictReader(text), 1):
+            if None in record:
+                yield number, RowError("more values than columns")
+            else:
+                yield number, record
+        return
+
+    number = 0
+    for line in text:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, RowError(f"invalid JSON: {e}")
+            continue
+        yield number, record if isinstance(record, dict) else RowError("not a JSON object")
+
+
+def _text(record, field):
+    value = record.get(field)
+    if value is None:
+        return ""
+    value = str(value).strip()
+    if len(value) > MAX_LENGTH:
+        raise RowError(f"{field} is longer than {MAX_LENGTH} characters")
+    return value
+
+
+def _choice(record, field, allowed, default=None):
+    value = _text(record, field).lower() or default
+    if value not in allowed:
+        raise RowError(f"{field} must be one of {', '.join(allowed)}")
+    return value
+
+
+def _flag(record, field, default=1):
+    value = record.get(field)
+    if value is None or value == "":
+        return default
+    if str(value).strip().lower() in ("1", "true", "yes", "active"):
+        return 1
+    if str(value).strip().lower() in ("0", "false", "no", "inactive"):
+        return 0
+    raise RowError(f"{field} must be true or false")
+
+
+def _timestamp(record, field, default):
+    value = _text(record, field)
+    if not value:
+        return default
+    for fmt in (TIMESTAMP, "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value[:19], fmt).strftime(TIMESTAMP)
+        except ValueError:
+            pass
+    raise RowError(f"{field} is not a date")
+
+
+class OwnerLookup:
+    """Resolves the `owner` (username) or `owner_id` of an imported listing."""
+
+    def __init__(self, db):
+        self.db = db
+        self._ids = {}
+
+    def __call__(self, record):
+        username = _text(record, "owner")
+        if username:
+            if username not in self._ids:
+                if len(self._ids) >= OWNER_CACHE_SIZE:
+                    self._ids.clear()
+                row = self.db.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
+                self._ids[username] = row[0] if row else None
+            owner_id = self._ids[username]
+            if owner_id is None:
+                raise RowError(f"no user called {username!r}")
+            return owner_id
+
+        value = _text(record, "owner_id")
+        if not value:
+            raise RowError("owner or owner_id is required")
+        try:
+            owner_id = int(value)
+        except ValueError:
+            raise RowError("owner_id must be a number")
+        if ("id", owner_id) not in self._ids:
+            if len(self._ids) >= OWNER_CACHE_SIZE:
+                self._ids.clear()
+            self._ids[("id", owner_id)] = self.db.execute(
+                "SELECT 1 FROM users WHERE id = ?", (owner_id,)).fetchone() is not None
+        if not self._ids[("id", owner_id)]:
+            raise RowError(f"no user with id {owner_id}")
+        return owner_id
+
+
+def item_values(record, owner_id, now):
+    """Validate one listing record into an INSERT row, or raise RowError."""
+    missing = [field for field in REQUIRED if not _text(record, field)]
+    if missing:
+        raise RowError(f"missing {', '.join(missing)}")
+    return (
+        owner_id,
+        _text(record, "name"),
+        _choice(record, "category", CATEGORIES),
+        _text(record, "description"),
+        _choice(record, "condition", CONDITIONS),
+        _text(record, "looking_for"),
+        _text(record, "hostel"),
+        _choice(record, "contact_method", CONTACT_METHODS, default="email"),
+        _flag(record, "is_active"),
+        _timestamp(record, "created_at", now),
+    )
+
+
+INSERT_ITEM = """
+    INSERT INTO items (owner_id, name, category, description, condition, looking_for,
+                       hostel, contact_method, is_active, created_at, views)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+"""
+
+
+def checkpoint(db, name):
+    """(records, imported, failed, finished_at) of a named import, or None."""
+    return db.execute(
+        "SELECT records, imported, failed, finished_at FROM import_checkpoints WHERE name = ?", (name,)
+    ).fetchone()
+
+
+def reset_checkpoint(db, name):
+    db.execute("DELETE FROM import_checkpoints WHERE name = ?", (name,))
+    db.commit()
+
+
+def import_items(db, stream, fmt="jsonl", owner_id=None, name=None, batch_size=BATCH_SIZE,
+                 on_error=None, on_batch=None):
+    """Import listings from a JSONL/CSV stream. Returns a summary dict.
+
+    With `owner_id` every listing belongs to that user; otherwise each
+    record names its `owner` (username) or `owner_id`. Invalid records are
+    skipped and passed to `on_error(record number, message)`. Each batch
+    is committed with the checkpoint of `name` (if given), and
+    `on_batch(item ids)` is called after the commit. Running the same
+    named import again skips the records already processed. Images are
+    not imported.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format {fmt!r}")
+    owner = (lambda record: owner_id) if owner_id is not None else OwnerLookup(db)
+    now = datetime.now(timezone.utc).strftime(TIMESTAMP)
+
+    resumed = checkpoint(db, name) if name else None
+    skip, imported, failed = (resumed["records"], resumed["imported"], resumed["failed"]) if resumed else (0, 0, 0)
+    summary = {"records": skip, "imported": imported, "failed": failed, "resumed_at": skip}
+    batch = []
+
+    def flush():
+        if batch:
+            db.executemany(INSERT_ITEM, batch)
+            # The batch holds the write lock, so its AUTOINCREMENT ids are contiguous
+            last = db.execute("SELECT MAX(id) FROM items").fetchone()[0]
+            ids = range(last - len(batch) + 1, last + 1)
+        else:
+            ids = range(0)
+        summary["imported"] += len(batch)
+        if name:
+            db.execute("""
+                INSERT INTO import_checkpoints (name, records, imported, failed, updated_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(name) DO UPDATE SET
+                    records = excluded.records, imported = excluded.imported,
+                    failed = excluded.failed, updated_at = excluded.updated_at, finished_at = NULL
+            """, (name, summary["records"], summary["imported"], summary["failed"]))
+        db.commit()
+        batch.clear()
+        if ids and on_batch:
+            on_batch(ids)
+
+    try:
+        for number, record in read_records(stream, fmt):
+            if number <= skip:
+                continue
+            summary["records"] = number
+            try:
+                if isinstance(record, RowError):
+                    raise record
+                batch.append(item_values(record, owner(record), now))
+            except RowError as e:
+                summary["failed"] += 1
+                if on_error:
+                    on_error(number, str(e))
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+    except UnicodeDecodeError as e:
+        # Everything before the bad bytes is kept; the checkpoint says where
+        db.rollback()
+        raise RowError(f"not UTF-8 text after record {summary['records']}: {e.reason}")
+
+    if name:
+        db.execute("UPDATE import_checkpoints SET finished_at = CURRENT_TIMESTAMP WHERE name = ?", (name,))
+        db.commit()
+    return summary
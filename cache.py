@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import OrderedDict
+
+from cachelib import BaseCache, FileSystemCache
+
+# --- QUERY RESULT CACHE ---
+# Read-mostly query results (the browse listing, item + owner) are cached
+# under tags such as "items" or "user:12". Invalidating a tag bumps its
+# version number, which is part of every key stored under it, so all of
+# those entries become unreachable at once and age out through LRU/TTL.
+# That only needs get/set/inc, so it works on any cachelib backend.
+
+DEFAULT_TIMEOUT = 300
+DEFAULT_THRESHOLD = 2000
+
+
+class LRUCache(BaseCache):
+    """In-process cachelib backend with LRU eviction and per-key TTL."""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, default_timeout=DEFAULT_TIMEOUT):
+        super().__init__(default_timeout)
+        self._threshold = threshold
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expiry(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return time.monotonic() + timeout if timeout > 0 else float("inf")
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, timeout=None):
+        with self._lock:
+            self._data[key] = (self._expiry(timeout), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self._threshold:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return True
+
+    def add(self, key, value, timeout=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return False
+        return self.set(key, value, timeout)
+
+    def delete(self, key):
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def has(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[0] > time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+        return True
+
+    def inc(self, key, delta=1):
+        # Atomic, unlike BaseCache.inc's get-then-set
+        with self._lock:
+            entry = self._data.get(key)
+            value = (entry[1] if entry is not None and entry[0] > time.monotonic() else 0) + delta
+            self._data[key] = (float("inf"), value)
+            self._data.move_to_end(key)
+        return value
+
+    def stats(self):
+        with self._lock:
+            size = len(self._data)
+        return {"size": size, "threshold": self._threshold, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
+
+
+class TaggedCache:
+    def __init__(self, backend, default_timeout=DEFAULT_TIMEOUT, prefix="ss:"):
+        self.backend = backend
+        self.default_timeout = default_timeout
+        self.prefix = prefix
+
+    def _versions(self, tags):
+        keys = [f"{self.prefix}tag:{t}" for t in tags]
+        versions = self.backend.get_many(*keys)
+        for i, version in enumerate(versions):
+            if version is None:
+                # A tag whose counter was evicted must not restart at a
+                # number that older entries were stored under
+                self.backend.add(keys[i], time.time_ns(), timeout=0)
+                versions[i] = self.backend.get(keys[i])
+        return versions
+
+    def _key(self, key, tags):
+        versions = ",".join(str(v) for v in self._versions(tags))
+        return f"{self.prefix}{key}@{versions}"
+
+    def get_or_set(self, key, tags, fn, timeout=None):
+        """Return the cached value for (key, tags), calling fn() on a miss."""
+        full_key = self._key(key, tags)
+        hit = self.backend.get(full_key)
+        if hit is not None:
+            return hit[0]
+        value = fn()
+        # Wrapped so an empty/None result is still cached
+        self.backend.set(full_key, (value,), timeout or self.default_timeout)
+        return value
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            key = f"{self.prefix}tag:{tag}"
+            self.backend.add(key, time.time_ns(), timeout=0)
+            self.backend.inc(key)
+
+    def stats(self):
+        stats = self.backend.stats() if hasattr(self.backend, "stats") else {}
+        return dict(stats, backend=type(self.backend).__name__)
+
+
+def make_backend(kind, threshold=DEFAULT_THRESHOLD, default_timeout=DEFAULT_TIMEOUT, path=None):
+    if kind == "filesystem":
+        # Shared by every worker process on the host
+        return FileSystemCache(path, threshold=threshold, default_timeout=default_timeout)
+    return LRUCache(threshold=threshold, default_timeout=default_timeout)
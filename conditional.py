@@ -0,0 +1,69 @@
+import hashlib
+from datetime import datetime, timezone
+
+from flask import Response
+from werkzeug.http import is_resource_modified
+
+# --- CONDITIONAL GET ---
+# Pages are validated against the version stamps in the versions table
+# (migration 006, bumped by triggers), so a revalidation costs one primary
+# key lookup instead of the page's queries and template render. The ETag
+# hashes the stamps together with whatever else the page depends on; the
+# Last-Modified date is the newest changed_at among the stamps.
+
+CACHE_CONTROL = "private, no-cache"
+
+
+class Validator:
+    def __init__(self, etag, last_modified=None):
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def matches(self, request):
+        """True if the client's cached copy (If-None-Match / If-Modified-Since) is current."""
+        return not is_resource_modified(request.environ, etag=self.etag,
+                                        last_modified=self.last_modified)
+
+    def apply(self, response):
+        response.set_etag(self.etag, weak=True)
+        if self.last_modified is not None:
+            response.last_modified = self.last_modified
+        response.headers["Cache-Control"] = CACHE_CONTROL
+        response.vary.add("Cookie")
+        return response
+
+    def not_modified(self):
+        return self.apply(Response(status=304))
+
+
+def versions(db, scopes):
+    """{scope: (version, changed_at)} for the scopes that have been bumped."""
+    if not scopes:
+        return {}
+    marks = ", ".join("?" for _ in scopes)
+    rows = db.execute(
+        f"SELECT scope, version, changed_at FROM versions WHERE scope IN ({marks})", list(scopes)
+    ).fetchall()
+    return {row[0]: (row[1], row[2]) for row in rows}
+
+
+def validator(db, scopes, extra=(), volatile=()):
+    """Build the validator for a page that depends on `scopes`.
+
+    `extra` are other values the page varies on (the query string, the
+    signed-in user). `volatile` values change without bumping a stamp (view
+    counts, time buckets); they go into the ETag only, and Last-Modified is
+    left off because a date can't describe them.
+    """
+    stamps = versions(db, scopes)
+    digest = hashlib.sha1()
+    for scope in sorted(scopes):
+        digest.update(f"{scope}={stamps.get(scope, (0, None))[0]};".encode())
+    for value in (*extra, *volatile):
+        digest.update(f"{value!r};".encode())
+
+    last_modified = None
+    changed = [changed_at for _, changed_at in stamps.values() if changed_at]
+    if changed and not volatile:
+        last_modified = datetime.strptime(max(changed), "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    return Validator(digest.hexdigest()[:20], last_modified)
@@ -0,0 +1,161 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+# --- SQLITE CONNECTION POOL ---
+# Connections are opened once and handed from request to request instead of
+# being reconnected (and re-configured) every time. The database runs in WAL
+# mode so readers never wait for a writer, and GET routes can take a
+# read-only connection from a separate pool.
+
+PRAGMAS = {
+    "synchronous": "NORMAL",      # safe with WAL; fsync only at checkpoints
+    "cache_size": -16000,         # 16 MB page cache per connection
+    "mmap_size": 134217728,       # 128 MB memory-mapped reads
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
+
+BUSY_TIMEOUT_MS = 5000
+STATEMENT_CACHE_SIZE = 256
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, path, max_size=8, readonly=False, timeout=10.0,
+                 busy_timeout_ms=BUSY_TIMEOUT_MS, pragmas=None, factory=sqlite3.Connection):
+        self.path = path
+        self.max_size = max_size
+        self.readonly = readonly
+        self.timeout = timeout
+        self.busy_timeout_ms = busy_timeout_ms
+        self.pragmas = dict(PRAGMAS, **(pragmas or {}))
+        self.factory = factory  # sqlite3.Connection subclass, e.g. metrics.Connection
+
+        self._idle = queue.LifoQueue()  # LIFO keeps the warmest connection busy
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._created = 0
+        self._in_use = 0
+        self._acquired = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_time = 0.0
+
+    def _connect(self):
+        if self.readonly:
+            uri = f"file:{self.path}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=self.busy_timeout_ms / 1000,
+                                   check_same_thread=False, factory=self.factory,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+        else:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000,
+                                   check_same_thread=False, factory=self.factory,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+            conn.execute("PRAGMA journal_mode = WAL")
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        if self.readonly:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def _check_fork(self):
+        # Connections must not be shared with a forked child process
+        if os.getpid() != self._pid:
+            with self._lock:
+                if os.getpid() != self._pid:
+                    self._idle = queue.LifoQueue()
+                    self._pid = os.getpid()
+                    self._created = self._in_use = 0
+
+    def acquire(self):
+        self._check_fork()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if self._created < self.max_size:
+                    self._created += 1
+                    create = True
+                else:
+                    create = False
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                start = time.perf_counter()
+                with self._lock:
+                    self._waits += 1
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolTimeout(f"no database connection free after {self.timeout}s")
+                finally:
+                    with self._lock:
+                        self._wait_time += time.perf_counter() - start
+
+        with self._lock:
+            self._in_use += 1
+            self._acquired += 1
+        return conn
+
+    def release(self, conn, discard=False):
+        with self._lock:
+            self._in_use -= 1
+        if not discard:
+            try:
+                # Never hand the next request a half-finished transaction
+                if conn.in_transaction:
+                    conn.rollback()
+            except sqlite3.Error:
+                discard = True
+        if discard:
+            with self._lock:
+                self._created -= 1
+                self._discarded += 1
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+            return
+        self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "readonly": self.readonly,
+                "max_size": self.max_size,
+                "open": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "acquired": self._acquired,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "wait_seconds": round(self._wait_time, 4),
+            }
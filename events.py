@@ -0,0 +1,102 @@
+import json
+import time
+
+# --- ACTIVITY EVENTS ---
+# Listing, saving, deleting and every swap request transition appends a row
+# to `events` (migration 013) in the same transaction as the change itself,
+# and fans it out to the people it concerns as rows of `user_feed`, each
+# with the message worded for that reader. A feed is keyed (user_id,
+# event_id) and trimmed to FEED_SIZE rows on every write, so the dashboard
+# reads recent activity with one short range scan however long the history
+# is. Feed rows don't point back into `events`; old events are compacted
+# away (see compact) without touching anyone's feed.
+
+LISTED = "listed"
+DELISTED = "delisted"
+SAVED = "saved"
+SWAP_REQUESTED = "swap_requested"
+SWAP_ACCEPTED = "swap_accepted"
+SWAP_REJECTED = "swap_rejected"
+SWAP_CLOSED = "swap_closed"
+
+FEED_SIZE = 50             # feed rows kept per user
+KEEP_EVENTS = 90 * 86400   # seconds events are kept before compaction
+COMPACT_BATCH = 1000
+COMPACT_INTERVAL = 3600
+
+
+def record(db, kind, actor_id, feed, item_id=None, swap_request_id=None, data=None):
+    """Append an event and fan it out inside the caller's transaction.
+
+    `feed` is [(user_id, message)], one entry per reader. Returns the event id.
+    """
+    event_id = db.execute("""
+        INSERT INTO events (kind, actor_id, item_id, swap_request_id, data)
+        VALUES (?, ?, ?, ?, ?)
+    """, (kind, actor_id, item_id, swap_request_id, json.dumps(data or {}))).lastrowid
+    readers = {}
+    for user_id, message in feed:
+        readers.setdefault(user_id, message)  # one row per reader
+    db.executemany(
+        "INSERT INTO user_feed (user_id, event_id, kind, message) VALUES (?, ?, ?, ?)",
+        [(user_id, event_id, kind, message) for user_id, message in readers.items()]
+    )
+    for user_id in readers:
+        trim(db, user_id)
+    return event_id
+
+
+def trim(db, user_id, keep=FEED_SIZE):
+    """Delete all but the newest `keep` rows of a user's feed."""
+    return db.execute("""
+        DELETE FROM user_feed WHERE user_id = :user_id AND event_id <= (
+            SELECT event_id FROM user_feed WHERE user_id = :user_id
+            ORDER BY event_id DESC LIMIT 1 OFFSET :keep
+        )
+    """, {"user_id": user_id, "keep": keep}).rowcount
+
+
+def feed(db, user_id, limit=10):
+    """A user's newest feed rows (event_id, kind, message, created_at)."""
+    return db.execute("""
+        SELECT event_id, kind, message, created_at FROM user_feed
+        WHERE user_id = ? ORDER BY event_id DESC LIMIT ?
+    """, (user_id, limit)).fetchall()
+
+
+def compact(db, older_than=KEEP_EVENTS, batch=COMPACT_BATCH):
+    """Delete events older than `older_than` seconds, and feed rows past FEED_SIZE.
+
+    Events go in batches of `batch`, each its own transaction, so writers
+    are never held up for long. Returns (events deleted, feed rows deleted).
+    """
+    cutoff = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(time.time() - older_than))
+    events = 0
+    while True:
+        with db:
+            deleted = db.execute("""
+                DELETE FROM events WHERE id IN (
+                    SELECT id FROM events WHERE created_at < ? ORDER BY created_at LIMIT ?
+                )
+            """, (cutoff, batch)).rowcount
+        events += deleted
+        if deleted < batch:
+            break
+
+    # Feeds are trimmed as they're written; this catches any that overshot
+    rows = 0
+    with db:
+        overfull = [row[0] for row in db.execute(
+            "SELECT user_id FROM user_feed GROUP BY user_id HAVING COUNT(*) > ?", (FEED_SIZE,))]
+        for user_id in overfull:
+            rows += trim(db, user_id)
+    return events, rows
+
+
+def counts(db):
+    """Rows in `events` and `user_feed` (for `flask events status`)."""
+    return {
+        "events": db.execute("SELECT COUNT(*) FROM events").fetchone()[0],
+        "feed_rows": db.execute("SELECT COUNT(*) FROM user_feed").fetchone()[0],
+        "oldest_event": db.execute("SELECT MIN(created_at) FROM events").fetchone()[0],
+    }
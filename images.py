@@ -0,0 +1,352 @@
+import json
+import os
+import struct
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from markupsafe import Markup, escape
+
+Image = ImageOps = None  # PIL, imported on first use by _load_pil()
+_pil_checked = False
+
+# --- IMAGE PIPELINE ---
+# Uploads are validated on the request thread (a cheap header check), then
+# resized into fixed-size JPEG + WebP variants in a worker process so the
+# request never waits on image decoding. The variants are recorded as JSON
+# on the item/user row and picked up by the responsive_image() helper.
+
+SIZES = {
+    "thumb": (400, 400),    # browse grid, profile lists, swap requests, avatars
+    "medium": (1000, 1000), # item detail page
+}
+
+ALLOWED_FORMATS = {"PNG", "JPEG", "GIF", "WEBP"}
+MAX_PIXELS = 40_000_000
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+
+class ImageError(ValueError):
+    pass
+
+
+def _load_pil():
+    # PIL is slow to import and only needed once someone uploads an image,
+    # so it stays out of the app's startup time
+    global Image, ImageOps, _pil_checked
+    if not _pil_checked:
+        try:
+            from PIL import Image, ImageOps
+        except ImportError:  # pipeline is skipped and originals are served as-is
+            pass
+        _pil_checked = True
+    return Image is not None
+
+
+def available():
+    return _load_pil()
+
+
+def validate(path):
+    """Raise ImageError unless `path` is an image we're willing to process."""
+    if not _load_pil():
+        return
+    try:
+        with Image.open(path) as im:
+            fmt = im.format
+            width, height = im.size
+            im.verify()
+    except Exception:
+        raise ImageError("File is not a valid image")
+    if fmt not in ALLOWED_FORMATS:
+        raise ImageError(f"Unsupported image format: {fmt}")
+    if width * height > MAX_PIXELS:
+        raise ImageError("Image dimensions are too large")
+
+
+def _flatten(im):
+    # JPEG has no alpha channel; put transparent images on white
+    if im.mode in ("RGBA", "LA") or (im.mode == "P" and "transparency" in im.info):
+        im = im.convert("RGBA")
+        background = Image.new("RGB", im.size, (255, 255, 255))
+        background.paste(im, mask=im.getchannel("A"))
+        return background
+    return im.convert("RGB")
+
+
+# --- METADATA STRIPPING ---
+# EXIF, XMP and text comments (GPS position, camera serials, editing
+# history) are cut out of the upload's JPEG/PNG/WebP container on the
+# request thread. Nothing is decoded, so the pixels are stored exactly as
+# sent and this costs a copy of the bytes, not a re-encode. Only the EXIF
+# orientation is kept, in a minimal EXIF block of its own, so photos still
+# display and resize upright. GIFs are stored as sent.
+
+ORIENTATION = 0x0112
+
+_JPEG_DROP = {0xE1, 0xED, 0xFE}         # APP1 (EXIF, XMP), APP13 (IPTC), comments
+_PNG_DROP = {b"eXIf", b"tEXt", b"zTXt", b"iTXt", b"tIME"}
+_WEBP_DROP = {b"EXIF", b"XMP "}
+
+
+def _orientation(tiff):
+    """The orientation tag of a TIFF-structured EXIF block, or None."""
+    try:
+        order = {b"II": "<", b"MM": ">"}[tiff[:2]]
+        ifd, = struct.unpack_from(order + "I", tiff, 4)
+        count, = struct.unpack_from(order + "H", tiff, ifd)
+        for n in range(count):
+            tag, kind, _, value = struct.unpack_from(order + "HHIH", tiff, ifd + 2 + n * 12)
+            if tag == ORIENTATION and kind == 3:
+                return value if 2 <= value <= 8 else None
+    except (KeyError, struct.error):
+        pass
+    return None
+
+
+def _exif(orientation):
+    """A TIFF block holding nothing but the orientation tag."""
+    return b"MM\x00\x2a" + struct.pack(">IHHHIHHI", 8, 1, ORIENTATION, 3, 1, orientation, 0, 0)
+
+
+def _strip_jpeg(data):
+    head, pos, orientation = [], 2, None
+    while True:
+        if data[pos] != 0xFF:
+            raise ValueError("bad JPEG marker")
+        marker = data[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker in (0xDA, 0xD9):  # start of scan: the rest is image data
+            break
+        if 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            head.append(data[pos:pos + 2])
+            pos += 2
+            continue
+        length, = struct.unpack_from(">H", data, pos + 2)
+        segment = data[pos:pos + 2 + length]
+        pos += 2 + length
+        if marker == 0xE1 and segment[4:10] == b"Exif\x00\x00":
+            orientation = orientation or _orientation(segment[10:])
+        if marker not in _JPEG_DROP:
+            head.append(segment)
+
+    if orientation:
+        exif = b"Exif\x00\x00" + _exif(orientation)
+        # EXIF goes right after SOI (and JFIF's APP0, which must come first)
+        at = 1 if head and head[0][1] == 0xE0 else 0
+        head.insert(at, b"\xff\xe1" + struct.pack(">H", len(exif) + 2) + exif)
+    return b"".join([data[:2], *head, data[pos:]])
+
+
+def _png_chunk(kind, body):
+    return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+
+def _strip_png(data):
+    out, pos = [data[:8]], 8
+    while pos < len(data):
+        length, = struct.unpack_from(">I", data, pos)
+        kind = data[pos + 4:pos + 8]
+        end = pos + 12 + length
+        if end > len(data):
+            raise ValueError("truncated PNG chunk")
+        if kind == b"eXIf":
+            orientation = _orientation(data[pos + 8:pos + 8 + length])
+            if orientation:  # in place, so it stays ahead of IDAT
+                out.append(_png_chunk(b"eXIf", _exif(orientation)))
+        elif kind not in _PNG_DROP:
+            out.append(data[pos:end])
+        pos = end
+    return b"".join(out)
+
+
+def _strip_webp(data):
+    chunks, pos, orientation = [], 12, None
+    while pos + 8 <= len(data):
+        kind = data[pos:pos + 4]
+        length, = struct.unpack_from("<I", data, pos + 4)
+        end = pos + 8 + length + (length & 1)
+        if end > len(data) + (length & 1):
+            raise ValueError("truncated WebP chunk")
+        if kind == b"EXIF":
+            body = data[pos + 8:pos + 8 + length]
+            orientation = _orientation(body[6:] if body.startswith(b"Exif\x00\x00") else body)
+        if kind not in _WEBP_DROP:
+            chunks.append(data[pos:end])
+        pos = end
+
+    if chunks and chunks[0][:4] == b"VP8X":
+        # Feature flags: bit 3 is EXIF, bit 2 XMP
+        flags = chunks[0][8] & ~0x0C | (0x08 if orientation else 0)
+        chunks[0] = chunks[0][:8] + bytes([flags]) + chunks[0][9:]
+        if orientation:
+            exif = _exif(orientation)
+            chunks.append(b"EXIF" + struct.pack("<I", len(exif)) + exif)
+    body = b"WEBP" + b"".join(chunks)
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def _stripper(data):
+    if data.startswith(b"\xff\xd8"):
+        return _strip_jpeg
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return _strip_png
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return _strip_webp
+    return None
+
+
+def strip_metadata(path):
+    """Cut EXIF and XMP out of `path` in place, keeping only its orientation.
+
+    Runs on the upload's temp file, before it is hashed and named, since a
+    stored upload is never rewritten. Raises ImageError if the container
+    can't be parsed.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    strip = _stripper(data)
+    if strip is None:
+        return
+    try:
+        stripped = strip(data)
+    except (ValueError, IndexError, struct.error):
+        raise ImageError("File is not a valid image")
+    if stripped != data:
+        # Written aside and renamed so the file is never seen half-written
+        with open(path + ".tmp", "wb") as f:
+            f.write(stripped)
+        os.replace(path + ".tmp", path)
+
+
+def process(path):
+    """Write the variants of `path` next to it (runs in a worker); `path` itself is left alone."""
+    _load_pil()
+    folder, filename = os.path.split(path)
+    stem = filename.rsplit(".", 1)[0]
+    variants = {}
+
+    with Image.open(path) as src:
+        im = ImageOps.exif_transpose(src)
+        im.load()
+
+    for name, box in SIZES.items():
+        variant = im.copy()
+        variant.thumbnail(box, Image.LANCZOS)
+
+        webp_name = f"{stem}.{name}.webp"
+        jpeg_name = f"{stem}.{name}.jpg"
+        variant.save(os.path.join(folder, webp_name), "WEBP", quality=WEBP_QUALITY, method=4)
+        _flatten(variant).save(os.path.join(folder, jpeg_name), "JPEG",
+                               quality=JPEG_QUALITY, optimize=True, progressive=True)
+
+        variants[name] = {
+            "width": variant.width,
+            "height": variant.height,
+            "webp": webp_name,
+            "jpeg": jpeg_name,
+        }
+    return variants
+
+
+def rebase(variants, folder):
+    """Make the variant names process() returned relative to the upload root."""
+    if not folder:
+        return variants
+    return {name: dict(v, webp=f"{folder}/{v['webp']}", jpeg=f"{folder}/{v['jpeg']}")
+            for name, v in variants.items()}
+
+
+def variant_files(variants):
+    """Filenames of every variant recorded in a JSON column value."""
+    data = _load(variants)
+    return [v[fmt] for v in data.values() for fmt in ("webp", "jpeg") if fmt in v]
+
+
+def variant_urls(url_for, variants, fmt="webp"):
+    """{size: URL} of the variants recorded in a JSON column value."""
+    return {size: url_for("static", filename="uploads/" + v[fmt])
+            for size, v in _load(variants).items() if fmt in v}
+
+
+def _load(variants):
+    if not variants:
+        return {}
+    if isinstance(variants, dict):
+        return variants
+    try:
+        return json.loads(variants)
+    except ValueError:
+        return {}
+
+
+class ImagePipeline:
+    def __init__(self, workers=2):
+        self.workers = workers
+        self._executor = None
+        self._pending = {}  # path -> future, so a shared upload is processed once
+        self._lock = threading.Lock()
+
+    def submit(self, path, on_done):
+        """Process `path` off the request thread; on_done(variants) gets the result."""
+        if not _load_pil():
+            return None
+        with self._lock:
+            future = self._pending.get(path)
+            if future is None:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                future = self._pending[path] = self._executor.submit(process, path)
+                future.add_done_callback(lambda f: self._forget(path))
+
+        def done(f):
+            try:
+                on_done(f.result())
+            except Exception as e:
+                print("❌ Image processing failed:", path, e)
+
+        future.add_done_callback(done)
+        return future
+
+    def _forget(self, path):
+        with self._lock:
+            self._pending.pop(path, None)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# --- TEMPLATE HELPER ---
+
+def responsive_image(url_for, filename, variants=None, alt="", css_class="",
+                     size="thumb", sizes="100vw"):
+    """<picture> markup serving WebP where supported, sized by srcset.
+
+    Falls back to a plain <img> of the original upload when the variants
+    haven't been generated (yet).
+    """
+    def url(name):
+        return url_for("static", filename="uploads/" + name)
+
+    data = _load(variants)
+    attrs = f'alt="{escape(alt)}" class="{escape(css_class)}" loading="lazy" decoding="async"'
+    if size not in data:
+        return Markup(f'<img src="{escape(url(filename))}" {attrs}>')
+
+    ordered = sorted(data.values(), key=lambda v: v["width"])
+    webp_set = ", ".join(f'{url(v["webp"])} {v["width"]}w' for v in ordered)
+    jpeg_set = ", ".join(f'{url(v["jpeg"])} {v["width"]}w' for v in ordered)
+    default = data[size]
+
+    return Markup(
+        '<picture style="display: contents">'
+        f'<source type="image/webp" srcset="{escape(webp_set)}" sizes="{escape(sizes)}">'
+        f'<img src="{escape(url(default["jpeg"]))}" srcset="{escape(jpeg_set)}" sizes="{escape(sizes)}" '
+        f'width="{default["width"]}" height="{default["height"]}" {attrs}>'
+        '</picture>'
+    )
@@ -0,0 +1,278 @@
+import atexit
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+
+# --- BACKGROUND JOB QUEUE ---
+# Work that doesn't have to finish before the response (deleting files,
+# for now) is written to the jobs table (migration 010) in the same
+# transaction as the change that makes it necessary, so it can't be lost to
+# a crash or forgotten after a rollback. Workers (a thread in each server
+# process, and/or `flask jobs work` processes) claim one job at a time:
+# claiming sets a lease, and a job whose worker died is claimed again once
+# the lease runs out. A failed job is retried with exponential backoff until
+# max_attempts, then left as 'dead' for `flask jobs retry`. Since a job can
+# run more than once, handlers must be idempotent. Idle workers also run
+# the periodic maintenance tasks registered with @periodic.
+
+MAX_ATTEMPTS = 5
+VISIBILITY_TIMEOUT = 300   # seconds a claimed job is leased to its worker
+BACKOFF_BASE = 10          # seconds before the first retry, doubling after that
+BACKOFF_MAX = 3600
+POLL_INTERVAL = 2.0
+KEEP_DONE = 7 * 86400      # finished jobs are pruned after this long
+PRUNE_INTERVAL = 3600
+
+HANDLERS = {}  # kind -> fn(payload)
+PERIODIC = {}  # name -> (interval, fn(db)), run by idle workers
+
+
+def handler(kind):
+    """Register fn(payload) as the handler of `kind` jobs."""
+    def decorator(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return decorator
+
+
+def periodic(name, interval):
+    """Have idle workers run fn(db) about every `interval` seconds (each worker on its own)."""
+    def decorator(fn):
+        PERIODIC[name] = (interval, fn)
+        return fn
+    return decorator
+
+
+def enqueue(db, kind, payload=None, delay=0, max_attempts=MAX_ATTEMPTS):
+    """Add a job inside the caller's transaction; it runs once that commits."""
+    now = int(time.time())
+    return db.execute(
+        "INSERT INTO jobs (kind, payload, max_attempts, available_at, created_at) VALUES (?, ?, ?, ?, ?)",
+        (kind, json.dumps(payload or {}), max_attempts, now + delay, now)
+    ).lastrowid
+
+
+def ready(db, now=None):
+    """True if a job could be claimed now (a plain read, no write lock)."""
+    return db.execute(
+        "SELECT 1 FROM jobs WHERE status IN ('queued', 'running') AND available_at <= ? LIMIT 1",
+        (now or int(time.time()),)
+    ).fetchone() is not None
+
+
+def claim(db, worker, visibility_timeout=VISIBILITY_TIMEOUT):
+    """Lease the next due job to `worker`. Returns its row, or None."""
+    now = int(time.time())
+    with db:
+        # Leases that ran out on the last attempt: the worker died mid-job
+        db.execute("""
+            UPDATE jobs SET status = 'dead', finished_at = ?, locked_by = NULL,
+                            last_error = coalesce(last_error, 'lease expired on the last attempt')
+            WHERE status = 'running' AND available_at <= ? AND attempts >= max_attempts
+        """, (now, now))
+        return db.execute("""
+            UPDATE jobs SET status = 'running', attempts = attempts + 1,
+                            available_at = ?, locked_by = ?
+            WHERE id = (
+                SELECT id FROM jobs
+                WHERE status IN ('queued', 'running') AND available_at <= ?
+                ORDER BY available_at, id LIMIT 1
+            )
+            RETURNING id, kind, payload, attempts, max_attempts
+        """, (now + visibility_timeout, worker, now)).fetchone()
+
+
+def ack(db, job):
+    """Mark a claimed job done. False if its lease had already been taken over."""
+    with db:
+        # attempts fences off a worker whose lease ran out and was re-claimed
+        return db.execute("""
+            UPDATE jobs SET status = 'done', finished_at = ?, locked_by = NULL, last_error = NULL
+            WHERE id = ? AND status = 'running' AND attempts = ?
+        """, (int(time.time()), job["id"], job["attempts"])).rowcount == 1
+
+
+def backoff(attempts):
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+    return int(delay * random.uniform(0.5, 1.0))  # jitter, so retries don't line up
+
+
+def fail(db, job, error):
+    """Schedule a retry of a claimed job, or mark it dead after its last attempt."""
+    now = int(time.time())
+    dead = job["attempts"] >= job["max_attempts"]
+    with db:
+        db.execute("""
+            UPDATE jobs SET status = ?, available_at = ?, finished_at = ?, locked_by = NULL, last_error = ?
+            WHERE id = ? AND status = 'running' AND attempts = ?
+        """, ("dead" if dead else "queued", now if dead else now + backoff(job["attempts"]),
+              now if dead else None, error[-2000:], job["id"], job["attempts"]))
+    return dead
+
+
+def retry(db, job_ids=None, kind=None):
+    """Queue dead jobs (all, by id or by kind) again with fresh attempts."""
+    sql = ("UPDATE jobs SET status = 'queued', attempts = 0, available_at = ?, finished_at = NULL "
+           "WHERE status = 'dead'")
+    params = [int(time.time())]
+    if job_ids:
+        sql += f" AND id IN ({','.join('?' * len(job_ids))})"
+        params += list(job_ids)
+    if kind:
+        sql += " AND kind = ?"
+        params.append(kind)
+    with db:
+        return db.execute(sql, params).rowcount
+
+
+@periodic("prune_jobs", PRUNE_INTERVAL)
+def prune(db, older_than=KEEP_DONE):
+    """Delete jobs that finished successfully more than `older_than` seconds ago."""
+    with db:
+        return db.execute("DELETE FROM jobs WHERE status = 'done' AND finished_at < ?",
+                          (int(time.time()) - older_than,)).rowcount
+
+
+def depth(db):
+    """{kind: {status: count}} of every job still in the table."""
+    counts = {}
+    for row in db.execute("SELECT kind, status, COUNT(*) FROM jobs GROUP BY kind, status"):
+        counts.setdefault(row[0], {})[row[1]] = row[2]
+    return counts
+
+
+def oldest_ready(db):
+    """Seconds the longest-waiting due job has been due, or None."""
+    now = int(time.time())
+    row = db.execute(
+        "SELECT MIN(available_at) FROM jobs WHERE status = 'queued' AND available_at <= ?", (now,)
+    ).fetchone()
+    return now - row[0] if row and row[0] is not None else None
+
+
+def dead(db, limit=20):
+    return db.execute(
+        "SELECT id, kind, attempts, last_error, finished_at FROM jobs WHERE status = 'dead' "
+        "ORDER BY finished_at DESC LIMIT ?", (limit,)
+    ).fetchall()
+
+
+class Worker:
+    """Claims and runs jobs from `pool` until stopped."""
+
+    def __init__(self, pool, name=None, visibility_timeout=VISIBILITY_TIMEOUT,
+                 poll_interval=POLL_INTERVAL, handlers=HANDLERS, periodic=PERIODIC):
+        self.pool = pool
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.handlers = handlers
+        self.periodic = periodic
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._last_run = {}  # periodic task name -> monotonic time
+
+        self.done = 0
+        self.failed = 0
+        self.dead = 0
+        self.errors = 0
+
+    def run_once(self):
+        """Run one due job. Returns False if there was none."""
+        conn = self.pool.acquire()
+        try:
+            if not ready(conn):
+                return False
+            job = claim(conn, self.name, self.visibility_timeout)
+            if job is None:
+                return False  # another worker got there first
+            fn = self.handlers.get(job["kind"])
+            try:
+                if fn is None:
+                    raise LookupError(f"no handler for {job['kind']!r} jobs")
+                fn(json.loads(job["payload"]))
+            except Exception as e:
+                print(f"❌ Job {job['id']} ({job['kind']}) failed, attempt {job['attempts']}:", e)
+                self.failed += 1
+                if fail(conn, job, traceback.format_exc()):
+                    self.dead += 1
+            else:
+                ack(conn, job)
+                self.done += 1
+            return True
+        except sqlite3.Error:
+            self.pool.release(conn, discard=True)
+            conn = None
+            raise
+        finally:
+            if conn is not None:
+                self.pool.release(conn)
+
+    def run(self, burst=False):
+        """Work until stop() (or, with `burst`, until nothing is due)."""
+        while not self._stopped.is_set():
+            try:
+                if self.run_once():
+                    continue
+                if burst:
+                    return
+                self.run_periodic()
+            except Exception as e:
+                self.errors += 1
+                print("❌ Job worker error:", e)
+                if burst:
+                    raise
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def run_periodic(self):
+        """Run the periodic tasks that are due."""
+        for name, (interval, fn) in list(self.periodic.items()):
+            if time.monotonic() - self._last_run.get(name, 0.0) <= interval:
+                continue
+            self._last_run[name] = time.monotonic()
+            conn = self.pool.acquire()
+            try:
+                fn(conn)
+            except Exception as e:
+                self.errors += 1
+                print(f"❌ Periodic task {name} failed:", e)
+            finally:
+                self.pool.release(conn)
+
+    def start(self):
+        """Run in a daemon thread of this process (started once)."""
+        if self._thread is not None or self._stopped.is_set():
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name="job-worker", daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.poll_interval + 1)
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "done": self.done,
+            "failed": self.failed,
+            "dead": self.dead,
+            "errors": self.errors,
+        }
@@ -0,0 +1,296 @@
+import queue
+import re
+import threading
+
+# --- SMART MATCHMAKING ---
+# Every active item is tokenized into an inverted index (match_terms):
+#   offer terms - what the item is (name, category)
+#   want terms  - what its owner wants in exchange (looking_for)
+# A user's matches are the other users' items whose offer terms hit any of
+# the user's want terms. When an item is listed or removed only the users
+# whose candidates could have changed are re-scored, and each user's top N
+# is stored in user_matches for the dashboard to read in one query.
+
+TOP_N = 10
+
+# Weight of an offer term by the field it came from
+NAME_WEIGHT = 2.0
+CATEGORY_WEIGHT = 1.0
+
+# Score (0-100) = coverage of the item by the user's wants, plus bonuses
+COVERAGE_POINTS = 60
+RECIPROCAL_POINTS = 25
+SAME_HOSTEL_POINTS = 15
+
+MAX_TERMS_PER_FIELD = 20
+
+STOPWORDS = {
+    "a", "an", "and", "any", "for", "in", "of", "on", "or", "the", "to",
+    "with", "some", "something", "anything", "my", "your", "it", "is",
+    "new", "used", "good", "old", "other",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    if not text:
+        return []
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if len(token) < 2 or token in STOPWORDS:
+            continue
+        # Crude plural folding so "books" matches "book"
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        if token not in terms:
+            terms.append(token)
+    return terms[:MAX_TERMS_PER_FIELD]
+
+
+def item_terms(item):
+    """Return ({offer term: weight}, [want terms]) for an item row."""
+    offers = {}
+    for term in tokenize(item["category"]):
+        offers[term] = CATEGORY_WEIGHT
+    for term in tokenize(item["name"]):
+        offers[term] = max(offers.get(term, 0), NAME_WEIGHT)
+    return offers, tokenize(item["looking_for"])
+
+
+# --- INDEX MAINTENANCE ---
+
+def index_item(db, item):
+    offers, wants = item_terms(item)
+    db.execute("DELETE FROM match_terms WHERE item_id = ?", (item["id"],))
+    db.executemany(
+        "INSERT INTO match_terms (term, kind, item_id, user_id, weight) VALUES (?, 'offer', ?, ?, ?)",
+        [(t, item["id"], item["owner_id"], w) for t, w in offers.items()]
+    )
+    db.executemany(
+        "INSERT INTO match_terms (term, kind, item_id, user_id, weight) VALUES (?, 'want', ?, ?, 1.0)",
+        [(t, item["id"], item["owner_id"]) for t in wants]
+    )
+    db.execute(
+        "INSERT OR REPLACE INTO match_items (item_id, user_id, offer_weight) VALUES (?, ?, ?)",
+        (item["id"], item["owner_id"], sum(offers.values()))
+    )
+
+
+def unindex_item(db, item_id):
+    db.execute("DELETE FROM match_terms WHERE item_id = ?", (item_id,))
+    db.execute("DELETE FROM match_items WHERE item_id = ?", (item_id,))
+    db.execute("DELETE FROM user_matches WHERE item_id = ?", (item_id,))
+
+
+def affected_users(db, item_id):
+    """Users whose matches can change when item_id appears or disappears."""
+    users = set()
+    # Its owner (their wants changed) ...
+    for row in db.execute("SELECT user_id FROM match_items WHERE item_id = ?", (item_id,)):
+        users.add(row[0])
+    # ... users who want what it offers ...
+    for row in db.execute("""
+        SELECT DISTINCT w.user_id
+        FROM match_terms o
+        JOIN match_terms w ON w.term = o.term AND w.kind = 'want'
+        WHERE o.item_id = ? AND o.kind = 'offer'
+    """, (item_id,)):
+        users.add(row[0])
+    # ... users offering what its owner wants (reciprocity changed) ...
+    for row in db.execute("""
+        SELECT DISTINCT o.user_id
+        FROM match_terms w
+        JOIN match_terms o ON o.term = w.term AND o.kind = 'offer'
+        WHERE w.item_id = ? AND w.kind = 'want'
+    """, (item_id,)):
+        users.add(row[0])
+    # ... and anyone currently showing it as a match
+    for row in db.execute("SELECT user_id FROM user_matches WHERE item_id = ?", (item_id,)):
+        users.add(row[0])
+    return users
+
+
+def score_user(db, user_id, top_n=TOP_N):
+    """Recompute and store the top N matches for one user."""
+    user = db.execute("SELECT hostel FROM users WHERE id = ?", (user_id,)).fetchone()
+    if user is None:
+        db.execute("DELETE FROM user_matches WHERE user_id = ?", (user_id,))
+        return []
+    hostel = (user[0] or "").strip().lower()
+
+    # Owners who want something this user offers
+    reciprocal = {row[0] for row in db.execute("""
+        SELECT DISTINCT w.user_id
+        FROM match_terms o
+        JOIN match_terms w ON w.term = o.term AND w.kind = 'want'
+        WHERE o.user_id = ? AND o.kind = 'offer' AND w.user_id != ?
+    """, (user_id, user_id))}
+
+    candidates = db.execute("""
+        SELECT o.item_id, o.user_id, SUM(o.weight) AS matched, mi.offer_weight, i.hostel
+        FROM match_terms o
+        JOIN match_items mi ON mi.item_id = o.item_id
+        JOIN items i ON i.id = o.item_id
+        WHERE o.kind = 'offer'
+          AND o.user_id != ?
+          AND o.term IN (SELECT term FROM match_terms WHERE user_id = ? AND kind = 'want')
+        GROUP BY o.item_id
+    """, (user_id, user_id)).fetchall()
+
+    scored = []
+    for item_id, owner_id, matched, offer_weight, item_hostel in candidates:
+        coverage = min(1.0, matched / offer_weight) if offer_weight else 0.0
+        is_reciprocal = owner_id in reciprocal
+        same_hostel = bool(hostel) and (item_hostel or "").strip().lower() == hostel
+        score = (COVERAGE_POINTS * coverage
+                 + (RECIPROCAL_POINTS if is_reciprocal else 0)
+                 + (SAME_HOSTEL_POINTS if same_hostel else 0))
+        scored.append((round(score), int(is_reciprocal), item_id, owner_id))
+
+    scored.sort(key=lambda s: (-s[0], -s[1], -s[2]))
+    top = scored[:top_n]
+
+    db.execute("DELETE FROM user_matches WHERE user_id = ?", (user_id,))
+    db.executemany(
+        "INSERT INTO user_matches (user_id, item_id, other_user_id, score, reciprocal) VALUES (?, ?, ?, ?, ?)",
+        [(user_id, item_id, owner_id, score, reciprocal) for score, reciprocal, item_id, owner_id in top]
+    )
+    return top
+
+
+def apply(db, listed=(), removed=(), users=(), top_n=TOP_N):
+    """Update the index for listed/removed item ids and re-score affected users.
+
+    `users` are extra user ids to re-score (e.g. after a hostel change).
+    """
+    users = set(users)
+    for item_id in removed:
+        users |= affected_users(db, item_id)
+        unindex_item(db, item_id)
+    for item_id in listed:
+        item = db.execute(
+            "SELECT id, owner_id, name, category, looking_for, is_active FROM items WHERE id = ?",
+            (item_id,)
+        ).fetchone()
+        if item is None or item["is_active"] != 1:
+            users |= affected_users(db, item_id)
+            unindex_item(db, item_id)
+            continue
+        users |= affected_users(db, item_id)  # before: old terms
+        index_item(db, item)
+        users |= affected_users(db, item_id)  # after: new terms
+    for user_id in users:
+        score_user(db, user_id, top_n)
+    return users
+
+
+def rebuild(db, top_n=TOP_N):
+    db.execute("DELETE FROM match_terms")
+    db.execute("DELETE FROM match_items")
+    db.execute("DELETE FROM user_matches")
+    for item in db.execute(
+        "SELECT id, owner_id, name, category, looking_for FROM items WHERE is_active = 1"
+    ).fetchall():
+        index_item(db, item)
+    users = [row[0] for row in db.execute(
+        "SELECT DISTINCT user_id FROM match_terms WHERE kind = 'want'"
+    ).fetchall()]
+    for user_id in users:
+        score_user(db, user_id, top_n)
+    return len(users)
+
+
+def needs_rebuild(db):
+    indexed = db.execute("SELECT 1 FROM match_items LIMIT 1").fetchone()
+    active = db.execute("SELECT 1 FROM items WHERE is_active = 1 LIMIT 1").fetchone()
+    return indexed is None and active is not None
+
+
+def top_matches(db, user_id, limit=TOP_N):
+    return db.execute("""
+        SELECT m.item_id, m.score AS match_score, m.reciprocal,
+               i.name AS their_item, i.looking_for, i.hostel,
+               u.username
+        FROM user_matches m
+        JOIN items i ON i.id = m.item_id
+        JOIN users u ON u.id = m.other_user_id
+        WHERE m.user_id = ?
+        ORDER BY m.score DESC, m.item_id DESC
+        LIMIT ?
+    """, (user_id, limit)).fetchall()
+
+
+# --- BACKGROUND UPDATES ---
+
+class MatchEngine:
+    """Applies item changes on a background thread so requests don't wait."""
+
+    def __init__(self, pool, top_n=TOP_N):
+        self.pool = pool
+        self.top_n = top_n
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.rescored_users = 0
+        self.errors = 0
+
+    def item_listed(self, item_id):
+        self._submit(("listed", item_id))
+
+    def item_removed(self, item_id):
+        self._submit(("removed", item_id))
+
+    def user_changed(self, user_id):
+        self._submit(("user", user_id))
+
+    def _submit(self, event):
+        self._queue.put(event)
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="match-engine", daemon=True)
+                    self._thread.start()
+
+    def _drain(self):
+        events = {"listed": [], "removed": [], "user": []}
+        while True:
+            try:
+                kind, row_id = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            events[kind].append(row_id)
+        return events
+
+    def flush(self):
+        """Apply everything queued so far (in the calling thread)."""
+        events = self._drain()
+        if not any(events.values()):
+            return set()
+        conn = self.pool.acquire()
+        try:
+            with conn:
+                users = apply(conn, events["listed"], events["removed"], events["user"], self.top_n)
+        except Exception:
+            self.errors += 1
+            self.pool.release(conn, discard=True)
+            raise
+        self.pool.release(conn)
+        self.rescored_users += len(users)
+        return users
+
+    def _run(self):
+        while True:
+            # Block for the first event, then batch whatever else arrived
+            self._queue.put(self._queue.get())
+            try:
+                self.flush()
+            except Exception as e:
+                print("❌ Match update failed:", e)
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "rescored_users": self.rescored_users,
+            "errors": self.errors,
+        }
@@ -0,0 +1,274 @@
+import bisect
+import contextvars
+import sqlite3
+import threading
+import time
+
+# --- REQUEST METRICS ---
+# Pool connections are opened with a Connection subclass whose cursors time
+# every statement (execute plus fetching its rows) and add it to the timings
+# of the request that ran it. Each response gets a Server-Timing header
+# (db, template, total) and the totals feed per-route histograms served in
+# the Prometheus text format. Statements slower than slow_query_ms are
+# printed with their EXPLAIN QUERY PLAN, whether or not a request ran them.
+
+SLOW_QUERY_MS = 100
+PREFIX = "sharespace"
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+_current = contextvars.ContextVar("request_timings", default=None)
+
+
+# --- PER-REQUEST TIMINGS ---
+
+class RequestTimings:
+    def __init__(self, route):
+        self.route = route
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.template = 0.0
+        self.slow_queries = 0
+        self._template_started = []
+
+    def template_started(self):
+        self._template_started.append(time.perf_counter())
+
+    def template_finished(self):
+        if self._template_started:
+            self.template += time.perf_counter() - self._template_started.pop()
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        return (f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries", '
+                f"template;dur={self.template * 1000:.1f}, "
+                f"total;dur={self.total() * 1000:.1f}")
+
+
+def start(route):
+    """Begin collecting timings for the current request. Returns a reset token."""
+    return _current.set(RequestTimings(route))
+
+
+def finish(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+# --- INSTRUMENTED CONNECTIONS ---
+
+class TimedCursor(sqlite3.Cursor):
+    _sql = None
+    _params = None
+    _elapsed = 0.0
+    _logged = True
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._add(time.perf_counter() - start, True)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql, None)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._add(time.perf_counter() - start, True)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._add(time.perf_counter() - start, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._add(time.perf_counter() - start, not rows)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._add(time.perf_counter() - start, True)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        done = True
+        try:
+            row = super().__next__()
+            done = False
+            return row
+        finally:
+            self._add(time.perf_counter() - start, done)
+
+    def _begin(self, sql, parameters):
+        self._sql = sql
+        self._params = parameters
+        self._elapsed = 0.0
+        self._logged = False
+        timings = _current.get()
+        if timings is not None:
+            timings.queries += 1
+
+    def _add(self, elapsed, check):
+        self._elapsed += elapsed
+        timings = _current.get()
+        if timings is not None:
+            timings.db += elapsed
+        # Checked once the statement has run and again once its rows are read
+        threshold = self.connection.slow_query_ms
+        if check and not self._logged and threshold and self._elapsed * 1000 >= threshold:
+            self._logged = True
+            if timings is not None:
+                timings.slow_queries += 1
+            log_slow_query(self.connection, self._sql, self._params, self._elapsed,
+                           timings.route if timings is not None else threading.current_thread().name)
+
+
+class Connection(sqlite3.Connection):
+    slow_query_ms = SLOW_QUERY_MS
+
+    def execute(self, sql, parameters=()):
+        return self.cursor(TimedCursor).execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor(TimedCursor).executemany(sql, seq_of_parameters)
+
+
+def connection_factory(slow_query_ms=SLOW_QUERY_MS):
+    """A Connection subclass to pass as sqlite3.connect(factory=...). 0 disables the slow log."""
+    return type("Connection", (Connection,), {"slow_query_ms": slow_query_ms})
+
+
+def explain(conn, sql, parameters=()):
+    """EXPLAIN QUERY PLAN as indented lines (empty if the statement has no plan)."""
+    try:
+        rows = conn.cursor().execute("EXPLAIN QUERY PLAN " + sql, parameters or ()).fetchall()
+    except sqlite3.Error as e:
+        return [f"(no plan: {e})"]
+    depth = {0: 0}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, 0) + 1
+        lines.append("  " * (depth[node_id] - 1) + detail)
+    return lines
+
+
+def log_slow_query(conn, sql, parameters, elapsed, where):
+    # executemany has no single set of parameters to plan with
+    plan = explain(conn, sql, parameters) if parameters is not None else []
+    print(f"🐢 Slow query ({elapsed * 1000:.1f} ms) in {where}:")
+    print("    " + " ".join(sql.split()))
+    for line in plan:
+        print("      " + line)
+
+
+# --- AGGREGATES ---
+
+class Histogram:
+    def __init__(self, name, help, labels, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., over the top bucket, sum, count]
+
+    def observe(self, values, amount):
+        series = self._series.get(values)
+        if series is None:
+            series = self._series[values] = [0] * (len(self.buckets) + 3)
+        series[bisect.bisect_left(self.buckets, amount)] += 1
+        series[-2] += amount
+        series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, series in sorted(self._series.items()):
+            labels = _labels(self.labels, values)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{{{labels}}} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._series = {}
+
+    def inc(self, values, amount=1):
+        self._series[values] = self._series.get(values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, count in sorted(self._series.items()):
+            lines.append(f"{self.name}{{{_labels(self.labels, values)}}} {count}")
+        return lines
+
+
+def _labels(names, values):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """Per-route request histograms, kept in this process since it started."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter(f"{PREFIX}_requests_total", "Requests handled.",
+                                ("route", "method", "status"))
+        self.duration = Histogram(f"{PREFIX}_request_duration_seconds",
+                                  "Time to produce the response.", ("route", "method"))
+        self.db = Histogram(f"{PREFIX}_request_db_seconds",
+                            "Time spent in SQL statements per request.", ("route",))
+        self.template = Histogram(f"{PREFIX}_request_template_seconds",
+                                  "Time spent rendering templates per request.", ("route",))
+        self.queries = Histogram(f"{PREFIX}_request_queries", "SQL statements per request.",
+                                 ("route",), buckets=QUERY_BUCKETS)
+        self.slow_queries = Counter(f"{PREFIX}_slow_queries_total",
+                                    "Statements over the slow query threshold.", ("route",))
+
+    def observe(self, timings, method, status):
+        route = (timings.route,)
+        total = timings.total()
+        with self._lock:
+            self.requests.inc((timings.route, method, str(status)))
+            self.duration.observe((timings.route, method), total)
+            self.db.observe(route, timings.db)
+            self.template.observe(route, timings.template)
+            self.queries.observe(route, timings.queries)
+            if timings.slow_queries:
+                self.slow_queries.inc(route, timings.slow_queries)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.duration, self.db, self.template,
+                           self.queries, self.slow_queries):
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
@@ -0,0 +1,594 @@
+import sqlite3
+
+# --- SCHEMA MIGRATIONS ---
+# The schema version lives in the database itself (PRAGMA user_version).
+# Every migration is a numbered function; upgrade() runs the ones newer
+# than the stored version, each inside its own transaction.
+#
+# Never edit a migration that has shipped - add a new one instead.
+
+MIGRATIONS = []
+
+
+def migration(version, name):
+    def register(fn):
+        MIGRATIONS.append((version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+def current_version(db):
+    return db.execute("PRAGMA user_version").fetchone()[0]
+
+
+def latest_version():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def pending(db):
+    version = current_version(db)
+    return [m for m in MIGRATIONS if m[0] > version]
+
+
+def upgrade(db, target=None, log=print):
+    """Apply every pending migration up to `target`. Returns the new version."""
+    for version, name, fn in pending(db):
+        if target is not None and version > target:
+            break
+        db.execute("BEGIN")
+        try:
+            fn(db)
+            # PRAGMA doesn't take parameters; version is always our own int
+            db.execute(f"PRAGMA user_version = {int(version)}")
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        log(f"applied migration {version:03d}_{name}")
+    return current_version(db)
+
+
+def _columns(db, table):
+    return {row[1] for row in db.execute(f"PRAGMA table_info({table})")}
+
+
+def _add_column(db, table, column, decl):
+    if column not in _columns(db, table):
+        db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+@migration(1, "baseline")
+def _baseline(db):
+    # Fresh databases get the full schema; older ones only get the columns
+    # that were added by hand over time.
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            hostel TEXT,
+            phone TEXT
+        )
+    """)
+    _add_column(db, "users", "email", "TEXT")
+    _add_column(db, "users", "profile_picture", "TEXT DEFAULT NULL")
+
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            owner_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            category TEXT,
+            description TEXT,
+            image TEXT,
+            hostel TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            is_active INTEGER DEFAULT 1,
+            FOREIGN KEY (owner_id) REFERENCES users(id)
+        )
+    """)
+    _add_column(db, "items", "condition", "TEXT")
+    _add_column(db, "items", "looking_for", "TEXT")
+    _add_column(db, "items", "contact_method", "TEXT DEFAULT 'email'")
+    _add_column(db, "items", "views", "INTEGER DEFAULT 0")
+
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS swap_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            requester_id INTEGER NOT NULL,
+            item_id INTEGER NOT NULL,
+            owner_id INTEGER NOT NULL,
+            status TEXT DEFAULT 'pending',
+            message TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            responded_at TIMESTAMP,
+            FOREIGN KEY (requester_id) REFERENCES users(id) ON DELETE CASCADE,
+            FOREIGN KEY (item_id) REFERENCES items(id) ON DELETE CASCADE,
+            FOREIGN KEY (owner_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """)
+
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS saved_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            item_id INTEGER,
+            UNIQUE(user_id, item_id),
+            FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
+            FOREIGN KEY(item_id) REFERENCES items(id) ON DELETE CASCADE
+        )
+    """)
+
+
+@migration(2, "hot_path_indexes")
+def _hot_path_indexes(db):
+    # items.id is the rowid, so SQLite appends it to every index for free:
+    # (is_active, created_at) already orders by (created_at, id) for the
+    # keyset cursors in the browse listing.
+    db.execute("CREATE INDEX IF NOT EXISTS idx_items_active_created ON items(is_active, created_at)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_items_active_views ON items(is_active, views)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_items_active_category_created ON items(is_active, category, created_at)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_items_owner_active ON items(owner_id, is_active, created_at)")
+
+    db.execute("CREATE INDEX IF NOT EXISTS idx_swaps_owner_status ON swap_requests(owner_id, status)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_swaps_owner_created ON swap_requests(owner_id, created_at)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_swaps_requester_status ON swap_requests(requester_id, status, item_id)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_swaps_requester_created ON swap_requests(requester_id, created_at)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_swaps_item_requester ON swap_requests(item_id, requester_id, status)")
+
+    # saved_items(user_id, ...) is covered by its UNIQUE constraint; this one
+    # keeps ON DELETE CASCADE from items from scanning the table
+    db.execute("CREATE INDEX IF NOT EXISTS idx_saved_items_item ON saved_items(item_id)")
+
+    db.execute("ANALYZE")
+
+
+@migration(3, "user_stats")
+def _user_stats(db):
+    # Per-user dashboard counters, kept current by triggers so the dashboard
+    # is a single primary-key lookup. Decrements are plain UPDATEs (a no-op
+    # once the user is gone); increments upsert the row.
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id INTEGER PRIMARY KEY,
+            active_offers INTEGER NOT NULL DEFAULT 0,
+            total_views INTEGER NOT NULL DEFAULT 0,
+            pending_requests INTEGER NOT NULL DEFAULT 0,
+            completed_swaps INTEGER NOT NULL DEFAULT 0,
+            total_attempts INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    add_item = """
+        INSERT INTO user_stats (user_id, active_offers, total_views)
+        VALUES (new.owner_id, new.is_active IS 1, COALESCE(new.views, 0))
+        ON CONFLICT(user_id) DO UPDATE SET
+            active_offers = active_offers + excluded.active_offers,
+            total_views = total_views + excluded.total_views;
+    """
+    remove_item = """
+        UPDATE user_stats SET
+            active_offers = active_offers - (old.is_active IS 1),
+            total_views = total_views - COALESCE(old.views, 0)
+        WHERE user_id = old.owner_id;
+    """
+    add_swap = """
+        INSERT INTO user_stats (user_id, pending_requests, completed_swaps, total_attempts)
+        VALUES (new.owner_id, new.status IS 'pending', new.status IS 'accepted', 1)
+        ON CONFLICT(user_id) DO UPDATE SET
+            pending_requests = pending_requests + excluded.pending_requests,
+            completed_swaps = completed_swaps + excluded.completed_swaps,
+            total_attempts = total_attempts + 1;
+    """
+    remove_swap = """
+        UPDATE user_stats SET
+            pending_requests = pending_requests - (old.status IS 'pending'),
+            completed_swaps = completed_swaps - (old.status IS 'accepted'),
+            total_attempts = total_attempts - 1
+        WHERE user_id = old.owner_id;
+    """
+
+    db.execute(f"CREATE TRIGGER IF NOT EXISTS user_stats_items_ai AFTER INSERT ON items BEGIN {add_item} END")
+    db.execute(f"CREATE TRIGGER IF NOT EXISTS user_stats_items_ad AFTER DELETE ON items BEGIN {remove_item} END")
+    db.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS user_stats_items_au AFTER UPDATE OF owner_id, is_active, views ON items
+        BEGIN {remove_item} {add_item} END
+    """)
+    db.execute(f"CREATE TRIGGER IF NOT EXISTS user_stats_swaps_ai AFTER INSERT ON swap_requests BEGIN {add_swap} END")
+    db.execute(f"CREATE TRIGGER IF NOT EXISTS user_stats_swaps_ad AFTER DELETE ON swap_requests BEGIN {remove_swap} END")
+    db.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS user_stats_swaps_au AFTER UPDATE OF owner_id, status ON swap_requests
+        BEGIN {remove_swap} {add_swap} END
+    """)
+    db.execute("""
+        CREATE TRIGGER IF NOT EXISTS user_stats_users_ad AFTER DELETE ON users BEGIN
+            DELETE FROM user_stats WHERE user_id = old.id;
+        END
+    """)
+
+    # Backfill from existing history
+    db.execute("""
+        INSERT INTO user_stats (user_id, active_offers, total_views,
+                                pending_requests, completed_swaps, total_attempts)
+        SELECT u.id,
+               (SELECT COUNT(*) FROM items WHERE owner_id = u.id AND is_active = 1),
+               (SELECT COALESCE(SUM(views), 0) FROM items WHERE owner_id = u.id),
+               (SELECT COUNT(*) FROM swap_requests WHERE owner_id = u.id AND status = 'pending'),
+               (SELECT COUNT(*) FROM swap_requests WHERE owner_id = u.id AND status = 'accepted'),
+               (SELECT COUNT(*) FROM swap_requests WHERE owner_id = u.id)
+        FROM users u
+        WHERE true
+        ON CONFLICT(user_id) DO NOTHING
+    """)
+
+
+@migration(4, "image_variants")
+def _image_variants(db):
+    # JSON written by the image pipeline once resized variants exist
+    _add_column(db, "items", "image_variants", "TEXT")
+    _add_column(db, "users", "profile_picture_variants", "TEXT")
+
+
+@migration(5, "matchmaking")
+def _matchmaking(db):
+    # Inverted index of item terms (see matching.py)
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS match_terms (
+            term TEXT NOT NULL,
+            kind TEXT NOT NULL,          -- 'offer' or 'want'
+            item_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            weight REAL NOT NULL DEFAULT 1.0,
+            PRIMARY KEY (term, kind, item_id)
+        ) WITHOUT ROWID
+    """)
+    db.execute("CREATE INDEX IF NOT EXISTS idx_match_terms_item ON match_terms(item_id)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_match_terms_user ON match_terms(user_id, kind, term)")
+
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS match_items (
+            item_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            offer_weight REAL NOT NULL
+        )
+    """)
+
+    # Precomputed top N matches per user
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS user_matches (
+            user_id INTEGER NOT NULL,
+            item_id INTEGER NOT NULL,
+            other_user_id INTEGER NOT NULL,
+            score INTEGER NOT NULL,
+            reciprocal INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, item_id)
+        ) WITHOUT ROWID
+    """)
+    db.execute("CREATE INDEX IF NOT EXISTS idx_user_matches_item ON user_matches(item_id)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_user_matches_score ON user_matches(user_id, score)")
+
+    db.execute("""
+        CREATE TRIGGER IF NOT EXISTS user_matches_users_ad AFTER DELETE ON users BEGIN
+            DELETE FROM user_matches WHERE user_id = old.id;
+        END
+    """)
+
+
+@migration(6, "versions")
+def _versions(db):
+    # Version stamps for conditional GETs (see conditional.py). Scopes are
+    # 'items' (anything in the browse listing), 'item:<id>' and 'user:<id>'
+    # (anything shown only to, or about, that user). Triggers bump them.
+    # items.views is left out on purpose: view flushes shouldn't bust caches.
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS versions (
+            scope TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            changed_at TEXT NOT NULL
+        ) WITHOUT ROWID
+    """)
+
+    def bump(select):
+        return f"""
+            INSERT INTO versions (scope, version, changed_at)
+            {select}
+            ON CONFLICT(scope) DO UPDATE SET
+                version = version + 1, changed_at = excluded.changed_at;
+        """
+
+    def bump_scope(scope):
+        return bump(f"SELECT {scope}, 1, CURRENT_TIMESTAMP WHERE true")
+
+    def bump_item(ref):
+        return (bump_scope("'items'")
+                + bump_scope(f"'item:' || {ref}.id")
+                + bump_scope(f"'user:' || {ref}.owner_id")
+                + bump(f"SELECT 'user:' || user_id, 1, CURRENT_TIMESTAMP FROM saved_items WHERE item_id = {ref}.id"))
+
+    item_columns = ("owner_id, name, category, description, image, image_variants, "
+                    "hostel, is_active, condition, looking_for, contact_method")
+
+    db.execute(f"CREATE TRIGGER IF NOT EXISTS versions_items_ai AFTER INSERT ON items BEGIN {bump_item('new')} END")
+    db.execute(f"CREATE TRIGGER IF NOT EXISTS versions_items_ad AFTER DELETE ON items BEGIN {bump_item('old')} END")
+    db.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS versions_items_au AFTER UPDATE OF {item_columns} ON items
+        BEGIN {bump_item('old')} {bump_item('new')} END
+    """)
+
+    # Owner name/phone/hostel show up on every page of their items
+    db.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS versions_users_au
+        AFTER UPDATE OF username, email, phone, hostel, profile_picture, profile_picture_variants ON users
+        BEGIN
+            {bump_scope("'user:' || new.id")}
+            {bump_scope("'items'")}
+            {bump("SELECT 'item:' || id, 1, CURRENT_TIMESTAMP FROM items WHERE owner_id = new.id")}
+            {bump("SELECT 'user:' || s.user_id, 1, CURRENT_TIMESTAMP FROM saved_items s "
+                  "JOIN items i ON i.id = s.item_id WHERE i.owner_id = new.id")}
+        END
+    """)
+
+    def swap(ref):
+        return bump_scope(f"'user:' || {ref}.requester_id") + bump_scope(f"'user:' || {ref}.owner_id")
+
+    db.execute(f"CREATE TRIGGER IF NOT EXISTS versions_swaps_ai AFTER INSERT ON swap_requests BEGIN {swap('new')} END")
+    db.execute(f"CREATE TRIGGER IF NOT EXISTS versions_swaps_au AFTER UPDATE ON swap_requests BEGIN {swap('old')} {swap('new')} END")
+    db.execute(f"CREATE TRIGGER IF NOT EXISTS versions_swaps_ad AFTER DELETE ON swap_requests BEGIN {swap('old')} END")
+
+    def saver(ref):
+        return bump_scope(f"'user:' || {ref}.user_id")
+
+    db.execute(f"CREATE TRIGGER IF NOT EXISTS versions_saved_ai AFTER INSERT ON saved_items BEGIN {saver('new')} END")
+    db.execute(f"CREATE TRIGGER IF NOT EXISTS versions_saved_ad AFTER DELETE ON saved_items BEGIN {saver('old')} END")
+
+
+@migration(7, "notifications")
+def _notifications(db):
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            message TEXT NOT NULL,
+            link TEXT,
+            swap_request_id INTEGER,
+            status TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            read_at TEXT,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+            FOREIGN KEY (swap_request_id) REFERENCES swap_requests(id) ON DELETE SET NULL
+        )
+    """)
+    # The stream replays by id; unread counts only touch the partial index
+    db.execute("CREATE INDEX IF NOT EXISTS idx_notifications_user ON notifications(user_id, id)")
+    db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_notifications_unread
+        ON notifications(user_id) WHERE read_at IS NULL
+    """)
+
+
+@migration(8, "upload_blobs")
+def _upload_blobs(db):
+    # Content-addressed uploads (see blobstore.py). refcount is the number of
+    # items/users rows whose image points at the blob, kept by triggers;
+    # the GC removes blobs that have sat at zero for a grace period.
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS blobs (
+            hash TEXT PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE,
+            size INTEGER NOT NULL,
+            variants TEXT,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            last_used_at INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    db.execute("CREATE INDEX IF NOT EXISTS idx_blobs_unreferenced ON blobs(last_used_at) WHERE refcount <= 0")
+
+    def adjust(path, delta):
+        return f"UPDATE blobs SET refcount = refcount {delta} WHERE path = {path};"
+
+    for table, column in (("items", "image"), ("users", "profile_picture")):
+        db.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS blobs_{table}_ai AFTER INSERT ON {table}
+            WHEN new.{column} IS NOT NULL
+            BEGIN {adjust(f"new.{column}", "+ 1")} END
+        """)
+        db.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS blobs_{table}_ad AFTER DELETE ON {table}
+            WHEN old.{column} IS NOT NULL
+            BEGIN {adjust(f"old.{column}", "- 1")} END
+        """)
+        db.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS blobs_{table}_au AFTER UPDATE OF {column} ON {table}
+            WHEN new.{column} IS NOT old.{column}
+            BEGIN {adjust(f"old.{column}", "- 1")} {adjust(f"new.{column}", "+ 1")} END
+        """)
+
+
+@migration(9, "import_checkpoints")
+def _import_checkpoints(db):
+    # Progress of named bulk imports (see bulk.py), updated in the same
+    # transaction as each batch so a resumed import neither skips nor repeats rows
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS import_checkpoints (
+            name TEXT PRIMARY KEY,
+            records INTEGER NOT NULL DEFAULT 0,
+            imported INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            finished_at TEXT
+        ) WITHOUT ROWID
+    """)
+
+
+@migration(10, "jobs")
+def _jobs(db):
+    # Background job queue (see jobs.py). available_at is when a queued job
+    # may run, or when a running one's lease expires and it may be claimed
+    # again, so both are found with one index.
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL DEFAULT '{}',
+            status TEXT NOT NULL DEFAULT 'queued',   -- queued | running | done | dead
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL,
+            available_at INTEGER NOT NULL,
+            locked_by TEXT,
+            last_error TEXT,
+            created_at INTEGER NOT NULL,
+            finished_at INTEGER
+        )
+    """)
+    db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_jobs_available
+        ON jobs(available_at) WHERE status IN ('queued', 'running')
+    """)
+    # Pruning finished jobs and listing dead ones
+    db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs(finished_at) WHERE finished_at IS NOT NULL")
+
+
+@migration(11, "one_pending_swap")
+def _one_pending_swap(db):
+    # At most one pending request per requester and item, enforced by the
+    # database (see swaps.py). Older duplicates are closed, keeping the first.
+    db.execute("""
+        UPDATE swap_requests SET status = 'closed', responded_at = CURRENT_TIMESTAMP
+        WHERE status = 'pending' AND id NOT IN (
+            SELECT MIN(id) FROM swap_requests WHERE status = 'pending' GROUP BY item_id, requester_id
+        )
+    """)
+    db.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_swaps_one_pending
+        ON swap_requests(item_id, requester_id) WHERE status = 'pending'
+    """)
+
+
+@migration(12, "hostel_index")
+def _hostel_index(db):
+    # One pre-sorted run of listings per hostel for sort=nearest (see proximity.py)
+    db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_items_active_hostel_created
+        ON items(is_active, lower(trim(hostel)), created_at)
+    """)
+
+
+@migration(13, "activity_events")
+def _activity_events(db):
+    # Append-only activity log and the per-user feeds it fans out to (see
+    # events.py). Events outlive deleted items and their actor's account.
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            actor_id INTEGER,
+            item_id INTEGER,
+            swap_request_id INTEGER,
+            data TEXT NOT NULL DEFAULT '{}',
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (actor_id) REFERENCES users(id) ON DELETE SET NULL
+        )
+    """)
+    db.execute("CREATE INDEX IF NOT EXISTS idx_events_created ON events(created_at)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_events_actor ON events(actor_id)")
+    # Clustered by reader, newest last: the dashboard reads the tail of one range
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS user_feed (
+            user_id INTEGER NOT NULL,
+            event_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            message TEXT NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, event_id),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    """)
+
+
+# --- QUERY PLAN REPORT ---
+# The queries the routes run on every page view, with representative
+# parameters. `flask db explain` prints the plan for each one and flags
+# any that fall back to a full table scan.
+
+ROUTE_QUERIES = [
+    ("dashboard: stats",
+     "SELECT * FROM user_stats WHERE user_id = ?", (1,)),
+    ("dashboard: matches",
+     "SELECT m.item_id, i.name, u.username FROM user_matches m JOIN items i ON i.id = m.item_id "
+     "JOIN users u ON u.id = m.other_user_id WHERE m.user_id = ? "
+     "ORDER BY m.score DESC, m.item_id DESC LIMIT 10", (1,)),
+    ("dashboard: recent activity",
+     "SELECT event_id, kind, message, created_at FROM user_feed WHERE user_id = ? "
+     "ORDER BY event_id DESC LIMIT 10", (1,)),
+    ("dashboard: pending requests",
+     "SELECT sr.id FROM swap_requests sr JOIN items i ON sr.item_id = i.id "
+     "JOIN users u ON sr.requester_id = u.id WHERE sr.owner_id = ? AND sr.status = 'pending' "
+     "ORDER BY sr.created_at DESC LIMIT 3", (1,)),
+    ("swapRequests: incoming",
+     "SELECT sr.id FROM swap_requests sr JOIN items i ON sr.item_id = i.id "
+     "JOIN users u ON sr.requester_id = u.id WHERE sr.owner_id = ? ORDER BY sr.created_at DESC", (1,)),
+    ("swapRequests: outgoing",
+     "SELECT sr.id FROM swap_requests sr JOIN items i ON sr.item_id = i.id "
+     "JOIN users u ON sr.owner_id = u.id WHERE sr.requester_id = ? ORDER BY sr.created_at DESC", (1,)),
+    ("respond_to_swap: competing pending",
+     "SELECT id FROM swap_requests WHERE item_id = ? AND status = 'pending'", (1,)),
+    ("browseItems: requested ids",
+     "SELECT item_id FROM swap_requests WHERE requester_id = ? AND status = 'pending' AND item_id IN (?, ?)", (1, 1, 2)),
+    ("browseItems: newest",
+     "SELECT items.* FROM items JOIN users ON items.owner_id = users.id WHERE items.is_active = 1 "
+     "AND (items.created_at, items.id) < (?, ?) ORDER BY items.created_at DESC, items.id DESC LIMIT 25",
+     ("9999-12-31", 0)),
+    ("browseItems: popular",
+     "SELECT items.* FROM items JOIN users ON items.owner_id = users.id WHERE items.is_active = 1 "
+     "ORDER BY items.views DESC, items.id DESC LIMIT 25", ()),
+    ("browseItems: nearest, one hostel",
+     "SELECT items.* FROM items JOIN users ON items.owner_id = users.id WHERE items.is_active = 1 "
+     "AND lower(trim(items.hostel)) = ? ORDER BY items.created_at DESC, items.id DESC LIMIT 25", ("hall a",)),
+    ("browseItems: category",
+     "SELECT items.* FROM items JOIN users ON items.owner_id = users.id WHERE items.is_active = 1 "
+     "AND items.category = ? ORDER BY items.created_at DESC, items.id DESC LIMIT 25", ("books",)),
+    ("profile: active listings",
+     "SELECT * FROM items WHERE owner_id = ? AND is_active = 1 ORDER BY created_at DESC", (1,)),
+    ("profile: saved items",
+     "SELECT items.id FROM saved_items JOIN items ON saved_items.item_id = items.id "
+     "JOIN users ON items.owner_id = users.id WHERE saved_items.user_id = ? AND items.is_active = 1", (1,)),
+    ("notifications: unread count",
+     "SELECT COUNT(*) FROM notifications WHERE user_id = ? AND read_at IS NULL", (1,)),
+    ("notifications: stream replay",
+     "SELECT * FROM notifications WHERE user_id = ? AND id > ? ORDER BY id LIMIT 100", (1, 0)),
+    ("jobs: next due",
+     "SELECT id FROM jobs WHERE status IN ('queued', 'running') AND available_at <= ? "
+     "ORDER BY available_at, id LIMIT 1", (0,)),
+]
+
+
+def _is_full_scan(detail):
+    # "SCAN items" is a table scan; "SCAN items USING INDEX ..." walks an
+    # index in order (fine for ORDER BY ... LIMIT), and SEARCH is a seek.
+    return detail.startswith("SCAN ") and " USING " not in detail
+
+
+def explain(db, queries=ROUTE_QUERIES):
+    """Return [(label, [plan details], uses_index)] for each route query."""
+    report = []
+    for label, sql, params in queries:
+        try:
+            rows = db.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            report.append((label, [f"error: {e}"], False))
+            continue
+        details = [row[3] for row in rows]
+        report.append((label, details, not any(_is_full_scan(d) for d in details)))
+    return report
+
+
+def print_report(report, log=print):
+    ok = True
+    for label, details, uses_index in report:
+        log(f"[{'ok' if uses_index else 'SCAN'}] {label}")
+        for d in details:
+            log(f"       {d}")
+        ok = ok and uses_index
+    return ok
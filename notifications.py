@@ -0,0 +1,199 @@
+import json
+import queue
+import threading
+import time
+
+# --- NOTIFICATIONS ---
+# Swap activity is written to the notifications table in the same
+# transaction as the change that caused it, then published on an in-process
+# bus. Each open /notifications/stream response is a subscriber and relays
+# what it receives as Server-Sent Events. The table is the source of truth:
+# a reconnecting client sends Last-Event-ID and is replayed whatever it
+# missed, and an idle stream re-checks the table on every heartbeat, so
+# notifications written by another process still arrive.
+
+HEARTBEAT = 15       # seconds between keep-alive comments
+MAX_STREAM_AGE = 300 # streams are closed and reconnect so threads get recycled
+RETRY_MS = 3000      # reconnect delay the browser is told to use
+REPLAY_LIMIT = 100
+QUEUE_SIZE = 100
+
+
+class StreamLimitReached(Exception):
+    pass
+
+
+# --- STORAGE ---
+
+def create(db, user_id, kind, message, link=None, swap_request_id=None, status=None):
+    """Insert a notification (the caller commits) and return it as an event dict."""
+    cur = db.execute("""
+        INSERT INTO notifications (user_id, kind, message, link, swap_request_id, status)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (user_id, kind, message, link, swap_request_id, status))
+    row = db.execute("SELECT * FROM notifications WHERE id = ?", (cur.lastrowid,)).fetchone()
+    return _event(row, unread_count(db, user_id))
+
+
+def unread_count(db, user_id):
+    return db.execute(
+        "SELECT COUNT(*) FROM notifications WHERE user_id = ? AND read_at IS NULL", (user_id,)
+    ).fetchone()[0]
+
+
+def recent(db, user_id, limit=50):
+    return db.execute("""
+        SELECT * FROM notifications WHERE user_id = ?
+        ORDER BY id DESC LIMIT ?
+    """, (user_id, limit)).fetchall()
+
+
+def since(db, user_id, last_id, limit=REPLAY_LIMIT):
+    rows = db.execute("""
+        SELECT * FROM notifications WHERE user_id = ? AND id > ?
+        ORDER BY id LIMIT ?
+    """, (user_id, last_id, limit)).fetchall()
+    if not rows:
+        return []
+    unread = unread_count(db, user_id)
+    return [_event(row, unread) for row in rows]
+
+
+def latest_id(db, user_id):
+    row = db.execute("SELECT MAX(id) FROM notifications WHERE user_id = ?", (user_id,)).fetchone()
+    return row[0] or 0
+
+
+def mark_read(db, user_id):
+    return db.execute("""
+        UPDATE notifications SET read_at = CURRENT_TIMESTAMP
+        WHERE user_id = ? AND read_at IS NULL
+    """, (user_id,)).rowcount
+
+
+def _event(row, unread):
+    return {
+        "id": row["id"],
+        "kind": row["kind"],
+        "message": row["message"],
+        "link": row["link"],
+        "swap_request_id": row["swap_request_id"],
+        "status": row["status"],
+        "created_at": row["created_at"],
+        "unread": unread,
+    }
+
+
+# --- PUB/SUB ---
+
+class NotificationBus:
+    """Fan-out of new notifications to the streams open in this process.
+
+    The number of concurrent streams is capped (overall and per user):
+    every stream holds a server thread for as long as it's open.
+    """
+
+    def __init__(self, max_streams=4, max_streams_per_user=2):
+        self.max_streams = max_streams
+        self.max_streams_per_user = max_streams_per_user
+        self._subscribers = {}  # user_id -> set of queues
+        self._lock = threading.Lock()
+        self.open_streams = 0
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    def subscribe(self, user_id):
+        with self._lock:
+            mine = self._subscribers.setdefault(user_id, set())
+            if self.open_streams >= self.max_streams or len(mine) >= self.max_streams_per_user:
+                self.rejected += 1
+                if not mine:
+                    del self._subscribers[user_id]
+                raise StreamLimitReached()
+            q = queue.Queue(QUEUE_SIZE)
+            mine.add(q)
+            self.open_streams += 1
+            return q
+
+    def unsubscribe(self, user_id, q):
+        with self._lock:
+            mine = self._subscribers.get(user_id)
+            if mine is None or q not in mine:
+                return
+            mine.discard(q)
+            if not mine:
+                del self._subscribers[user_id]
+            self.open_streams -= 1
+
+    def publish(self, user_id, event):
+        with self._lock:
+            targets = list(self._subscribers.get(user_id, ()))
+        self.published += 1
+        for q in targets:
+            try:
+                q.put_nowait(event)
+                self.delivered += 1
+            except queue.Full:
+                # The stream catches up from the table on its next heartbeat
+                self.dropped += 1
+
+    def stats(self):
+        return {
+            "open_streams": self.open_streams,
+            "max_streams": self.max_streams,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }
+
+
+# --- SERVER-SENT EVENTS ---
+
+def format_event(event):
+    return f"id: {event['id']}\nevent: notification\ndata: {json.dumps(event)}\n\n"
+
+
+def stream(pool, user_id, subscription, last_id=None, heartbeat=HEARTBEAT, max_age=MAX_STREAM_AGE):
+    """Yield SSE chunks for one subscriber until max_age runs out.
+
+    With no `last_id` (a fresh page load rather than a reconnect) only
+    notifications created from now on are sent. `pool` is used for short
+    replay queries; no connection is held while waiting. The caller
+    unsubscribes when the response is closed.
+    """
+    def fetch(after):
+        conn = pool.acquire()
+        try:
+            if after is None:
+                return [], latest_id(conn, user_id), unread_count(conn, user_id)
+            return since(conn, user_id, after), after, unread_count(conn, user_id)
+        finally:
+            pool.release(conn)
+
+    deadline = time.monotonic() + max_age
+    missed, last_id, unread = fetch(last_id)
+    yield f"retry: {RETRY_MS}\n"
+    # Carries the starting point, so a stream that drops before its first
+    # notification still reconnects with a Last-Event-ID and misses nothing
+    yield f"id: {last_id}\nevent: unread\ndata: {unread}\n\n"
+
+    while True:
+        for event in missed:
+            # The subscription was opened before the replay, so an event can
+            # arrive both ways
+            if event["id"] > last_id:
+                last_id = event["id"]
+                yield format_event(event)
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        try:
+            missed = [subscription.get(timeout=min(heartbeat, remaining))]
+        except queue.Empty:
+            missed, _, _ = fetch(last_id)
+            if not missed:
+                yield ": ping\n\n"
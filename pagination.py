@@ -0,0 +1,77 @@
+import base64
+import binascii
+import json
+
+# --- KEYSET (CURSOR) PAGINATION ---
+# Instead of OFFSET (which makes SQLite walk and throw away every earlier
+# row), each page remembers the sort key of its last row and the next page
+# starts strictly after it. Every key ends in a unique column (items.id) so
+# rows with equal created_at/views are never skipped or repeated.
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+# sort name -> (key columns, direction)
+SORT_KEYS = {
+    "newest": (("items.created_at", "items.id"), "DESC"),
+    "oldest": (("items.created_at", "items.id"), "ASC"),
+    "popular": (("items.views", "items.id"), "DESC"),
+}
+
+
+def encode_cursor(sort, values):
+    raw = json.dumps([sort, *values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor, sort):
+    """Return the key values stored in `cursor`, or None if it is unusable.
+
+    A cursor that is malformed, holds anything but strings and numbers, or
+    was issued for a different sort order is treated as "start from the
+    first page" rather than an error.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+    except (ValueError, binascii.Error):
+        return None
+    if not isinstance(data, list) or len(data) < 2 or data[0] != sort:
+        return None
+    # Only values SQLite can bind as a sort key
+    if not all(isinstance(v, (str, int, float)) and not isinstance(v, bool) for v in data[1:]):
+        return None
+    return data[1:]
+
+
+def page_size(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def keyset_clause(columns, direction, after):
+    """Return (where, params, order_by) for one page of a keyset scan.
+
+    `after` is the decoded cursor (or None for the first page). The WHERE
+    fragment uses a row-value comparison, which SQLite can satisfy with a
+    single seek into a matching composite index.
+    """
+    cols = ", ".join(columns)
+    order_by = " ORDER BY " + ", ".join(f"{c} {direction}" for c in columns)
+
+    if after is None or len(after) != len(columns):
+        return "", [], order_by
+
+    op = "<" if direction == "DESC" else ">"
+    marks = ", ".join("?" for _ in columns)
+    return f" AND ({cols}) {op} ({marks})", list(after), order_by
+
+
+def split_page(rows, size):
+    """Rows are fetched with LIMIT size + 1; the extra row only signals more."""
+    return rows[:size], len(rows) > size
@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# --- PASSWORD HASHING ---
+# Hashing and checking passwords is slow on purpose, and while it runs in a
+# request thread that thread (and the GIL) is busy. Here the work goes to a
+# small process pool instead; the request thread only waits on the result.
+# At most max_pending hashes are running or queued at once; past that a
+# sign-in fails fast with Busy (a 503 with Retry-After) instead of tying up
+# every server thread while other pages wait. Hashes made with different
+# parameters than the configured ones are replaced on the next sign-in.
+
+METHOD = "scrypt:32768:8:1"  # werkzeug method string, e.g. "pbkdf2:sha256:600000"
+SALT_LENGTH = 16
+RETRY_AFTER = 2     # seconds a rejected client is asked to wait
+TIMEOUT = 30.0
+
+
+class Busy(Exception):
+    def __init__(self, retry_after=RETRY_AFTER):
+        super().__init__("password hashing is saturated")
+        self.retry_after = retry_after
+
+
+def _hash(password, method, salt_length):
+    return generate_password_hash(password, method=method, salt_length=salt_length)
+
+
+def _check(password_hash, password):
+    return check_password_hash(password_hash, password)
+
+
+class PasswordHasher:
+    def __init__(self, workers=2, max_pending=4, method=METHOD, salt_length=SALT_LENGTH,
+                 timeout=TIMEOUT):
+        self.workers = workers  # 0 hashes in the calling thread (still bounded)
+        self.max_pending = max_pending
+        self.method = method
+        self.salt_length = salt_length
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._prefix = None
+        self._pid = os.getpid()
+
+        self.hashed = 0
+        self.checked = 0
+        self.rehashed = 0
+        self.rejected = 0
+        self.busy_time = 0.0
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method, self.salt_length)
+
+    def check(self, password_hash, password):
+        if not password_hash:
+            return False
+        return self._run(_check, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if password_hash was made with other parameters than the configured ones."""
+        if self._prefix is None:
+            # werkzeug fills in defaults ("scrypt" -> "scrypt:32768:8:1"), so
+            # compare against what the configured method actually produces.
+            # A fully spelled-out method is its own prefix, which saves a
+            # whole hash on the first sign-in after a restart.
+            parts = self.method.split(":")
+            if (parts[0], len(parts)) in (("scrypt", 4), ("pbkdf2", 3)):
+                self._prefix = self.method
+            else:
+                self._prefix = generate_password_hash("", self.method, 1).split("$", 1)[0]
+        return password_hash.split("$", 1)[0] != self._prefix
+
+    def rehash(self, password_hash, password):
+        """A new hash for a just-verified password if its parameters are outdated, else None.
+
+        Skipped (until the next sign-in) when the pool is saturated.
+        """
+        if not self.needs_rehash(password_hash):
+            return None
+        try:
+            new_hash = self.hash(password)
+        except Busy:
+            return None
+        self.rehashed += 1
+        return new_hash
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise Busy()
+            self._pending += 1
+        start = time.perf_counter()
+        try:
+            if not self.workers:
+                result = fn(*args)
+            else:
+                result = self._pool().submit(fn, *args).result(timeout=self.timeout)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self.busy_time += time.perf_counter() - start
+        if fn is _hash:
+            self.hashed += 1
+        else:
+            self.checked += 1
+        return result
+
+    def _pool(self):
+        # A forked worker process can't use its parent's pool
+        if self._executor is None or os.getpid() != self._pid:
+            with self._lock:
+                if self._executor is None or os.getpid() != self._pid:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    self._pid = os.getpid()
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self):
+        done = self.hashed + self.checked
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "hashed": self.hashed,
+            "checked": self.checked,
+            "rehashed": self.rehashed,
+            "rejected": self.rejected,
+            "avg_ms": round(self.busy_time / done * 1000, 1) if done else None,
+        }
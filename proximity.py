@@ -0,0 +1,116 @@
+import heapq
+import itertools
+import json
+import os
+
+# --- HOSTEL PROXIMITY ---
+# sort=nearest lists the items in the viewer's own hostel first, then those
+# in hostels progressively further away, newest first within each distance
+# band. Distances between hostels come from a JSON matrix (HOSTEL_DISTANCES):
+#
+#   {"distances": {"Hall A": {"Hall B": 150, "Annex 1": 900}, ...}}
+#
+# in metres, either direction; hostel names are matched case-insensitively.
+# Hostels within the same `step` metres share a band. The index on
+# items(is_active, lower(trim(hostel)), created_at) (migration 012) keeps
+# each hostel's listings pre-sorted by age, so a page is a few index seeks
+# merged in Python instead of a sort of the whole table. Listings in
+# hostels the matrix doesn't know about come last.
+
+DISTANCE_STEP = 250
+
+HOSTEL_KEY = "lower(trim(items.hostel))"
+
+
+def normalize(hostel):
+    return (hostel or "").strip().lower()
+
+
+class DistanceMatrix:
+    def __init__(self, distances=None, step=DISTANCE_STEP):
+        self.step = max(1, step)
+        self._distances = {}
+        for a, row in (distances or {}).items():
+            for b, metres in row.items():
+                a_key, b_key = normalize(a), normalize(b)
+                self._distances.setdefault(a_key, {})[b_key] = float(metres)
+                self._distances.setdefault(b_key, {}).setdefault(a_key, float(metres))
+        self._bands = {}
+
+    @classmethod
+    def load(cls, path, step=DISTANCE_STEP):
+        """The matrix in `path`, or an empty one (own hostel first) if there's no file."""
+        if not path or not os.path.exists(path):
+            return cls(step=step)
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f).get("distances", {}), step=step)
+
+    def __len__(self):
+        return len(self._distances)
+
+    def distance(self, a, b):
+        """Metres between two hostels, or None if unknown."""
+        a, b = normalize(a), normalize(b)
+        if a and a == b:
+            return 0.0
+        return self._distances.get(a, {}).get(b)
+
+    def bands(self, hostel):
+        """Hostel keys grouped nearest first: [[own hostel], [within step], ...]."""
+        hostel = normalize(hostel)
+        if not hostel:
+            return []
+        if hostel not in self._bands:
+            grouped = {}
+            for other, metres in self._distances.get(hostel, {}).items():
+                if other != hostel:
+                    grouped.setdefault(1 + int(metres // self.step), []).append(other)
+            self._bands[hostel] = [[hostel]] + [sorted(grouped[b]) for b in sorted(grouped)]
+        return self._bands[hostel]
+
+
+def _stream(db, sql, params, after, limit):
+    keyset = ""
+    if after is not None:
+        keyset = " AND (items.created_at, items.id) < (?, ?)"
+        params = [*params, *after]
+    return db.execute(sql + keyset + " ORDER BY items.created_at DESC, items.id DESC LIMIT ?",
+                      [*params, limit])
+
+
+def _valid_after(after):
+    if not isinstance(after, (list, tuple)) or len(after) != 3:
+        return False
+    band, created_at, item_id = after
+    return (type(band) is int and band >= 0 and isinstance(created_at, str)
+            and type(item_id) is int)
+
+
+def nearest_page(db, bands, select, where, params, size, after=None):
+    """One page of `select ... where` ordered by band, then newest first.
+
+    `after` is (band, created_at, id) of the last row of the previous page;
+    anything else starts from the first page. Returns (rows as dicts with a
+    `distance_band`, has_more).
+    """
+    if not _valid_after(after):
+        after = None
+    start, key = (after[0], list(after[1:])) if after else (0, None)
+    rows = []
+    for band in range(start, len(bands) + 1):
+        want = size + 1 - len(rows)
+        if want <= 0:
+            break
+        since = key if band == start else None
+        if band < len(bands):
+            streams = [_stream(db, f"{select}{where} AND {HOSTEL_KEY} = ?", [*params, hostel], since, want)
+                       for hostel in bands[band]]
+        else:
+            # Everywhere else, including listings without a hostel
+            known = [hostel for group in bands for hostel in group]
+            other = (f" AND coalesce({HOSTEL_KEY}, '') NOT IN ({', '.join('?' * len(known))})"
+                     if known else "")
+            streams = [_stream(db, f"{select}{where}{other}", [*params, *known], since, want)]
+        merged = heapq.merge(*streams, key=lambda row: (row["created_at"], row["id"]), reverse=True)
+        rows += [dict(row, distance_band=band) for row in itertools.islice(merged, want)]
+    return rows[:size], len(rows) > size
@@ -0,0 +1,108 @@
+import re
+import sqlite3
+
+# --- FULL-TEXT SEARCH (SQLite FTS5) ---
+# items_fts is an external-content index over items, so the text itself is
+# only stored once (in items). Triggers keep it in sync on every write.
+
+FTS_TABLE = "items_fts"
+FTS_COLUMNS = ("name", "description", "category", "looking_for")
+
+# bm25 weights, in FTS_COLUMNS order: a hit in the name counts the most
+BM25_WEIGHTS = (10.0, 2.0, 4.0, 1.0)
+
+MAX_TERMS = 8
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fts5_available(db):
+    try:
+        db.execute("CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x)")
+        db.execute("DROP TABLE temp._fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def install(db):
+    """Create the FTS index and its triggers. Returns False if FTS5 is missing."""
+    if not fts5_available(db):
+        return False
+
+    cols = ", ".join(FTS_COLUMNS)
+    new_cols = ", ".join(f"new.{c}" for c in FTS_COLUMNS)
+    old_cols = ", ".join(f"old.{c}" for c in FTS_COLUMNS)
+
+    exists = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (FTS_TABLE,)
+    ).fetchone()
+
+    db.executescript(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            {cols},
+            content='items',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        );
+
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON items BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, {cols}) VALUES (new.id, {new_cols});
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON items BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {cols})
+            VALUES ('delete', old.id, {old_cols});
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {cols} ON items BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {cols})
+            VALUES ('delete', old.id, {old_cols});
+            INSERT INTO {FTS_TABLE}(rowid, {cols}) VALUES (new.id, {new_cols});
+        END;
+    """)
+
+    # First install on an existing database: index the rows already there
+    if not exists:
+        rebuild(db)
+    return True
+
+
+def rebuild(db):
+    db.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def match_query(search):
+    """Turn free text into an FTS5 query: every word must match as a prefix.
+
+    Returns None when the text has nothing indexable in it (e.g. only
+    punctuation), in which case callers should fall back to LIKE.
+    """
+    terms = _TOKEN_RE.findall(search.lower())[:MAX_TERMS]
+    if not terms:
+        return None
+    # Quoting each term keeps FTS5 operators (AND, NEAR, -, ...) in user
+    # input from being interpreted as query syntax
+    return " ".join(f'"{t}"*' for t in terms)
+
+
+def filter_clause(search, fts_enabled):
+    """Return (join, where, params, rank) fragments for a browse query on items.
+
+    `rank` is an ORDER BY expression for relevance, or None if the LIKE
+    fallback is being used and there is nothing to rank by.
+    """
+    query = match_query(search) if fts_enabled else None
+
+    if query is None:
+        like = f"%{search}%"
+        where = " AND (" + " OR ".join(f"items.{c} LIKE ?" for c in FTS_COLUMNS) + ")"
+        return "", where, [like] * len(FTS_COLUMNS), None
+
+    weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+    join = f" JOIN {FTS_TABLE} ON {FTS_TABLE}.rowid = items.id"
+    where = f" AND {FTS_TABLE} MATCH ?"
+    rank = f"bm25({FTS_TABLE}, {weights})"
+    return join, where, [query], rank
@@ -0,0 +1,180 @@
+import secrets
+import threading
+import time
+
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from werkzeug.datastructures import CallbackDict
+
+import dbpool
+
+# --- SQLITE SESSION STORE ---
+# Server-side sessions in their own WAL-mode database (so session writes
+# never contend with the users.db write lock). A request only writes when
+# the session actually changed, or when its expiry is more than half used
+# up; expired rows are swept by a background thread.
+
+SWEEP_INTERVAL = 600
+
+
+class SqliteSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, expiry=None, new=False):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expiry = expiry
+        self.new = new
+        self.modified = False
+
+
+class SqliteSessionInterface(SessionInterface):
+    serializer = session_json_serializer
+
+    def __init__(self, path, pool_size=8, sweep_interval=SWEEP_INTERVAL):
+        self.pool = dbpool.ConnectionPool(path, max_size=pool_size)
+        self.sweep_interval = sweep_interval
+        self._sweeper = None
+        self._lock = threading.Lock()
+        self.writes = 0
+        self.skipped_writes = 0
+        self.swept = 0
+
+        conn = self.pool.acquire()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expiry INTEGER NOT NULL
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expiry ON sessions(expiry)")
+            conn.commit()
+        finally:
+            self.pool.release(conn)
+
+    def _lifetime(self, app):
+        return int(app.permanent_session_lifetime.total_seconds())
+
+    def open_session(self, app, request):
+        self._ensure_sweeper()
+        sid = request.cookies.get(self.get_cookie_name(app))
+        now = int(time.time())
+
+        if sid:
+            conn = self.pool.acquire()
+            try:
+                row = conn.execute(
+                    "SELECT data, expiry FROM sessions WHERE id = ?", (sid,)
+                ).fetchone()
+            finally:
+                self.pool.release(conn)
+            if row is not None and row["expiry"] > now:
+                try:
+                    data = self.serializer.loads(row["data"])
+                    return SqliteSession(data, sid=sid, expiry=row["expiry"])
+                except ValueError:
+                    pass
+
+        # No id is handed out until something is actually stored
+        return SqliteSession(sid=None, new=True)
+
+    def regenerate(self, session):
+        """Drop `session`'s stored row so it's saved under a fresh id.
+
+        Called at sign-in, so an id planted in the browser beforehand
+        (session fixation) never becomes a signed-in session.
+        """
+        if session.sid:
+            self._execute("DELETE FROM sessions WHERE id = ?", (session.sid,))
+        session.sid = None
+        session.modified = True
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        lifetime = self._lifetime(app)
+        now = int(time.time())
+
+        if not session:
+            if session.modified and session.sid:
+                self._execute("DELETE FROM sessions WHERE id = ?", (session.sid,))
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.modified or session.sid is None:
+            if session.sid is None:
+                session.sid = secrets.token_urlsafe(32)
+            session.expiry = now + lifetime
+            self._execute(
+                "INSERT INTO sessions (id, data, expiry) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET data = excluded.data, expiry = excluded.expiry",
+                (session.sid, self.serializer.dumps(dict(session)), session.expiry)
+            )
+        elif session.expiry - now < lifetime // 2:
+            # Sliding expiry, but at most one write per half-lifetime
+            session.expiry = now + lifetime
+            self._execute("UPDATE sessions SET expiry = ? WHERE id = ?", (session.expiry, session.sid))
+            if not session.permanent:
+                return
+        else:
+            self.skipped_writes += 1
+            return
+
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+        response.vary.add("Cookie")
+
+    def _execute(self, sql, params):
+        conn = self.pool.acquire()
+        try:
+            conn.execute(sql, params)
+            conn.commit()
+        finally:
+            self.pool.release(conn)
+        self.writes += 1
+
+    def sweep(self):
+        conn = self.pool.acquire()
+        try:
+            deleted = conn.execute("DELETE FROM sessions WHERE expiry <= ?", (int(time.time()),)).rowcount
+            conn.commit()
+        finally:
+            self.pool.release(conn)
+        self.swept += deleted
+        return deleted
+
+    def _ensure_sweeper(self):
+        if self._sweeper is not None or not self.sweep_interval:
+            return
+        with self._lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._sweep_loop, name="session-sweeper", daemon=True)
+                self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                print("❌ Session sweep failed:", e)
+            time.sleep(self.sweep_interval)
+
+    def stats(self):
+        return {
+            "writes": self.writes,
+            "skipped_writes": self.skipped_writes,
+            "swept": self.swept,
+            "pool": self.pool.stats(),
+        }
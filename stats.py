@@ -0,0 +1,67 @@
+# --- USER STATS (materialized dashboard counters) ---
+# user_stats is maintained by triggers (see migration 003_user_stats). The
+# functions here read it, and recompute it from scratch when it has drifted
+# (e.g. after rows were edited with triggers disabled).
+
+COUNTERS = ("active_offers", "total_views", "pending_requests",
+            "completed_swaps", "total_attempts")
+
+# What every counter should be, computed from the source tables
+_ACTUAL_SQL = """
+    SELECT u.id AS user_id,
+           COALESCE(i.active_offers, 0) AS active_offers,
+           COALESCE(i.total_views, 0) AS total_views,
+           COALESCE(s.pending_requests, 0) AS pending_requests,
+           COALESCE(s.completed_swaps, 0) AS completed_swaps,
+           COALESCE(s.total_attempts, 0) AS total_attempts
+    FROM users u
+    LEFT JOIN (
+        SELECT owner_id,
+               SUM(is_active IS 1) AS active_offers,
+               SUM(COALESCE(views, 0)) AS total_views
+        FROM items GROUP BY owner_id
+    ) i ON i.owner_id = u.id
+    LEFT JOIN (
+        SELECT owner_id,
+               SUM(status IS 'pending') AS pending_requests,
+               SUM(status IS 'accepted') AS completed_swaps,
+               COUNT(*) AS total_attempts
+        FROM swap_requests GROUP BY owner_id
+    ) s ON s.owner_id = u.id
+"""
+
+
+def get(db, user_id):
+    cols = ", ".join(COUNTERS)
+    row = db.execute(f"SELECT {cols} FROM user_stats WHERE user_id = ?", (user_id,)).fetchone()
+    if row is None:
+        return dict.fromkeys(COUNTERS, 0)
+    return dict(zip(COUNTERS, row))
+
+
+def verify(db):
+    """Return [(user_id, counter, stored, actual)] for every counter that has drifted."""
+    cols = ", ".join(COUNTERS)
+    stored = {}
+    for row in db.execute(f"SELECT user_id, {cols} FROM user_stats"):
+        stored[row[0]] = dict(zip(COUNTERS, row[1:]))
+
+    drift = []
+    for row in db.execute(_ACTUAL_SQL):
+        user_id, actual = row[0], dict(zip(COUNTERS, row[1:]))
+        have = stored.pop(user_id, dict.fromkeys(COUNTERS, 0))
+        for c in COUNTERS:
+            if have[c] != actual[c]:
+                drift.append((user_id, c, have[c], actual[c]))
+    # Rows left over belong to users that no longer exist
+    for user_id, have in stored.items():
+        for c in COUNTERS:
+            if have[c]:
+                drift.append((user_id, c, have[c], 0))
+    return drift
+
+
+def rebuild(db):
+    cols = ", ".join(COUNTERS)
+    db.execute("DELETE FROM user_stats")
+    db.execute(f"INSERT INTO user_stats (user_id, {cols}) SELECT user_id, {cols} FROM ({_ACTUAL_SQL})")
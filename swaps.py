@@ -0,0 +1,97 @@
+# --- SWAP REQUESTS ---
+# A request is pending until the owner accepts or rejects it; accepting one
+# closes every other pending request for the item and takes the item off
+# the market. Each transition is a single conditional statement that only
+# matches a request (or item) still in the state it leaves, so a double
+# click, two open tabs or two racing requests can't both win, and the
+# partial unique index from migration 011 keeps a requester to one pending
+# request per item. Callers commit; nothing here commits or notifies.
+
+PENDING = "pending"
+ACCEPTED = "accepted"
+REJECTED = "rejected"
+CLOSED = "closed"     # another request for the same item was accepted
+ANSWERS = (ACCEPTED, REJECTED)
+MAX_BULK = 100
+
+
+class SwapError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def create(db, item_id, requester_id, message=None):
+    """Insert a pending request for item_id. Returns (id, owner_id, item_name, owner_name)."""
+    row = db.execute("""
+        INSERT INTO swap_requests (item_id, requester_id, owner_id, status, message)
+        SELECT id, :requester_id, owner_id, 'pending', :message FROM items
+        WHERE id = :item_id AND is_active = 1 AND owner_id != :requester_id
+        ON CONFLICT DO NOTHING
+        RETURNING id, owner_id, (SELECT name FROM items WHERE id = item_id) AS item_name,
+                  (SELECT username FROM users WHERE id = owner_id) AS owner_name
+    """, {"item_id": item_id, "requester_id": requester_id, "message": message}).fetchone()
+    if row is not None:
+        return row
+
+    # Nothing inserted; work out why
+    item = db.execute("SELECT owner_id, is_active FROM items WHERE id = ?", (item_id,)).fetchone()
+    if item is None:
+        raise SwapError("Item not found", 404)
+    if item["owner_id"] == requester_id:
+        raise SwapError("You cannot request your own item", 403)
+    if item["is_active"] != 1:
+        raise SwapError("Item not available", 400)
+    raise SwapError("Request already sent.", 409)
+
+
+_ANSWER = """
+    UPDATE swap_requests SET status = :action, responded_at = CURRENT_TIMESTAMP
+    WHERE id IN ({ids}) AND owner_id = :owner_id AND status = 'pending'
+      AND (:action != 'accepted' OR EXISTS (SELECT 1 FROM items WHERE id = item_id AND is_active = 1))
+    RETURNING id, item_id, requester_id, status, (SELECT name FROM items WHERE id = item_id) AS item_name,
+              (SELECT username FROM users WHERE id = requester_id) AS requester_name
+"""
+
+
+def respond(db, owner_id, request_ids, action):
+    """Accept or reject owner_id's pending requests. Returns (answered, closed).
+
+    Both are lists of the changed requests (id, item_id, requester_id,
+    status, item_name, requester_name). Requests that aren't owner_id's, or aren't pending
+    any more, are left alone; of several accepted requests for one item
+    only the first is accepted and the others are closed.
+    """
+    if action not in ANSWERS:
+        raise SwapError("action must be accepted or rejected")
+    request_ids = sorted(set(request_ids))
+    if not request_ids:
+        return [], []
+    if len(request_ids) > MAX_BULK:
+        raise SwapError(f"at most {MAX_BULK} requests at once")
+
+    if action == REJECTED:
+        return _answer(db, request_ids, owner_id, REJECTED), []
+
+    answered, closed = [], []
+    for request_id in request_ids:
+        rows = _answer(db, [request_id], owner_id, ACCEPTED)
+        if not rows:
+            continue  # not pending, not theirs, or its item was just taken by another accept
+        accepted = rows[0]
+        answered.append(accepted)
+        closed += db.execute("""
+            UPDATE swap_requests SET status = 'closed', responded_at = CURRENT_TIMESTAMP
+            WHERE item_id = ? AND status = 'pending'
+            RETURNING id, item_id, requester_id, status, (SELECT name FROM items WHERE id = item_id) AS item_name,
+                      (SELECT username FROM users WHERE id = requester_id) AS requester_name
+        """, (accepted["item_id"],)).fetchall()
+        db.execute("UPDATE items SET is_active = 0 WHERE id = ?", (accepted["item_id"],))
+    return answered, closed
+
+
+def _answer(db, request_ids, owner_id, action):
+    params = {f"id{n}": request_id for n, request_id in enumerate(request_ids)}
+    sql = _ANSWER.format(ids=", ".join(f":{name}" for name in params))
+    return db.execute(sql, dict(params, owner_id=owner_id, action=action)).fetchall()
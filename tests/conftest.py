@@ -0,0 +1,92 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dbpool
+import migrations
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "users.db")
+
+
+@pytest.fixture
+def db(db_path):
+    """A migrated, empty users.db in a temporary directory."""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    migrations.upgrade(conn, log=lambda *a: None)
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def pool(db, db_path):
+    pool = dbpool.ConnectionPool(db_path, max_size=4)
+    yield pool
+    pool.close()
+
+
+def add_user(db, username, hostel="Hall A"):
+    return db.execute(
+        "INSERT INTO users (username, password_hash, hostel) VALUES (?, 'x', ?)", (username, hostel)
+    ).lastrowid
+
+
+def add_item(db, owner_id, name="Desk lamp", hostel="Hall A", created_at="2024-01-01 00:00:00"):
+    return db.execute(
+        "INSERT INTO items (owner_id, name, category, hostel, created_at) VALUES (?, ?, 'other', ?, ?)",
+        (owner_id, name, hostel, created_at)
+    ).lastrowid
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """The Flask app on its own database, imported once per test run."""
+    tmp = tmp_path_factory.mktemp("app")
+    os.environ.update({
+        "SHARESPACE_DB": str(tmp / "users.db"),
+        "SESSION_DB": str(tmp / "sessions.db"),
+        "CACHE_DIR": str(tmp / "cache"),
+        "RATE_LIMIT_SHM": str(tmp / "limits"),
+        "JINJA_CACHE_DIR": "",
+        "ASSETS_BUILD_ON_STARTUP": "0",
+        "JOBS_WORKER_THREAD": "0",
+        "UPLOAD_GC_INTERVAL": "0",
+        "PASSWORD_WORKERS": "0",
+        "RATE_LIMITS": "0",
+        "SLOW_QUERY_MS": "0",
+        "ADMIN_USERS": "admin",
+        "METRICS_TOKEN": "test-token",
+    })
+    import app as module
+    module.app.config.update(TESTING=True, UPLOAD_FOLDER=str(tmp / "uploads"))
+    return module.app
+
+
+def sign_up(client, username, hostel="Hall A"):
+    """Create `username` (password "password") and sign the client in."""
+    client.post("/signup", data={"username": username, "password": "password",
+                                 "hostel": hostel, "phone": "1"})
+    response = client.post("/signin", data={"username": username, "password": "password"})
+    assert response.status_code == 302, response.data
+    return client
+
+
+def list_item(client, name, hostel="Hall A", **fields):
+    """List an item through /upload as the client's user. Returns its id."""
+    data = dict({"name": name, "category": "other", "description": name, "condition": "good",
+                 "hostel": hostel, "looking_for": ""}, **fields)
+    assert client.post("/upload", data=data).status_code == 302
+    conn = sqlite3.connect(os.environ["SHARESPACE_DB"])
+    try:
+        return conn.execute("SELECT MAX(id) FROM items WHERE name = ?", (name,)).fetchone()[0]
+    finally:
+        conn.close()
@@ -0,0 +1,141 @@
+import pytest
+from werkzeug.test import Client, EnvironBuilder
+
+import admission
+
+
+def hello(environ, start_response):
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [b"hello"]
+
+
+def environ(path="/", method="GET", ip="10.0.0.1", cookie=None, headers=None):
+    headers = dict(headers or {}, **({"Cookie": f"session={cookie}"} if cookie else {}))
+    return EnvironBuilder(path=path, method=method, headers=headers,
+                          environ_base={"REMOTE_ADDR": ip}).get_environ()
+
+
+def call(middleware, env):
+    """(status, headers, body iterable) without closing the response."""
+    seen = {}
+
+    def start_response(status, headers, exc_info=None):
+        seen.update(status=status, headers=dict(headers))
+
+    body = middleware(env, start_response)
+    return seen["status"], seen["headers"], body
+
+
+@pytest.mark.parametrize("method, path, route_class", [
+    ("GET", "/static/app.css", admission.STATIC),
+    ("POST", "/signin", admission.AUTH),
+    ("GET", "/signin", admission.DEFAULT),
+    ("POST", "/upload", admission.UPLOAD),
+    ("GET", "/browseItems", admission.SEARCH),
+    ("GET", "/api/v1/items", admission.SEARCH),
+    ("GET", "/dashboard", admission.DEFAULT),
+])
+def test_classify(method, path, route_class):
+    assert admission.classify(method, path) == route_class
+
+
+def test_parse_rate():
+    assert admission.parse_rate("", (1.0, 5)) == (1.0, 5)
+    assert admission.parse_rate("2.5,30", (1.0, 5)) == (2.5, 30)
+    assert admission.parse_rate("3", (1.0, 5)) == (3.0, 5)
+
+
+def test_bucket_empties_and_refills():
+    buckets = admission.SharedBuckets(slots=64, stripes=4)
+    assert [buckets.take("k", 1.0, 3, now=100.0) for _ in range(3)] == [0, 0, 0]
+    assert buckets.take("k", 1.0, 3, now=100.0) == pytest.approx(1.0)
+    assert buckets.take("k", 1.0, 3, now=100.5) == pytest.approx(0.5)  # half a token back
+    assert buckets.take("k", 1.0, 3, now=101.0) == 0
+    assert buckets.take("other", 1.0, 3, now=101.0) == 0  # buckets are per key
+
+
+def test_full_table_evicts_the_idlest_bucket():
+    buckets = admission.SharedBuckets(slots=admission.PROBE, stripes=1)
+    for n in range(admission.PROBE + 1):
+        buckets.take(f"k{n}", 1.0, 1, now=100.0 + n)
+    assert buckets.counters()[1] == 1
+    assert buckets.take("k0", 1.0, 1, now=200.0) == 0  # evicted, so a fresh bucket
+
+
+def test_processes_mapping_one_file_share_buckets_and_counters(tmp_path):
+    path = str(tmp_path / "limits")
+    first, second = admission.SharedBuckets(path, slots=64, stripes=4), admission.SharedBuckets(path, slots=64, stripes=4)
+    assert first.take("k", 1.0, 1, now=100.0) == 0
+    assert second.take("k", 1.0, 1, now=100.0) > 0
+    first.count(admission.SEARCH, "limited")
+    assert second.counters()[0][admission.SEARCH]["limited"] == 1
+    # A table laid out differently is started again from empty
+    resized = admission.SharedBuckets(path, slots=128, stripes=4)
+    assert resized.take("k", 1.0, 1, now=100.0) == 0
+
+
+def test_over_the_limit_is_a_429_with_retry_after():
+    middleware = admission.AdmissionControl(hello, admission.SharedBuckets(slots=64, stripes=4),
+                                            rates={admission.DEFAULT: (0.5, 2)}, ip_factor=1)
+    client = Client(middleware)
+    assert [client.get("/dashboard").status_code for _ in range(2)] == [200, 200]
+    response = client.get("/dashboard")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+    assert response.headers["Content-Type"].startswith("text/plain")
+    assert client.get("/api/v1/dashboard").json == {"error": "Too many requests. Please slow down."}
+    counts = middleware.stats()["requests"][admission.DEFAULT]
+    assert (counts["admitted"], counts["limited"]) == (2, 2)
+
+
+def test_clients_are_limited_by_session_then_by_address():
+    middleware = admission.AdmissionControl(hello, admission.SharedBuckets(slots=256, stripes=4),
+                                            rates={admission.DEFAULT: (0.001, 1)}, ip_factor=2)
+    status = lambda **kw: call(middleware, environ("/dashboard", **kw))[0]
+    assert status(cookie="a") == "200 OK"
+    assert status(cookie="a").startswith("429")   # a's own bucket is empty
+    assert status(cookie="b") == "200 OK"         # b has its own, and the address had room for two
+    assert status(cookie="c").startswith("429")   # but not three
+    assert status(cookie="d", ip="10.0.0.2") == "200 OK"
+
+
+def test_forwarded_address_is_used_behind_a_proxy():
+    middleware = admission.AdmissionControl(hello, admission.SharedBuckets(slots=64, stripes=4), proxy_hops=1)
+    env = environ(headers={"X-Forwarded-For": "1.2.3.4, 5.6.7.8"})
+    assert middleware.client(env) == (None, "5.6.7.8")
+
+
+def test_in_flight_cap_sheds_until_the_response_is_closed():
+    middleware = admission.AdmissionControl(hello, admission.SharedBuckets(slots=64, stripes=4),
+                                            max_inflight={admission.SEARCH: 1})
+    status, _, body = call(middleware, environ("/browseItems"))
+    assert status == "200 OK" and middleware.inflight[admission.SEARCH] == 1
+
+    status, headers, _ = call(middleware, environ("/browseItems", cookie="other"))
+    assert status.startswith("503") and headers["Retry-After"] == str(admission.SHED_RETRY_AFTER)
+    assert call(middleware, environ("/dashboard"))[0] == "200 OK"  # other classes aren't capped
+
+    assert list(body) == [b"hello"]
+    body.close()
+    body.close()  # released once
+    assert middleware.inflight[admission.SEARCH] == 0
+    assert call(middleware, environ("/browseItems"))[0] == "200 OK"
+    assert middleware.stats()["requests"][admission.SEARCH]["shed"] == 1
+
+
+def test_in_flight_slot_is_released_when_the_app_raises():
+    def broken(environ, start_response):
+        raise RuntimeError("boom")
+
+    middleware = admission.AdmissionControl(broken, admission.SharedBuckets(slots=64, stripes=4),
+                                            max_inflight={admission.UPLOAD: 1})
+    with pytest.raises(RuntimeError):
+        call(middleware, environ("/upload", method="POST"))
+    assert middleware.inflight[admission.UPLOAD] == 0
+
+
+def test_disabled_lets_everything_through():
+    middleware = admission.AdmissionControl(hello, admission.SharedBuckets(slots=64, stripes=4),
+                                            rates={admission.DEFAULT: (0.001, 1)}, enabled=False)
+    client = Client(middleware)
+    assert {client.get("/").status_code for _ in range(5)} == {200}
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from conftest import list_item, sign_up
+
+
+@pytest.fixture
+def owner(app):
+    return sign_up(app.test_client(), "api-owner")
+
+
+@pytest.fixture
+def requester(app):
+    return sign_up(app.test_client(), "api-requester")
+
+
+def test_needs_a_session(app):
+    response = app.test_client().get("/api/v1/items")
+    assert response.status_code == 401
+    assert response.json == {"error": "Not signed in"}
+
+
+def test_item_listing_and_detail(owner, requester):
+    item_id = list_item(owner, "API kettle")
+
+    page = requester.get("/api/v1/items?search=kettle&sort=newest").json
+    assert [i["name"] for i in page["items"]] == ["API kettle"]
+    assert page["has_more"] is False and page["next_cursor"] is None
+    assert page["items"][0]["image"] is None
+
+    detail = requester.get(f"/api/v1/items/{item_id}").json
+    assert detail["owner"]["username"] == "api-owner"
+    assert (detail["requested"], detail["saved"]) == (False, False)
+    assert requester.get("/api/v1/items/999999").status_code == 404
+
+
+@pytest.mark.parametrize("body, message", [
+    (b"{", "not valid JSON"),
+    (b'{"message": "hi"}', "item_id"),
+    (b'{"item_id": "one"}', "item_id"),
+    (b'{"item_id": 1, "extra": true}', "extra"),
+    (json.dumps({"item_id": 1, "message": "x" * 1001}).encode(), "message"),
+])
+def test_bad_bodies_are_a_400_naming_the_field(requester, body, message):
+    response = requester.post("/api/v1/swaps", data=body, content_type="application/json")
+    assert response.status_code == 400
+    assert message in response.json["error"]
+
+
+def test_swap_round_trip(owner, requester):
+    item_id = list_item(owner, "API lamp")
+    created = requester.post("/api/v1/swaps", json={"item_id": item_id, "message": "Swap?"})
+    assert created.status_code == 201
+    request_id = created.json["id"]
+    assert created.json["status"] == "pending" and created.json["other_user"] == "api-owner"
+    assert requester.post("/api/v1/swaps", json={"item_id": item_id}).status_code == 409  # already pending
+
+    incoming = owner.get("/api/v1/swaps").json["incoming"]
+    assert [r["id"] for r in incoming if r["item_id"] == item_id] == [request_id]
+
+    assert requester.post(f"/api/v1/swaps/{request_id}/respond", json={"action": "accepted"}).status_code == 403
+    answered = owner.post(f"/api/v1/swaps/{request_id}/respond", json={"action": "accepted"})
+    assert answered.json["status"] == "accepted"
+
+
+def test_save_and_unsave(owner, requester):
+    item_id = list_item(owner, "API chair")
+    assert owner.post("/api/v1/saved", json={"item_id": item_id}).status_code == 403
+    assert requester.post("/api/v1/saved", json={"item_id": item_id}).status_code == 204
+    assert item_id in [i["id"] for i in requester.get("/api/v1/saved").json]
+    assert requester.delete(f"/api/v1/saved/{item_id}").status_code == 204
+    assert item_id not in [i["id"] for i in requester.get("/api/v1/saved").json]
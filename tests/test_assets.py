@@ -0,0 +1,64 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask
+
+import assets
+
+
+@pytest.fixture
+def static(tmp_path):
+    (tmp_path / "css").mkdir()
+    (tmp_path / "css" / "site.css").write_text("body { color: red; }")
+    (tmp_path / "images").mkdir()
+    (tmp_path / "images" / "logo.png").write_bytes(b"\x89PNG fake")
+    return tmp_path
+
+
+def test_build_fingerprints_and_precompresses(static):
+    manifest = assets.build(str(static))
+
+    css = manifest["css/site.css"]
+    assert css.startswith("dist/css/site.") and css.endswith(".css")
+    assert (static / css).read_text() == "body { color: red; }"
+    assert gzip.decompress((static / (css + ".gz")).read_bytes()) == b"body { color: red; }"
+    assert not (static / (manifest["images/logo.png"] + ".gz")).exists()
+    assert assets.load_manifest(str(static)) == manifest
+    assert json.loads((static / "dist" / assets.MANIFEST).read_text()) == manifest
+
+
+def test_changed_content_gets_a_new_name_and_the_old_one_goes(static):
+    before = assets.build(str(static))["css/site.css"]
+    (static / "css" / "site.css").write_text("body { color: blue; }")
+    after = assets.build(str(static))["css/site.css"]
+
+    assert after != before
+    assert (static / after).exists()
+    assert not (static / before).exists()
+    assert not (static / (before + ".gz")).exists()
+
+
+def test_load_manifest_without_a_build(tmp_path):
+    assert assets.load_manifest(str(tmp_path)) == {}
+
+
+def test_send_asset_picks_the_precompressed_file(static):
+    manifest = assets.build(str(static))
+    filename = manifest["css/site.css"][len("dist/"):]
+    app = Flask(__name__)
+
+    with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+        response = assets.send_asset(str(static), filename)
+        response.direct_passthrough = False
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["Cache-Control"] == assets.IMMUTABLE
+        assert response.mimetype == "text/css"
+        assert "Accept-Encoding" in response.vary
+        assert gzip.decompress(response.get_data()) == b"body { color: red; }"
+
+    with app.test_request_context():
+        response = assets.send_asset(str(static), filename)
+        response.direct_passthrough = False
+        assert "Content-Encoding" not in response.headers
+        assert response.get_data() == b"body { color: red; }"
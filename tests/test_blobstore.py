@@ -0,0 +1,90 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from conftest import add_item, add_user
+
+import blobstore
+
+
+@pytest.fixture
+def store(tmp_path, pool):
+    return blobstore.BlobStore(str(tmp_path / "uploads"), pool, gc_interval=0)
+
+
+def put(store, pool, data, ext="png", **kwargs):
+    conn = pool.acquire()
+    try:
+        return store.put(conn, io.BytesIO(data), ext, **kwargs)[0]
+    finally:
+        pool.release(conn)
+
+
+def refcount(db, name):
+    return db.execute("SELECT refcount FROM blobs WHERE path = ?", (name,)).fetchone()[0]
+
+
+def stored_files(store):
+    return sorted(os.path.relpath(os.path.join(d, f), store.folder)
+                  for d, _, files in os.walk(store.folder) for f in files)
+
+
+def test_put_names_by_content_and_deduplicates(store, pool):
+    digest = hashlib.sha256(b"photo").hexdigest()
+    name = put(store, pool, b"photo")
+    assert name == f"{digest[:2]}/{digest[2:4]}/{digest}.png"
+    assert blobstore.is_blob(name) and not blobstore.is_blob("1700000000_lamp.png")
+
+    # Same bytes, other extension: the first name is kept
+    assert put(store, pool, b"photo", ext="jpg") == name
+    assert stored_files(store) == [name]
+    assert store.stats()["deduplicated"] == 1
+
+
+def test_rejected_uploads_leave_nothing_behind(store, pool):
+    def reject(path):
+        raise ValueError("no")
+
+    with pytest.raises(ValueError):
+        put(store, pool, b"junk", validate=reject)
+    assert stored_files(store) == []
+
+
+def test_prepared_file_is_hashed_after_the_rewrite(store, pool):
+    def rewrite(path):
+        with open(path, "wb") as f:
+            f.write(b"clean")
+
+    name = put(store, pool, b"with metadata", prepare=rewrite)
+    assert os.path.basename(name).startswith(hashlib.sha256(b"clean").hexdigest())
+
+
+def test_refcount_follows_the_rows_using_a_blob(db, store, pool):
+    name, other = put(store, pool, b"photo"), put(store, pool, b"other")
+    owner = add_user(db, "alice")
+    first, second = add_item(db, owner), add_item(db, owner)
+    db.execute("UPDATE items SET image = ? WHERE id IN (?, ?)", (name, first, second))
+    db.execute("UPDATE users SET profile_picture = ? WHERE id = ?", (name, owner))
+    assert refcount(db, name) == 3
+
+    db.execute("UPDATE items SET image = ? WHERE id = ?", (other, first))
+    db.execute("DELETE FROM items WHERE id = ?", (second,))
+    assert (refcount(db, name), refcount(db, other)) == (1, 1)
+
+
+def test_gc_removes_unreferenced_blobs_and_their_variants(db, store, pool):
+    kept, dropped = put(store, pool, b"kept"), put(store, pool, b"dropped")
+    variant = dropped.rsplit(".", 1)[0] + ".thumb.webp"
+    open(os.path.join(store.folder, variant), "wb").close()
+    db.execute("UPDATE items SET image = ? WHERE id = ?", (kept, add_item(db, add_user(db, "alice"))))
+    db.commit()
+
+    assert store.gc() == 0  # still within the grace period
+    assert store.gc(grace=-1) == 1
+    assert stored_files(store) == [kept]
+
+    # Uploaded again after collection: stored afresh
+    assert put(store, pool, b"dropped") == dropped
+    assert os.path.exists(os.path.join(store.folder, dropped))
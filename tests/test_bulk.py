@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from conftest import add_item, add_user
+
+import bulk
+
+
+def listing(n, **fields):
+    return dict({"name": f"Item {n}", "category": "books", "description": "A book",
+                 "condition": "good", "hostel": "Hall A"}, **fields)
+
+
+def jsonl(*records):
+    return io.BytesIO("".join(json.dumps(r) + "\n" for r in records).encode())
+
+
+def test_import_validates_each_record(db):
+    alice = add_user(db, "alice")
+    errors = []
+    summary = bulk.import_items(db, jsonl(
+        listing(1, owner="alice"),
+        listing(2, owner="nobody"),
+        listing(3, owner_id=alice, category="pets"),
+        listing(4, owner="alice", created_at="2024-03-01"),
+        ["not", "an", "object"],
+    ), on_error=lambda n, message: errors.append((n, message)))
+
+    assert summary == {"records": 5, "imported": 2, "failed": 3, "resumed_at": 0}
+    assert [n for n, _ in errors] == [2, 3, 5]
+    assert "no user called 'nobody'" in errors[0][1]
+    rows = db.execute("SELECT name, owner_id, created_at FROM items ORDER BY id").fetchall()
+    assert [tuple(r) for r in rows][1] == ("Item 4", alice, "2024-03-01 00:00:00")
+
+
+def test_import_stamps_missing_dates_in_utc(db):
+    alice = add_user(db, "alice")
+    before = datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None)
+    bulk.import_items(db, jsonl(listing(1)), owner_id=alice)
+    created = datetime.strptime(db.execute("SELECT created_at FROM items").fetchone()[0], bulk.TIMESTAMP)
+    assert 0 <= (created - before).total_seconds() < 60
+
+
+def test_csv_import(db):
+    alice = add_user(db, "alice")
+    text = "name,category,description,condition,hostel,is_active\nLamp,electronics,Bright,new,Hall A,no\n"
+    summary = bulk.import_items(db, io.BytesIO(text.encode("utf-8-sig")), "csv", owner_id=alice)
+    assert summary["imported"] == 1
+    assert tuple(db.execute("SELECT name, is_active FROM items").fetchone()) == ("Lamp", 0)
+
+
+def test_named_import_resumes_after_the_last_committed_batch(db):
+    alice = add_user(db, "alice")
+    records = [listing(n) for n in range(1, 6)]
+
+    def crash(ids):
+        raise RuntimeError("worker died")
+
+    with pytest.raises(RuntimeError):
+        bulk.import_items(db, jsonl(*records), owner_id=alice, name="nightly", batch_size=2, on_batch=crash)
+    assert bulk.checkpoint(db, "nightly")["records"] == 2
+
+    summary = bulk.import_items(db, jsonl(*records), owner_id=alice, name="nightly", batch_size=2)
+    assert summary == {"records": 5, "imported": 5, "failed": 0, "resumed_at": 2}
+    assert [r[0] for r in db.execute("SELECT name FROM items ORDER BY id")] == [f"Item {n}" for n in range(1, 6)]
+    assert bulk.checkpoint(db, "nightly")["finished_at"] is not None
+
+
+def test_export_pages_through_one_users_rows(db, pool):
+    alice, bob = add_user(db, "alice"), add_user(db, "bob")
+    mine = [add_item(db, alice, f"Item {n}") for n in range(5)]
+    add_item(db, bob, "Not mine")
+    db.commit()
+
+    chunks = list(bulk.export(pool, "items", "jsonl", user_id=alice, batch_size=2))
+    assert len(chunks) == 3
+    assert [json.loads(line)["id"] for chunk in chunks for line in chunk.splitlines()] == mine
+
+    rows = list(csv.DictReader(io.StringIO("".join(bulk.export(pool, "items", "csv", batch_size=2)))))
+    assert [r["name"] for r in rows] == [f"Item {n}" for n in range(5)] + ["Not mine"]
+
+
+def test_export_all_tags_each_row(db, pool):
+    alice = add_user(db, "alice")
+    item = add_item(db, alice)
+    db.execute("INSERT INTO saved_items (user_id, item_id) VALUES (?, ?)", (alice, item))
+    db.commit()
+    lines = [json.loads(line) for chunk in bulk.export_all(pool, alice) for line in chunk.splitlines()]
+    assert [line["table"] for line in lines] == ["items", "saved_items"]
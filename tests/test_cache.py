@@ -0,0 +1,60 @@
+import time
+
+import cache
+
+
+def test_lru_evicts_the_least_recently_used():
+    lru = cache.LRUCache(threshold=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+    lru.set("c", 3)
+    assert (lru.get("a"), lru.get("b"), lru.get("c")) == (1, None, 3)
+    assert lru.stats()["evictions"] == 1
+
+
+def test_lru_entries_expire(monkeypatch):
+    lru = cache.LRUCache()
+    lru.set("a", 1, timeout=10)
+    now = time.monotonic()
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now + 11)
+    assert lru.get("a") is None
+    assert not lru.has("a")
+
+
+def test_tagged_cache_calls_through_once_and_caches_empty_results():
+    tagged = cache.TaggedCache(cache.LRUCache())
+    calls = []
+
+    def load():
+        calls.append(1)
+        return None
+
+    assert tagged.get_or_set("browse", ["items"], load) is None
+    assert tagged.get_or_set("browse", ["items"], load) is None
+    assert len(calls) == 1
+
+
+def test_invalidating_a_tag_only_drops_entries_under_it():
+    tagged = cache.TaggedCache(cache.LRUCache())
+    tagged.get_or_set("item:1", ["item:1", "user:5"], lambda: "lamp")
+    tagged.get_or_set("item:2", ["item:2"], lambda: "book")
+
+    tagged.invalidate("user:5")
+    assert tagged.get_or_set("item:1", ["item:1", "user:5"], lambda: "lamp v2") == "lamp v2"
+    assert tagged.get_or_set("item:2", ["item:2"], lambda: "book v2") == "book"
+
+
+def test_filesystem_backend_invalidates_across_processes(tmp_path):
+    # Two caches on one directory stand in for two server processes
+    first = cache.TaggedCache(cache.make_backend("filesystem", path=str(tmp_path)))
+    second = cache.TaggedCache(cache.make_backend("filesystem", path=str(tmp_path)))
+    assert first.get_or_set("browse", ["items"], lambda: "old") == "old"
+    assert second.get_or_set("browse", ["items"], lambda: "unused") == "old"
+
+    first.invalidate("items")
+    assert second.get_or_set("browse", ["items"], lambda: "new") == "new"
+
+
+def test_memory_is_the_default_backend():
+    assert isinstance(cache.make_backend("memory"), cache.LRUCache)
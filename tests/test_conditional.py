@@ -0,0 +1,60 @@
+from flask import Flask, request
+
+from conftest import add_item, add_user, sign_up
+
+import conditional
+
+
+def etag(db, scopes, **kwargs):
+    return conditional.validator(db, scopes, **kwargs).etag
+
+
+def test_edits_change_the_etag_but_views_do_not(db):
+    owner = add_user(db, "alice")
+    lamp = add_item(db, owner)
+    scopes = [f"item:{lamp}", f"user:{owner}"]
+    before = etag(db, scopes)
+
+    db.execute("UPDATE items SET views = views + 1 WHERE id = ?", (lamp,))
+    assert etag(db, scopes) == before
+    db.execute("UPDATE items SET name = 'Floor lamp' WHERE id = ?", (lamp,))
+    assert etag(db, scopes) != before
+
+
+def test_other_items_leave_the_etag_alone(db):
+    owner = add_user(db, "alice")
+    lamp = add_item(db, owner)
+    before = etag(db, [f"item:{lamp}"])
+    add_item(db, add_user(db, "bob"), "Textbook")
+    assert etag(db, [f"item:{lamp}"]) == before
+
+
+def test_volatile_values_drop_last_modified(db):
+    owner = add_user(db, "alice")
+    add_item(db, owner)
+    assert conditional.validator(db, ["items"]).last_modified is not None
+    volatile = conditional.validator(db, ["items"], volatile=(3,))
+    assert volatile.last_modified is None
+    assert volatile.etag != conditional.validator(db, ["items"], volatile=(4,)).etag
+
+
+def test_matching_if_none_match_is_a_304(db):
+    add_item(db, add_user(db, "alice"))
+    validator = conditional.validator(db, ["items"], extra=("/browseItems",))
+    app = Flask(__name__)
+    with app.test_request_context(headers={"If-None-Match": f'W/"{validator.etag}"'}):
+        assert validator.matches(request)
+    with app.test_request_context(headers={"If-None-Match": '"something-else"'}):
+        assert not validator.matches(request)
+
+    response = validator.not_modified()
+    assert response.status_code == 304
+    assert response.headers["Cache-Control"] == conditional.CACHE_CONTROL
+
+
+def test_browse_page_revalidates(app):
+    client = sign_up(app.test_client(), "conditional")
+    first = client.get("/browseItems")
+    assert first.status_code == 200 and first.headers["ETag"]
+    again = client.get("/browseItems", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
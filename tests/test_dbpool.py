@@ -0,0 +1,60 @@
+import sqlite3
+import threading
+
+import pytest
+
+from conftest import add_user
+
+import dbpool
+
+
+def test_connections_are_reused_and_configured(pool):
+    conn = pool.acquire()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert pool.stats()["open"] == 1
+
+
+def test_release_rolls_back_an_open_transaction(db, pool):
+    conn = pool.acquire()
+    add_user(conn, "alice")
+    assert conn.in_transaction
+    pool.release(conn)
+
+    conn = pool.acquire()
+    assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0
+    pool.release(conn)
+
+
+def test_acquire_times_out_when_every_connection_is_out(db_path, db):
+    pool = dbpool.ConnectionPool(db_path, max_size=1, timeout=0.05)
+    conn = pool.acquire()
+    with pytest.raises(dbpool.PoolTimeout):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1
+
+    # A waiter gets the connection as soon as it's released
+    threading.Timer(0.01, pool.release, (conn,)).start()
+    pool.timeout = 5
+    assert pool.acquire() is conn
+
+
+def test_discarded_connections_free_their_slot(db_path, db):
+    pool = dbpool.ConnectionPool(db_path, max_size=1)
+    first = pool.acquire()
+    pool.release(first, discard=True)
+    with pytest.raises(sqlite3.ProgrammingError):
+        first.execute("SELECT 1")
+    second = pool.acquire()
+    assert second is not first
+    assert pool.stats()["discarded"] == 1
+
+
+def test_readonly_pool_refuses_writes(db_path, db):
+    pool = dbpool.ConnectionPool(db_path, readonly=True)
+    conn = pool.acquire()
+    with pytest.raises(sqlite3.OperationalError):
+        add_user(conn, "alice")
+    pool.release(conn)
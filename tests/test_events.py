@@ -0,0 +1,68 @@
+import os
+import sqlite3
+
+import events
+from conftest import add_user, list_item, sign_up
+
+
+def feed_messages(db, user_id, limit=10):
+    return [row["message"] for row in events.feed(db, user_id, limit)]
+
+
+def test_record_fans_out_one_row_per_reader(db):
+    with db:
+        alice, bob = add_user(db, "alice"), add_user(db, "bob")
+        event_id = events.record(db, events.SWAP_REQUESTED, bob, [
+            (alice, "bob wants your lamp."),
+            (bob, "You asked alice for her lamp."),
+            (bob, "A duplicate entry for bob."),
+        ], data={"item_name": "lamp"})
+    assert feed_messages(db, alice) == ["bob wants your lamp."]
+    assert feed_messages(db, bob) == ["You asked alice for her lamp."]
+    assert events.feed(db, bob)[0]["event_id"] == event_id
+    assert events.counts(db)["events"] == 1 and events.counts(db)["feed_rows"] == 2
+
+
+def test_feeds_are_trimmed_on_write(db):
+    total = events.FEED_SIZE + 2
+    with db:
+        alice = add_user(db, "alice")
+        for n in range(total):
+            events.record(db, events.LISTED, alice, [(alice, f"listed {n}")])
+    messages = feed_messages(db, alice, limit=1000)
+    assert len(messages) == events.FEED_SIZE
+    assert messages[0] == f"listed {total - 1}" and messages[-1] == "listed 2"
+    assert (events.counts(db)["events"], events.counts(db)["feed_rows"]) == (total, events.FEED_SIZE)
+
+
+def test_compact_removes_old_events_but_keeps_feeds(db):
+    with db:
+        alice = add_user(db, "alice")
+        for n in range(5):
+            events.record(db, events.LISTED, alice, [(alice, f"listed {n}")])
+        db.execute("UPDATE events SET created_at = '2000-01-01 00:00:00' WHERE id <= 3")
+        # A feed that overshot its size, e.g. from a write that skipped trim()
+        db.executemany("INSERT INTO user_feed (user_id, event_id, kind, message) VALUES (?, ?, 'listed', 'x')",
+                       [(alice, 100 + n) for n in range(events.FEED_SIZE)])
+
+    assert events.compact(db, batch=2) == (3, 5)
+    assert events.counts(db)["events"] == 2
+    assert len(events.feed(db, alice, limit=1000)) == events.FEED_SIZE
+
+
+def test_swap_requests_reach_both_feeds(app):
+    owner, requester = sign_up(app.test_client(), "feed_owner"), sign_up(app.test_client(), "feed_asker")
+    item_id = list_item(owner, "Feed kettle")
+    requester.post(f"/swap/request/{item_id}", data={"message": "Swap?"})
+
+    conn = sqlite3.connect(os.environ["SHARESPACE_DB"])
+    conn.row_factory = sqlite3.Row
+    try:
+        ids = {row["username"]: row["id"] for row in conn.execute(
+            "SELECT id, username FROM users WHERE username IN ('feed_owner', 'feed_asker')")}
+        owner_feed = feed_messages(conn, ids["feed_owner"])
+        assert owner_feed[0] == "feed_asker wants to swap for your Feed kettle."
+        assert owner_feed[1] == "You listed Feed kettle."
+        assert feed_messages(conn, ids["feed_asker"]) == ["You asked feed_owner to swap for Feed kettle."]
+    finally:
+        conn.close()
@@ -0,0 +1,21 @@
+from conftest import sign_up
+
+
+def test_health_is_bare(app):
+    response = app.test_client().get("/health")
+    assert response.status_code == 200
+    assert response.json == {"status": "ok"}
+
+
+def test_health_details_need_an_admin_or_the_metrics_token(app):
+    client = app.test_client()
+    assert client.get("/health/details").status_code == 404
+    assert client.get("/health/details", headers={"Authorization": "Bearer wrong"}).status_code == 404
+
+    response = client.get("/health/details", headers={"Authorization": "Bearer test-token"})
+    assert response.status_code == 200
+    assert response.json["db"]["write"]["max_size"] == app.config["DB_POOL_SIZE"]
+
+    sign_up(client, "someone")
+    assert client.get("/health/details").status_code == 404
+    assert sign_up(app.test_client(), "admin").get("/health/details").status_code == 200
@@ -0,0 +1,126 @@
+import pytest
+
+import images
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def photo(tmp_path, fmt, **save_kwargs):
+    exif = Image.Exif()
+    exif[images.ORIENTATION] = 6
+    exif[0x010F] = "CameraMaker"
+    exif.get_ifd(0x8825)[2] = (52.0, 12.0, 30.0)  # GPS latitude
+    path = str(tmp_path / f"upload.{fmt.lower()}")
+    Image.new("RGB", (64, 32), (10, 200, 30)).save(path, fmt, exif=exif, **save_kwargs)
+    return path
+
+
+@pytest.mark.parametrize("fmt, save_kwargs", [
+    ("JPEG", {"comment": b"CameraMaker"}),
+    ("PNG", {}),
+    ("WEBP", {"lossless": True, "xmp": b"<x:xmpmeta>CameraMaker</x:xmpmeta>"}),
+])
+def test_strip_metadata_keeps_only_the_orientation(tmp_path, fmt, save_kwargs):
+    path = photo(tmp_path, fmt, **save_kwargs)
+    with Image.open(path) as im:
+        pixels = im.tobytes()
+
+    images.strip_metadata(path)
+
+    with open(path, "rb") as f:
+        assert b"CameraMaker" not in f.read()
+    with Image.open(path) as im:
+        assert dict(im.getexif()) == {images.ORIENTATION: 6}
+        assert im.tobytes() == pixels  # never re-encoded
+    assert images.process(path)["thumb"]["width"] == 32  # variants come out upright
+
+
+def test_strip_metadata_leaves_clean_files_alone(tmp_path):
+    path = str(tmp_path / "clean.jpg")
+    Image.new("RGB", (8, 8)).save(path, "JPEG")
+    with open(path, "rb") as f:
+        before = f.read()
+
+    images.strip_metadata(path)
+
+    with open(path, "rb") as f:
+        assert f.read() == before
+
+
+def test_strip_metadata_rejects_a_truncated_container(tmp_path):
+    path = tmp_path / "broken.jpg"
+    path.write_bytes(b"\xff\xd8\xff\xe1\x00")
+    with pytest.raises(images.ImageError):
+        images.strip_metadata(str(path))
+
+
+def save(tmp_path, name, size=(1200, 900), fmt=None, mode="RGB"):
+    path = str(tmp_path / name)
+    Image.new(mode, size, (200, 10, 10)).save(path, fmt)
+    return path
+
+
+def test_validate_accepts_images_and_rejects_the_rest(tmp_path, monkeypatch):
+    images.validate(save(tmp_path, "ok.png"))
+
+    text = tmp_path / "fake.png"
+    text.write_bytes(b"not an image")
+    with pytest.raises(images.ImageError, match="not a valid image"):
+        images.validate(str(text))
+    with pytest.raises(images.ImageError, match="Unsupported"):
+        images.validate(save(tmp_path, "bitmap.bmp"))
+
+    monkeypatch.setattr(images, "MAX_PIXELS", 1000)
+    with pytest.raises(images.ImageError, match="too large"):
+        images.validate(save(tmp_path, "big.png"))
+
+
+def test_process_writes_every_variant_within_its_box(tmp_path):
+    path = save(tmp_path, "photo.png", mode="RGBA")
+    variants = images.process(path)
+
+    assert set(variants) == set(images.SIZES)
+    for name, (width, height) in images.SIZES.items():
+        variant = variants[name]
+        assert variant["width"] <= width and variant["height"] <= height
+        for fmt in ("webp", "jpeg"):
+            with Image.open(tmp_path / variant[fmt]) as im:
+                assert im.size == (variant["width"], variant["height"])
+    assert variants["thumb"] == {"width": 400, "height": 300,
+                                 "webp": "photo.thumb.webp", "jpeg": "photo.thumb.jpg"}
+
+
+def test_pipeline_processes_in_a_worker(tmp_path):
+    path = save(tmp_path, "photo.jpg")
+    results = []
+    pipeline = images.ImagePipeline(workers=1)
+    try:
+        pipeline.submit(path, results.append).result(timeout=60)
+    finally:
+        pipeline.shutdown()
+    assert results and results[0]["medium"]["width"] == 1000
+
+
+def fake_url_for(endpoint, filename):
+    return f"/{endpoint}/{filename}"
+
+
+def test_responsive_image_falls_back_to_the_original():
+    html = images.responsive_image(fake_url_for, "ab/cd/x.png", None, alt='a "lamp"')
+    assert html == ('<img src="/static/uploads/ab/cd/x.png" alt="a &#34;lamp&#34;" class="" '
+                    'loading="lazy" decoding="async">')
+
+
+def test_responsive_image_offers_every_variant():
+    variants = images.rebase({
+        "thumb": {"width": 400, "height": 300, "webp": "x.thumb.webp", "jpeg": "x.thumb.jpg"},
+        "medium": {"width": 1000, "height": 750, "webp": "x.medium.webp", "jpeg": "x.medium.jpg"},
+    }, "ab/cd")
+    assert images.variant_files(variants) == ["ab/cd/x.thumb.webp", "ab/cd/x.thumb.jpg",
+                                              "ab/cd/x.medium.webp", "ab/cd/x.medium.jpg"]
+
+    html = images.responsive_image(fake_url_for, "ab/cd/x.png", variants, size="medium")
+    assert ('srcset="/static/uploads/ab/cd/x.thumb.webp 400w, /static/uploads/ab/cd/x.medium.webp 1000w"'
+            in html)
+    assert 'src="/static/uploads/ab/cd/x.medium.jpg"' in html
+    assert 'width="1000" height="750"' in html
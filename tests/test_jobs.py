@@ -0,0 +1,111 @@
+import jobs
+
+
+def row(db, job_id):
+    return db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+
+def test_claim_leases_a_job_once(db):
+    with db:
+        job_id = jobs.enqueue(db, "noop", {"n": 1})
+    assert jobs.ready(db)
+    job = jobs.claim(db, "w1")
+    assert (job["id"], job["attempts"]) == (job_id, 1)
+    assert jobs.claim(db, "w2") is None  # leased to w1
+    assert jobs.ack(db, job)
+    assert row(db, job_id)["status"] == "done"
+    assert not jobs.ready(db)
+
+
+def test_delayed_jobs_wait(db):
+    with db:
+        jobs.enqueue(db, "noop", delay=60)
+    assert not jobs.ready(db)
+    assert jobs.claim(db, "w1") is None
+
+
+def test_expired_lease_is_claimed_again_and_fences_the_old_worker(db):
+    with db:
+        job_id = jobs.enqueue(db, "noop")
+    stale = jobs.claim(db, "w1", visibility_timeout=-1)  # w1 "dies" holding the job
+    fresh = jobs.claim(db, "w2")
+    assert (fresh["id"], fresh["attempts"]) == (job_id, 2)
+    assert not jobs.ack(db, stale)
+    assert row(db, job_id)["locked_by"] == "w2"
+    assert jobs.ack(db, fresh)
+
+
+def test_lease_expiring_on_the_last_attempt_is_dead(db):
+    with db:
+        job_id = jobs.enqueue(db, "noop", max_attempts=1)
+    jobs.claim(db, "w1", visibility_timeout=-1)
+    assert jobs.claim(db, "w2") is None
+    dead = row(db, job_id)
+    assert dead["status"] == "dead" and dead["last_error"] == "lease expired on the last attempt"
+
+
+def test_failures_back_off_then_die_and_can_be_retried(db):
+    with db:
+        job_id = jobs.enqueue(db, "noop", max_attempts=2)
+    job = jobs.claim(db, "w1")
+    assert not jobs.fail(db, job, "boom")
+    queued = row(db, job_id)
+    assert queued["status"] == "queued" and queued["last_error"] == "boom"
+    assert queued["available_at"] > queued["created_at"]  # backing off
+    assert jobs.claim(db, "w1") is None
+
+    with db:
+        db.execute("UPDATE jobs SET available_at = 0 WHERE id = ?", (job_id,))
+    assert jobs.fail(db, jobs.claim(db, "w1"), "boom again")
+    assert row(db, job_id)["status"] == "dead"
+    assert [r["id"] for r in jobs.dead(db)] == [job_id]
+
+    assert jobs.retry(db, kind="other") == 0
+    assert jobs.retry(db, [job_id]) == 1
+    retried = jobs.claim(db, "w1")
+    assert (retried["id"], retried["attempts"]) == (job_id, 1)
+
+
+def test_backoff_doubles_with_jitter():
+    for attempts in (1, 2, 3):
+        full = jobs.BACKOFF_BASE * 2 ** (attempts - 1)
+        assert full // 2 <= jobs.backoff(attempts) <= full
+    assert jobs.backoff(50) <= jobs.BACKOFF_MAX
+
+
+def test_prune_keeps_recent_and_unfinished_jobs(db):
+    with db:
+        old, recent, queued = (jobs.enqueue(db, "noop") for _ in range(3))
+        db.execute("UPDATE jobs SET status = 'done', finished_at = 1 WHERE id = ?", (old,))
+        db.execute("UPDATE jobs SET status = 'done', finished_at = strftime('%s', 'now') WHERE id = ?",
+                   (recent,))
+    assert jobs.prune(db) == 1
+    assert row(db, old) is None and row(db, recent) and row(db, queued)
+    assert jobs.depth(db) == {"noop": {"done": 1, "queued": 1}}
+
+
+def test_worker_runs_handlers_and_records_failures(pool):
+    seen = []
+
+    def flaky(payload):
+        raise ValueError("nope")
+
+    conn = pool.acquire()
+    with conn:
+        jobs.enqueue(conn, "echo", {"n": 1})
+        jobs.enqueue(conn, "flaky", max_attempts=1)
+        jobs.enqueue(conn, "unknown", max_attempts=1)
+    pool.release(conn)
+
+    worker = jobs.Worker(pool, name="test", handlers={"echo": seen.append, "flaky": flaky}, periodic={})
+    worker.run(burst=True)
+    assert seen == [{"n": 1}]
+    stats = worker.stats()
+    assert (stats["done"], stats["failed"], stats["dead"]) == (1, 2, 2)
+
+    conn = pool.acquire()
+    try:
+        assert jobs.depth(conn) == {"echo": {"done": 1}, "flaky": {"dead": 1}, "unknown": {"dead": 1}}
+        assert "no handler" in [r for r in jobs.dead(conn) if r["kind"] == "unknown"][0]["last_error"]
+    finally:
+        pool.release(conn)
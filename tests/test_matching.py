@@ -0,0 +1,83 @@
+from conftest import add_item, add_user
+
+import matching
+
+
+def listing(db, owner_id, name, category="other", looking_for=None, hostel="Hall A"):
+    item_id = add_item(db, owner_id, name, hostel=hostel)
+    db.execute("UPDATE items SET category = ?, looking_for = ? WHERE id = ?", (category, looking_for, item_id))
+    return item_id
+
+
+def matches(db, user_id):
+    return [(row["their_item"], row["match_score"], row["reciprocal"])
+            for row in matching.top_matches(db, user_id)]
+
+
+def test_tokenize_drops_stopwords_and_folds_plurals():
+    assert matching.tokenize("Some old Books and a LAMP, glass") == ["book", "lamp", "glass"]
+    assert matching.tokenize(None) == []
+
+
+def test_reciprocal_same_hostel_match_scores_highest(db):
+    alice = add_user(db, "alice", hostel="Hall A")
+    bob = add_user(db, "bob", hostel="Hall A")
+    carol = add_user(db, "carol", hostel="Hall B")
+    wants_lamp = listing(db, alice, "Calculus textbook", "books", looking_for="desk lamp")
+    bobs_lamp = listing(db, bob, "Desk lamp", "electronics", looking_for="textbook")
+    carols_lamp = listing(db, carol, "Lamp", "electronics", hostel="Hall B")
+    matching.apply(db, listed=[wants_lamp, bobs_lamp, carols_lamp])
+
+    # Bob's lamp: "desk" and "lamp" cover 4 of its 5 offer weights (60 * 0.8), Bob wants
+    # Alice's book (+25) and lives in her hostel (+15)
+    assert matches(db, alice) == [("Desk lamp", 88, 1), ("Lamp", 40, 0)]
+    assert matches(db, bob) == [("Calculus textbook", 64, 1)]
+    assert matches(db, carol) == []
+
+
+def test_incremental_updates_agree_with_a_rebuild(db):
+    alice, bob = add_user(db, "alice"), add_user(db, "bob")
+    wants = listing(db, alice, "Football", looking_for="lamp")
+    lamp = listing(db, bob, "Desk lamp")
+    matching.apply(db, listed=[wants, lamp])
+    assert [m[0] for m in matches(db, alice)] == ["Desk lamp"]
+
+    # Renamed so it no longer matches, then delisted
+    db.execute("UPDATE items SET name = 'Kettle' WHERE id = ?", (lamp,))
+    matching.apply(db, listed=[lamp])
+    assert matches(db, alice) == []
+    db.execute("UPDATE items SET name = 'Reading lamp' WHERE id = ?", (lamp,))
+    matching.apply(db, listed=[lamp])
+    incremental = matches(db, alice)
+    matching.rebuild(db)
+    assert matches(db, alice) == incremental != []
+
+    db.execute("UPDATE items SET is_active = 0 WHERE id = ?", (lamp,))
+    matching.apply(db, listed=[lamp])
+    assert matches(db, alice) == []
+
+
+def test_removed_items_leave_the_index(db):
+    alice, bob = add_user(db, "alice"), add_user(db, "bob")
+    wants = listing(db, alice, "Football", looking_for="lamp")
+    lamp = listing(db, bob, "Desk lamp")
+    matching.apply(db, listed=[wants, lamp])
+
+    assert matching.apply(db, removed=[lamp]) == {alice, bob}
+    assert matches(db, alice) == []
+    assert db.execute("SELECT COUNT(*) FROM match_terms WHERE item_id = ?", (lamp,)).fetchone()[0] == 0
+
+
+def test_engine_applies_queued_changes_on_flush(db, pool):
+    alice, bob = add_user(db, "alice"), add_user(db, "bob")
+    wants = listing(db, alice, "Football", looking_for="lamp")
+    lamp = listing(db, bob, "Desk lamp")
+    db.commit()
+
+    engine = matching.MatchEngine(pool)
+    engine._thread = object()  # flushed by hand below instead
+    engine.item_listed(wants)
+    engine.item_listed(lamp)
+    assert engine.flush() == {alice, bob}
+    assert [m[0] for m in matches(db, alice)] == ["Desk lamp"]
+    assert engine.flush() == set()
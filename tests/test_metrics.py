@@ -0,0 +1,73 @@
+import sqlite3
+
+import metrics
+
+
+def test_histogram_counts_values_above_the_top_bucket():
+    histogram = metrics.Histogram("x", "Test.", ("route",), buckets=(1, 5))
+    histogram.observe(("a",), 60)
+    histogram.observe(("a",), 2)
+
+    lines = histogram.render()
+    assert 'x_bucket{route="a",le="1"} 0' in lines
+    assert 'x_bucket{route="a",le="5"} 1' in lines
+    assert 'x_bucket{route="a",le="+Inf"} 2' in lines
+    assert 'x_sum{route="a"} 62.000000' in lines
+    assert 'x_count{route="a"} 2' in lines
+
+
+def test_histogram_bucket_bounds_are_inclusive():
+    histogram = metrics.Histogram("x", "Test.", ("route",), buckets=(1, 5))
+    histogram.observe(("a",), 1)
+
+    lines = histogram.render()
+    assert 'x_bucket{route="a",le="1"} 1' in lines
+    assert 'x_bucket{route="a",le="+Inf"} 1' in lines
+
+
+def test_counter_escapes_label_values():
+    counter = metrics.Counter("y_total", "Test.", ("route",))
+    counter.inc(('say "hi"\n',), 2)
+    assert counter.render()[-1] == 'y_total{route="say \\"hi\\"\\n"} 2'
+
+
+def test_timed_connection_counts_statements_of_the_current_request():
+    conn = sqlite3.connect(":memory:", factory=metrics.connection_factory(0))
+    conn.execute("CREATE TABLE t (x)")
+    token = metrics.start("browse")
+    try:
+        conn.execute("INSERT INTO t VALUES (1)")
+        conn.executemany("INSERT INTO t VALUES (?)", [(2,), (3,)])
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 3
+        timings = metrics.current()
+    finally:
+        metrics.finish(token)
+    assert timings.queries == 3
+    assert timings.db > 0
+    assert timings.server_timing().startswith('db;dur=')
+    assert metrics.current() is None
+
+
+def test_slow_statements_are_logged_with_their_plan(capsys):
+    conn = sqlite3.connect(":memory:", factory=metrics.connection_factory(1e-9))
+    conn.execute("CREATE TABLE t (x)")
+    token = metrics.start("browse")
+    try:
+        conn.execute("SELECT * FROM t WHERE x = ?", (1,)).fetchall()
+        slow = metrics.current().slow_queries
+    finally:
+        metrics.finish(token)
+    out = capsys.readouterr().out
+    assert slow == 1  # once per statement, not again when its rows are read
+    assert "Slow query" in out and "in browse" in out and "SCAN t" in out
+
+
+def test_requests_get_server_timing_and_feed_metrics(app):
+    client = app.test_client()
+    response = client.get("/signin")
+    assert "total;dur=" in response.headers["Server-Timing"]
+
+    assert client.get("/metrics").status_code == 404
+    scraped = client.get("/metrics", headers={"Authorization": "Bearer test-token"})
+    assert scraped.status_code == 200
+    assert 'sharespace_requests_total{route="signin",method="GET",status="200"}' in scraped.get_data(as_text=True)
@@ -0,0 +1,56 @@
+import sqlite3
+
+import pytest
+
+import migrations
+
+
+def quiet(*args):
+    pass
+
+
+def test_fresh_database_reaches_the_latest_version(db):
+    assert migrations.current_version(db) == migrations.latest_version()
+    assert migrations.pending(db) == []
+    assert migrations.upgrade(db, log=quiet) == migrations.latest_version()
+
+
+def test_upgrade_stops_at_target(tmp_path):
+    db = sqlite3.connect(tmp_path / "partial.db")
+    assert migrations.upgrade(db, target=2, log=quiet) == 2
+    assert [m[0] for m in migrations.pending(db)][0] == 3
+    assert migrations.upgrade(db, log=quiet) == migrations.latest_version()
+
+
+def test_legacy_database_gets_the_missing_columns(tmp_path):
+    db = sqlite3.connect(tmp_path / "legacy.db")
+    db.execute("CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL, "
+               "password_hash TEXT NOT NULL, hostel TEXT, phone TEXT)")
+    db.execute("INSERT INTO users (username, password_hash) VALUES ('alice', 'x')")
+    db.commit()
+
+    migrations.upgrade(db, log=quiet)
+    assert {"email", "profile_picture"} <= migrations._columns(db, "users")
+    assert db.execute("SELECT username FROM users").fetchall() == [("alice",)]
+
+
+def test_failed_migration_rolls_back(tmp_path, monkeypatch):
+    db = sqlite3.connect(tmp_path / "failing.db")
+    migrations.upgrade(db, log=quiet)
+    version = migrations.latest_version() + 1
+
+    def broken(db):
+        db.execute("CREATE TABLE half_done (id INTEGER)")
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS + [(version, "broken", broken)])
+    with pytest.raises(RuntimeError):
+        migrations.upgrade(db, log=quiet)
+    assert migrations.current_version(db) == version - 1
+    assert db.execute("SELECT 1 FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
+
+
+def test_route_queries_use_indexes(db):
+    report = migrations.explain(db)
+    scans = [(label, details) for label, details, uses_index in report if not uses_index]
+    assert scans == []
@@ -0,0 +1,73 @@
+import queue
+
+import pytest
+
+from conftest import add_user
+
+import notifications
+
+
+def first_chunks(pool, user_id, last_id=None):
+    chunks = notifications.stream(pool, user_id, queue.Queue(), last_id, heartbeat=0.01, max_age=0.05)
+    return list(chunks)
+
+
+def test_fresh_stream_announces_its_starting_id(db, pool):
+    alice = add_user(db, "alice")
+    notifications.create(db, alice, "swap", "one")
+    latest = notifications.create(db, alice, "swap", "two")["id"]
+    db.commit()
+
+    chunks = first_chunks(pool, alice)
+    assert chunks[1] == f"id: {latest}\nevent: unread\ndata: 2\n\n"
+    assert not any("event: notification" in chunk for chunk in chunks)
+
+
+def test_reconnect_from_the_starting_id_replays_the_gap(db, pool):
+    alice = add_user(db, "alice")
+    db.commit()
+    assert first_chunks(pool, alice)[1].startswith("id: 0\n")
+
+    # Created while the browser was reconnecting with Last-Event-ID: 0
+    note = notifications.create(db, alice, "swap", "missed")
+    db.commit()
+
+    chunks = first_chunks(pool, alice, last_id=0)
+    assert notifications.format_event(note) in chunks
+
+
+def test_published_notifications_reach_only_their_user():
+    bus = notifications.NotificationBus()
+    alice, bob = bus.subscribe(1), bus.subscribe(2)
+    bus.publish(1, {"id": 5})
+    assert alice.get_nowait() == {"id": 5}
+    assert bob.empty()
+
+
+def test_stream_caps_per_user_and_overall():
+    bus = notifications.NotificationBus(max_streams=3, max_streams_per_user=2)
+    first, second = bus.subscribe(1), bus.subscribe(1)
+    with pytest.raises(notifications.StreamLimitReached):
+        bus.subscribe(1)
+    bus.subscribe(2)
+    with pytest.raises(notifications.StreamLimitReached):
+        bus.subscribe(3)
+    assert bus.stats()["rejected"] == 2
+
+    bus.unsubscribe(1, first)
+    bus.unsubscribe(1, first)  # closing twice frees one slot, not two
+    assert bus.stats()["open_streams"] == 2
+    bus.subscribe(3)
+
+
+def test_live_notifications_are_relayed_once(db, pool):
+    alice = add_user(db, "alice")
+    db.commit()
+    subscription = queue.Queue()
+    note = notifications.create(db, alice, "swap", "live")
+    db.commit()
+    # Published on the bus after the stream's replay already found it in the table
+    subscription.put(note)
+
+    chunks = list(notifications.stream(pool, alice, subscription, last_id=0, heartbeat=0.01, max_age=0.05))
+    assert chunks.count(notifications.format_event(note)) == 1
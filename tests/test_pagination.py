@@ -0,0 +1,69 @@
+import base64
+import json
+
+import pytest
+
+from conftest import add_item, add_user
+
+import pagination
+
+
+def raw_cursor(data):
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+
+def test_cursor_round_trip():
+    cursor = pagination.encode_cursor("newest", ["2024-01-01 10:00:00", 42])
+    assert "=" not in cursor
+    assert pagination.decode_cursor(cursor, "newest") == ["2024-01-01 10:00:00", 42]
+
+
+@pytest.mark.parametrize("cursor", [
+    None,
+    "",
+    "not base64!",
+    raw_cursor({"sort": "newest"}),
+    raw_cursor(["newest"]),
+    raw_cursor(["oldest", "2024-01-01", 1]),     # another sort's cursor
+    raw_cursor(["newest", [1, 2], 3]),
+    raw_cursor(["newest", {"a": 1}, 3]),
+    raw_cursor(["newest", None, 3]),
+    raw_cursor(["newest", True, 3]),
+])
+def test_unusable_cursors_mean_the_first_page(cursor):
+    assert pagination.decode_cursor(cursor, "newest") is None
+
+
+@pytest.mark.parametrize("value, size", [(None, 24), ("abc", 24), ("0", 1), ("10", 10), ("5000", 100)])
+def test_page_size_is_bounded(value, size):
+    assert pagination.page_size(value) == size
+
+
+@pytest.mark.parametrize("sort", sorted(pagination.SORT_KEYS))
+def test_walking_every_page_visits_each_row_once(db, sort):
+    owner = add_user(db, "alice")
+    ids = []
+    for n in range(11):
+        # Equal sort keys in pairs, so only the id tiebreaker orders them
+        item = add_item(db, owner, f"item {n}", created_at=f"2024-01-0{1 + n // 2} 00:00:00")
+        db.execute("UPDATE items SET views = ? WHERE id = ?", (n // 2, item))
+        ids.append(item)
+
+    columns, direction = pagination.SORT_KEYS[sort]
+    seen, cursor = [], None
+    while True:
+        where, params, order_by = pagination.keyset_clause(
+            columns, direction, pagination.decode_cursor(cursor, sort))
+        rows = db.execute(
+            f"SELECT items.id, items.created_at, items.views FROM items WHERE 1 = 1{where}{order_by} LIMIT ?",
+            params + [3 + 1]).fetchall()
+        page, more = pagination.split_page(rows, 3)
+        seen += [row["id"] for row in page]
+        if not more:
+            break
+        last = page[-1]
+        cursor = pagination.encode_cursor(sort, [last[c.split(".")[1]] for c in columns])
+
+    assert sorted(seen) == ids
+    assert len(seen) == len(set(seen))
+    assert seen == (ids if direction == "ASC" else ids[::-1])
@@ -0,0 +1,65 @@
+import threading
+
+import pytest
+
+import passwords
+from conftest import sign_up
+
+FAST = "pbkdf2:sha256:1000"
+
+
+def test_hash_and_check():
+    hasher = passwords.PasswordHasher(workers=0, method=FAST)
+    password_hash = hasher.hash("hunter22")
+    assert password_hash.startswith(FAST + "$")
+    assert hasher.check(password_hash, "hunter22")
+    assert not hasher.check(password_hash, "wrong")
+    assert not hasher.check(None, "hunter22")
+
+
+def test_outdated_hashes_are_replaced_on_sign_in():
+    old = passwords.PasswordHasher(workers=0, method="pbkdf2:sha256:500").hash("hunter22")
+    hasher = passwords.PasswordHasher(workers=0, method=FAST)
+    new_hash = hasher.rehash(old, "hunter22")
+    assert new_hash.startswith(FAST + "$") and hasher.check(new_hash, "hunter22")
+    assert hasher.rehash(new_hash, "hunter22") is None
+
+
+def test_saturated_hasher_fails_fast():
+    hasher = passwords.PasswordHasher(workers=0, max_pending=1, method=FAST)
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+
+    worker = threading.Thread(target=hasher._run, args=(slow,))
+    worker.start()
+    started.wait(5)
+    try:
+        with pytest.raises(passwords.Busy):
+            hasher.check("pbkdf2:sha256:1000$salt$hash", "hunter22")
+        # A rehash that can't get a slot waits for the next sign-in
+        assert hasher.rehash("pbkdf2:sha256:500$salt$hash", "hunter22") is None
+    finally:
+        release.set()
+        worker.join()
+    assert hasher.stats()["rejected"] == 2
+    assert hasher.stats()["pending"] == 0
+
+
+def test_hashes_in_a_worker_process():
+    hasher = passwords.PasswordHasher(workers=1, method=FAST)
+    try:
+        assert hasher.check(hasher.hash("hunter22"), "hunter22")
+    finally:
+        hasher.shutdown()
+
+
+def test_sign_in_is_a_503_while_saturated(app, monkeypatch):
+    import app as module
+    sign_up(app.test_client(), "busybee")
+    monkeypatch.setattr(module.get_password_hasher(), "max_pending", 0)
+    response = app.test_client().post("/signin", data={"username": "busybee", "password": "password"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(passwords.RETRY_AFTER)
@@ -0,0 +1,83 @@
+import pytest
+
+import pagination
+import proximity
+from conftest import add_item, add_user
+
+SELECT = "SELECT items.id, items.name, items.hostel, items.created_at FROM items"
+WHERE = " WHERE items.is_active = 1"
+
+MATRIX = proximity.DistanceMatrix({
+    "Hall A": {"Hall B": 100, "Hall C": 200, "Annex": 600},
+}, step=250)
+
+
+def test_bands_group_hostels_by_distance():
+    assert MATRIX.bands(" hall a ") == [["hall a"], ["hall b", "hall c"], ["annex"]]
+    assert MATRIX.bands("Annex") == [["annex"], ["hall a"]]  # distances apply both ways
+    assert MATRIX.bands("Nowhere") == [["nowhere"]]
+    assert MATRIX.bands("") == []
+    assert MATRIX.distance("Hall B", "hall a") == 100.0
+    assert MATRIX.distance("Hall B", "Hall C") is None
+
+
+def test_load_without_a_file_is_empty(tmp_path):
+    assert len(proximity.DistanceMatrix.load(str(tmp_path / "missing.json"))) == 0
+
+
+@pytest.fixture
+def listings(db):
+    with db:
+        owner = add_user(db, "owner")
+        for n, hostel in enumerate(["Annex", "Hall A", "hall b", "Hall C", "Elsewhere", None,
+                                    "Hall A ", "Hall B", "Annex", "Hall C"]):
+            add_item(db, owner, name=f"item {n}", hostel=hostel, created_at=f"2024-01-{n + 1:02d} 00:00:00")
+    return db
+
+
+def walk(db, bands, size):
+    """Every page in turn, passing the cursor through its URL form like the app does."""
+    pages, cursor = [], None
+    while True:
+        rows, has_more = proximity.nearest_page(db, bands, SELECT, WHERE, [], size,
+                                                pagination.decode_cursor(cursor, "nearest"))
+        pages.append([(row["name"], row["distance_band"]) for row in rows])
+        if not has_more:
+            return pages
+        last = rows[-1]
+        cursor = pagination.encode_cursor("nearest", [last["distance_band"], last["created_at"], last["id"]])
+
+
+def test_nearest_orders_by_band_then_newest(listings):
+    [page] = walk(listings, MATRIX.bands("Hall A"), size=20)
+    assert page == [
+        ("item 6", 0), ("item 1", 0),
+        ("item 9", 1), ("item 7", 1), ("item 3", 1), ("item 2", 1),
+        ("item 8", 2), ("item 0", 2),
+        ("item 5", 3), ("item 4", 3),  # hostels the matrix doesn't know, and none at all
+    ]
+
+
+@pytest.mark.parametrize("size", [1, 3, 4, 10])
+def test_cursor_pages_add_up_to_the_full_list(listings, size):
+    bands = MATRIX.bands("Hall A")
+    [everything] = walk(listings, bands, size=20)
+    pages = walk(listings, bands, size)
+    assert all(len(page) == size for page in pages[:-1])
+    assert [row for page in pages for row in page] == everything
+
+
+@pytest.mark.parametrize("after", [
+    None, [], [1, "2024-01-01"], [-1, "2024-01-01", 1], [True, "2024-01-01", 1],
+    [0, 5, 1], [0, "2024-01-01", "1"], "0,2024,1",
+])
+def test_unusable_cursors_start_from_the_first_page(listings, after):
+    bands = MATRIX.bands("Hall A")
+    first, _ = proximity.nearest_page(listings, bands, SELECT, WHERE, [], 3)
+    assert proximity.nearest_page(listings, bands, SELECT, WHERE, [], 3, after)[0] == first
+
+
+def test_without_a_hostel_everything_is_one_band(listings):
+    [page] = walk(listings, [], size=20)
+    assert [name for name, band in page] == [f"item {n}" for n in range(9, -1, -1)]
+    assert {band for name, band in page} == {0}
@@ -0,0 +1,63 @@
+import pytest
+
+from conftest import add_item, add_user
+
+import search
+
+
+def find(db, text, fts=True):
+    join, where, params, rank = search.filter_clause(text, fts)
+    rows = db.execute(
+        f"SELECT items.name FROM items{join} WHERE items.is_active = 1{where}"
+        f" ORDER BY {rank or 'items.id'}", params).fetchall()
+    return [row[0] for row in rows]
+
+
+@pytest.fixture
+def fts_db(db):
+    if not search.install(db):
+        pytest.skip("SQLite built without FTS5")
+    return db
+
+
+def test_match_query_quotes_terms_as_prefixes():
+    assert search.match_query("Desk LAMP") == '"desk"* "lamp"*'
+    assert search.match_query('NEAR(a b) -c') == '"near"* "a"* "b"* "c"*'
+    assert search.match_query("!!!") is None
+
+
+def test_index_follows_inserts_updates_and_deletes(fts_db):
+    owner = add_user(fts_db, "alice")
+    lamp = add_item(fts_db, owner, "Desk lamp")
+    add_item(fts_db, owner, "Calculus textbook")
+    assert find(fts_db, "lam") == ["Desk lamp"]
+
+    fts_db.execute("UPDATE items SET name = 'Floor light' WHERE id = ?", (lamp,))
+    assert find(fts_db, "lamp") == []
+    assert find(fts_db, "flo") == ["Floor light"]
+
+    fts_db.execute("DELETE FROM items WHERE id = ?", (lamp,))
+    assert find(fts_db, "flo") == []
+
+
+def test_name_hits_rank_above_description_hits(fts_db):
+    owner = add_user(fts_db, "alice")
+    described = add_item(fts_db, owner, "Reading light")
+    fts_db.execute("UPDATE items SET description = 'comes with a lamp shade' WHERE id = ?", (described,))
+    add_item(fts_db, owner, "Lamp")
+    assert find(fts_db, "lamp") == ["Lamp", "Reading light"]
+
+
+def test_install_indexes_rows_already_there(db):
+    owner = add_user(db, "alice")
+    add_item(db, owner, "Desk lamp")
+    if not search.install(db):
+        pytest.skip("SQLite built without FTS5")
+    assert find(db, "desk") == ["Desk lamp"]
+
+
+def test_like_fallback_without_fts(db):
+    owner = add_user(db, "alice")
+    add_item(db, owner, "Desk lamp")
+    assert find(db, "sk la", fts=False) == ["Desk lamp"]
+    assert find(db, "!!!", fts=True) == []
@@ -0,0 +1,53 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import bench_routes
+import seed
+import stats
+
+
+def quiet(*args):
+    pass
+
+
+def test_seed_fills_every_table_consistently(db):
+    user_ids = seed.seed(db, users=20, items=200, swaps=50, saved=40, rng=random.Random(1), log=quiet)
+    assert len(user_ids) == 20
+    assert db.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 200
+    assert 0 < db.execute("SELECT COUNT(*) FROM swap_requests").fetchone()[0] <= 50
+    assert db.execute("SELECT COUNT(*) FROM swap_requests WHERE requester_id = owner_id").fetchone()[0] == 0
+    assert db.execute("SELECT username FROM users ORDER BY id LIMIT 1").fetchone()[0] == "user1"
+    assert stats.verify(db) == []
+
+
+def test_seed_is_reproducible_and_extends(db):
+    seed.seed(db, users=5, items=20, swaps=0, saved=0, rng=random.Random(7), log=quiet)
+    first = db.execute("SELECT owner_id, name, hostel FROM items ORDER BY id").fetchall()
+
+    seed.seed(db, users=5, items=20, swaps=0, saved=0, rng=random.Random(7), log=quiet)
+    second = db.execute("SELECT owner_id - 5, name, hostel FROM items WHERE id > 20 ORDER BY id").fetchall()
+    assert [tuple(r) for r in first] == [tuple(r) for r in second]
+    assert db.execute("SELECT username FROM users ORDER BY id DESC LIMIT 1").fetchone()[0] == "user10"
+
+
+def test_percentile_picks_the_sample_at_the_rank():
+    samples = list(range(100))
+    assert bench_routes.percentile(samples, 0.5) == 50
+    assert bench_routes.percentile(samples, 0.99) == 99
+    assert bench_routes.percentile([3], 0.95) == 3
+
+
+@pytest.mark.parametrize("now, regressed", [
+    ({"p95_ms": 11.0, "throughput": 95.0}, []),
+    ({"p95_ms": 13.0, "throughput": 100.0}, ["browse"]),
+    ({"p95_ms": 10.0, "throughput": 70.0}, ["browse"]),
+])
+def test_compare_flags_slower_routes(capsys, now, regressed):
+    baseline = {"routes": {"browse": {"p95_ms": 10.0, "throughput": 100.0}}}
+    results = {"routes": {"browse": now, "new_route": {"p95_ms": 1.0, "throughput": 1.0}}}
+    assert bench_routes.compare(results, baseline, threshold=0.2) == regressed
@@ -0,0 +1,93 @@
+import sqlite3
+
+import pytest
+from flask import Flask, session
+
+import sessions
+from conftest import sign_up
+
+
+@pytest.fixture
+def store(tmp_path):
+    return sessions.SqliteSessionInterface(str(tmp_path / "sessions.db"), sweep_interval=0)
+
+
+@pytest.fixture
+def client(store):
+    app = Flask(__name__)
+    app.secret_key = "test"
+    app.session_interface = store
+
+    @app.route("/set/<value>")
+    def set_value(value):
+        session["value"] = value
+        return "ok"
+
+    @app.route("/get")
+    def get_value():
+        return session.get("value", "")
+
+    @app.route("/clear")
+    def clear():
+        session.clear()
+        return "ok"
+
+    return app.test_client()
+
+
+def rows(store):
+    conn = store.pool.acquire()
+    try:
+        return conn.execute("SELECT id, expiry FROM sessions").fetchall()
+    finally:
+        store.pool.release(conn)
+
+
+def test_no_session_is_stored_until_something_is_set(client, store):
+    client.get("/get")
+    assert client.get_cookie("session") is None
+    assert rows(store) == []
+
+
+def test_reads_skip_the_write(client, store):
+    client.get("/set/lamp")
+    assert client.get("/get").data == b"lamp"
+    assert store.writes == 1
+    assert store.skipped_writes == 1
+    assert [row["id"] for row in rows(store)] == [client.get_cookie("session").value]
+
+
+def test_clearing_deletes_the_row(client, store):
+    client.get("/set/lamp")
+    client.get("/clear")
+    assert rows(store) == []
+    assert client.get_cookie("session") is None
+
+
+def test_expired_sessions_are_ignored_and_swept(client, store):
+    client.get("/set/lamp")
+    conn = store.pool.acquire()
+    conn.execute("UPDATE sessions SET expiry = 1")
+    conn.commit()
+    store.pool.release(conn)
+
+    assert client.get("/get").data == b""
+    assert store.sweep() == 1
+    assert rows(store) == []
+
+
+def test_signing_in_moves_the_session_to_a_new_id(app):
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s["planted"] = True
+    planted = client.get_cookie("session").value
+
+    sign_up(client, "fixated")
+    signed_in = client.get_cookie("session").value
+    assert signed_in != planted
+
+    conn = sqlite3.connect(app.config["SESSION_DB_PATH"])
+    ids = {row[0] for row in conn.execute("SELECT id FROM sessions")}
+    conn.close()
+    assert planted not in ids and signed_in in ids
+    assert client.get("/dashboard").status_code == 200
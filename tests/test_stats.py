@@ -0,0 +1,45 @@
+from conftest import add_item, add_user
+
+import stats
+
+
+def add_swap(db, requester_id, item_id, owner_id, status="pending"):
+    return db.execute(
+        "INSERT INTO swap_requests (requester_id, item_id, owner_id, status) VALUES (?, ?, ?, ?)",
+        (requester_id, item_id, owner_id, status)
+    ).lastrowid
+
+
+def test_triggers_keep_counters_in_step(db):
+    alice, bob = add_user(db, "alice"), add_user(db, "bob")
+    lamp = add_item(db, alice, "Desk lamp")
+    book = add_item(db, alice, "Textbook")
+    db.execute("UPDATE items SET views = 7 WHERE id = ?", (lamp,))
+    swap = add_swap(db, bob, lamp, alice)
+    add_swap(db, bob, book, alice)
+
+    assert stats.get(db, alice) == {"active_offers": 2, "total_views": 7, "pending_requests": 2,
+                                    "completed_swaps": 0, "total_attempts": 2}
+
+    db.execute("UPDATE swap_requests SET status = 'accepted' WHERE id = ?", (swap,))
+    db.execute("UPDATE items SET is_active = 0 WHERE id = ?", (lamp,))
+    assert stats.get(db, alice) == {"active_offers": 1, "total_views": 7, "pending_requests": 1,
+                                    "completed_swaps": 1, "total_attempts": 2}
+
+    db.execute("DELETE FROM items WHERE id = ?", (book,))
+    assert stats.verify(db) == []
+
+
+def test_unknown_user_reads_as_zeros(db):
+    assert stats.get(db, 12345) == dict.fromkeys(stats.COUNTERS, 0)
+
+
+def test_rebuild_repairs_drift(db):
+    alice = add_user(db, "alice")
+    add_item(db, alice)
+    db.execute("UPDATE user_stats SET active_offers = 40 WHERE user_id = ?", (alice,))
+    assert stats.verify(db) == [(alice, "active_offers", 40, 1)]
+
+    stats.rebuild(db)
+    assert stats.verify(db) == []
+    assert stats.get(db, alice)["active_offers"] == 1
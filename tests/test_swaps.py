@@ -0,0 +1,108 @@
+import sqlite3
+
+import pytest
+
+import swaps
+from conftest import add_item, add_user
+
+
+@pytest.fixture
+def market(db):
+    with db:
+        alice, bob, carol = (add_user(db, name) for name in ("alice", "bob", "carol"))
+        lamp = add_item(db, alice)
+    return db, alice, bob, carol, lamp
+
+
+def status(db, request_id):
+    return db.execute("SELECT status FROM swap_requests WHERE id = ?", (request_id,)).fetchone()[0]
+
+
+def test_create_returns_the_owner_and_item(market):
+    db, alice, bob, carol, lamp = market
+    row = swaps.create(db, lamp, bob, "Swap for a kettle?")
+    assert (row["owner_id"], row["item_name"], row["owner_name"]) == (alice, "Desk lamp", "alice")
+    assert status(db, row["id"]) == swaps.PENDING
+
+
+@pytest.mark.parametrize("item, requester, code", [
+    (999, "bob", 404),
+    ("lamp", "alice", 403),
+])
+def test_create_rejects_bad_requests(market, item, requester, code):
+    db, alice, bob, carol, lamp = market
+    item_id = lamp if item == "lamp" else item
+    with pytest.raises(swaps.SwapError) as e:
+        swaps.create(db, item_id, {"alice": alice, "bob": bob}[requester])
+    assert e.value.status == code
+
+
+def test_one_pending_request_per_requester_and_item(market):
+    db, alice, bob, carol, lamp = market
+    first = swaps.create(db, lamp, bob)["id"]
+    with pytest.raises(swaps.SwapError) as e:
+        swaps.create(db, lamp, bob)
+    assert e.value.status == 409
+    # The partial unique index backs this up for writes that bypass create()
+    with pytest.raises(sqlite3.IntegrityError):
+        db.execute("INSERT INTO swap_requests (item_id, requester_id, owner_id, status) "
+                   "VALUES (?, ?, ?, 'pending')", (lamp, bob, alice))
+    # Once answered, asking again is fine
+    swaps.respond(db, alice, [first], swaps.REJECTED)
+    assert swaps.create(db, lamp, bob)["id"] != first
+
+
+def test_accept_closes_competing_requests_and_takes_item_off_the_market(market):
+    db, alice, bob, carol, lamp = market
+    from_bob = swaps.create(db, lamp, bob)["id"]
+    from_carol = swaps.create(db, lamp, carol)["id"]
+
+    answered, closed = swaps.respond(db, alice, [from_bob], swaps.ACCEPTED)
+    assert [(r["id"], r["status"], r["requester_name"]) for r in answered] == [(from_bob, "accepted", "bob")]
+    assert [(r["id"], r["status"]) for r in closed] == [(from_carol, "closed")]
+    assert db.execute("SELECT is_active FROM items WHERE id = ?", (lamp,)).fetchone()[0] == 0
+
+    with pytest.raises(swaps.SwapError) as e:
+        swaps.create(db, lamp, carol)
+    assert e.value.status == 400  # no longer available
+
+
+def test_transitions_only_leave_pending(market):
+    db, alice, bob, carol, lamp = market
+    request_id = swaps.create(db, lamp, bob)["id"]
+    assert swaps.respond(db, bob, [request_id], swaps.ACCEPTED) == ([], [])  # not the owner
+    assert len(swaps.respond(db, alice, [request_id], swaps.REJECTED)[0]) == 1
+    # A double click, or a second tab, finds nothing left to answer
+    assert swaps.respond(db, alice, [request_id], swaps.REJECTED) == ([], [])
+    assert swaps.respond(db, alice, [request_id], swaps.ACCEPTED) == ([], [])
+    assert status(db, request_id) == swaps.REJECTED
+
+
+def test_bulk_accept_of_one_item_accepts_only_the_first(market):
+    db, alice, bob, carol, lamp = market
+    with db:
+        book = add_item(db, alice, name="Textbook")
+    requests = [swaps.create(db, lamp, bob)["id"], swaps.create(db, lamp, carol)["id"],
+                swaps.create(db, book, carol)["id"]]
+
+    answered, closed = swaps.respond(db, alice, requests + requests, swaps.ACCEPTED)
+    assert [r["id"] for r in answered] == [requests[0], requests[2]]
+    assert [r["id"] for r in closed] == [requests[1]]
+    assert [status(db, r) for r in requests] == ["accepted", "closed", "accepted"]
+
+
+def test_bulk_reject(market):
+    db, alice, bob, carol, lamp = market
+    requests = [swaps.create(db, lamp, bob)["id"], swaps.create(db, lamp, carol)["id"]]
+    answered, closed = swaps.respond(db, alice, requests, swaps.REJECTED)
+    assert sorted(r["id"] for r in answered) == requests and closed == []
+    assert db.execute("SELECT is_active FROM items WHERE id = ?", (lamp,)).fetchone()[0] == 1
+
+
+def test_respond_validates_its_input(market):
+    db, alice, *_ = market
+    assert swaps.respond(db, alice, [], swaps.ACCEPTED) == ([], [])
+    with pytest.raises(swaps.SwapError):
+        swaps.respond(db, alice, [1], "maybe")
+    with pytest.raises(swaps.SwapError):
+        swaps.respond(db, alice, range(swaps.MAX_BULK + 1), swaps.REJECTED)
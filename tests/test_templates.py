@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_app(tmp_path, code, **env):
+    """Run `code` in a fresh interpreter that imports the app on its own files."""
+    env = dict(os.environ, **{
+        "SHARESPACE_DB": str(tmp_path / "users.db"),
+        "SESSION_DB": str(tmp_path / "sessions.db"),
+        "CACHE_DIR": str(tmp_path / "cache"),
+        "RATE_LIMIT_SHM": str(tmp_path / "limits"),
+        "JINJA_CACHE_DIR": str(tmp_path / "jinja"),
+        "ASSETS_BUILD_ON_STARTUP": "0",
+        "JOBS_WORKER_THREAD": "0",
+        "UPLOAD_GC_INTERVAL": "0",
+        "PASSWORD_WORKERS": "0",
+    }, **env)
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+def test_every_template_compiles(app):
+    names = app.jinja_env.list_templates(filter_func=lambda name: name.endswith(".html"))
+    assert "index.html" in names and "browseItems.html" in names
+    for name in names:
+        app.jinja_env.get_template(name)
+
+
+def test_compile_fills_the_bytecode_cache(tmp_path):
+    out = run_app(tmp_path, "import app; app.app.test_cli_runner().invoke(args=['templates', 'compile'])\n"
+                            "print(len(app.app.jinja_env.list_templates(filter_func=lambda n: n.endswith('.html'))))")
+    count = int(out.strip().splitlines()[-1])
+    cached = os.listdir(tmp_path / "jinja")
+    assert len(cached) == count and all(name.endswith(".cache") for name in cached)
+
+    # The next process loads those instead of compiling from source
+    out = run_app(tmp_path, "import app, jinja2\n"
+                            "jinja2.Environment.compile = lambda *a, **k: 1 / 0\n"
+                            "app.app.jinja_env.get_template('index.html'); print('ok')")
+    assert out.strip().endswith("ok")
+
+
+def test_compile_needs_a_cache_dir(app):
+    result = app.test_cli_runner().invoke(args=["templates", "compile"])
+    assert result.exit_code != 0
+    assert "JINJA_CACHE_DIR" in result.output
+
+
+def test_rarely_used_modules_are_not_imported_at_startup(tmp_path):
+    out = run_app(tmp_path, "import sys, app\n"
+                            "print(sorted(m for m in ('PIL', 'waitress', 'flask_session') if m in sys.modules))")
+    assert out.strip().splitlines()[-1] == "[]"
+
+
+def test_health_reports_time_to_first_response(app):
+    client = app.test_client()
+    client.get("/")
+    startup = client.get("/health/details", headers={"Authorization": "Bearer test-token"}).json["startup"]
+    assert 0 < startup["ready"] <= startup["first_response"]
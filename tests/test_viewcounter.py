@@ -0,0 +1,82 @@
+import sqlite3
+import time
+
+import pytest
+
+from conftest import add_item, add_user
+
+from viewcounter import ViewCounter
+
+
+@pytest.fixture
+def counter(pool):
+    counter = ViewCounter(pool, interval=60, max_pending=1000)
+    yield counter
+    counter.stop()
+
+
+def views(db, item_id):
+    return db.execute("SELECT views FROM items WHERE id = ?", (item_id,)).fetchone()[0]
+
+
+def test_views_are_written_in_one_batch(db, counter):
+    owner = add_user(db, "alice")
+    lamp, book = add_item(db, owner, "Desk lamp"), add_item(db, owner, "Textbook")
+    db.commit()
+
+    for _ in range(3):
+        counter.record(lamp)
+    counter.record(book)
+    assert views(db, lamp) == 0
+    assert counter.pending() == {lamp: 3, book: 1}
+
+    assert counter.flush() == 2
+    assert (views(db, lamp), views(db, book)) == (3, 1)
+    assert counter.pending() == {}
+
+
+def test_a_viewer_is_counted_once_per_window(db, counter):
+    owner = add_user(db, "alice")
+    lamp = add_item(db, owner)
+    db.commit()
+
+    assert counter.record(lamp, viewer=owner)
+    assert not counter.record(lamp, viewer=owner)
+    assert counter.record(lamp, viewer=owner + 1)
+    assert counter.pending() == {lamp: 2}
+    assert counter.deduped == 1
+
+
+def test_a_full_buffer_is_flushed_without_waiting(db, pool):
+    owner = add_user(db, "alice")
+    lamp = add_item(db, owner)
+    db.commit()
+
+    counter = ViewCounter(pool, interval=60, max_pending=2)
+    try:
+        counter.record(lamp)
+        counter.record(lamp)
+        deadline = time.monotonic() + 5
+        while views(db, lamp) != 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert views(db, lamp) == 2
+    finally:
+        counter.stop()
+
+
+class BrokenPool:
+    def acquire(self):
+        return sqlite3.connect(":memory:")  # no items table
+
+    def release(self, conn, discard=False):
+        conn.close()
+
+
+def test_failed_flush_keeps_the_counts():
+    counter = ViewCounter(BrokenPool(), interval=60)
+    counter._stopped.set()  # no background thread
+    counter.record(7)
+    with pytest.raises(sqlite3.OperationalError):
+        counter.flush()
+    assert counter.pending() == {7: 1}
+    assert counter.errors == 1
@@ -0,0 +1,129 @@
+import atexit
+import collections
+import threading
+import time
+
+# --- WRITE-BEHIND VIEW COUNTER ---
+# Item views are counted in memory and written in one batched transaction
+# every few seconds (or sooner once enough have piled up), so viewing an
+# item never takes the database write lock on the request path.
+
+
+class ViewCounter:
+    def __init__(self, pool, interval=5.0, max_pending=500,
+                 dedup_seconds=1800, dedup_size=10000):
+        self.pool = pool
+        self.interval = interval
+        self.max_pending = max_pending
+        self.dedup_seconds = dedup_seconds
+        self.dedup_size = dedup_size
+
+        self._lock = threading.Lock()
+        self._pending = collections.Counter()
+        self._pending_total = 0
+        self._seen = collections.OrderedDict()  # (viewer, item_id) -> last counted
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self.flushes = 0
+        self.flushed_views = 0
+        self.deduped = 0
+        self.errors = 0
+
+    def record(self, item_id, viewer=None):
+        """Count one view of item_id. `viewer` (e.g. the user id) enables dedup."""
+        now = time.monotonic()
+        with self._lock:
+            if viewer is not None and self.dedup_seconds > 0:
+                key = (viewer, item_id)
+                last = self._seen.get(key)
+                if last is not None and now - last < self.dedup_seconds:
+                    self.deduped += 1
+                    return False
+                self._seen[key] = now
+                self._seen.move_to_end(key)
+                while len(self._seen) > self.dedup_size:
+                    self._seen.popitem(last=False)
+
+            self._pending[item_id] += 1
+            self._pending_total += 1
+            full = self._pending_total >= self.max_pending
+
+        self._ensure_started()
+        if full:
+            self._wake.set()
+        return True
+
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, collections.Counter()
+            self._pending_total = 0
+        if not batch:
+            return 0
+
+        conn = self.pool.acquire()
+        try:
+            with conn:
+                conn.executemany(
+                    "UPDATE items SET views = views + ? WHERE id = ?",
+                    [(n, item_id) for item_id, n in batch.items()]
+                )
+        except Exception:
+            # Put the counts back so they go out with the next flush
+            with self._lock:
+                self._pending.update(batch)
+                self._pending_total += sum(batch.values())
+                self.errors += 1
+            self.pool.release(conn, discard=True)
+            raise
+        self.pool.release(conn)
+
+        self.flushes += 1
+        self.flushed_views += sum(batch.values())
+        return len(batch)
+
+    def _ensure_started(self):
+        if self._thread is not None or self._stopped.is_set():
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="view-counter", daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print("❌ View counter flush failed:", e)
+
+    def stop(self):
+        # Called at interpreter shutdown: write out whatever is still buffered
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.interval + 1)
+        try:
+            self.flush()
+        except Exception as e:
+            print("❌ View counter flush failed:", e)
+
+    def stats(self):
+        with self._lock:
+            pending_items, pending_views = len(self._pending), self._pending_total
+        return {
+            "pending_items": pending_items,
+            "pending_views": pending_views,
+            "flushes": self.flushes,
+            "flushed_views": self.flushed_views,
+            "deduped": self.deduped,
+            "errors": self.errors,
+        }